@@ -0,0 +1,196 @@
+"""Модуль оценки подозрительности путешественников по набору правил
+
+Все правила считаются группировками по целочисленным кодам над объединённой таблицей полётов
+(результат этапа flights) и таблицей соответствия идентификаторов (mergeLoyalityIdNickPasports).
+"""
+import numpy as np
+import pandas as pd
+
+# Правила и их веса в итоговой оценке
+RULE_WEIGHTS = {
+    'shared_ffkey': 3.0,        # FF ключи, которыми пользуются разные ID
+    'multiple_documents': 1.0,  # другие документы на то же имя
+    'off_route': 1.0,           # полёты по маршруту, которого нет в расписании (или необычному для рейса)
+    'overlapping': 2.0,         # дни с полётами из разных мест, не связанными в один маршрут
+    'single_source': 1.0,       # доля полётов, известных только из одного источника
+}
+
+def namedDocuments(df_sirena: pd.DataFrame | None = None, df_boarding: pd.DataFrame | None = None,
+                   double_docs: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Соответствие имён и документов из Sirena (PaxName, TravelDoc) и BoardingData
+
+    Имя - фамилия и имя заглавными буквами, как PassangerName в ноутбуке. Загранпаспорта из double_docs
+    (второй результат mergeDataPasports) заменяются на обычные, чтобы два паспорта одного человека
+    не считались разными документами.
+
+    Returns:
+        pd.DataFrame: Уникальные пары Name, Document
+    """
+    parts = []
+    if df_sirena is not None:
+        names = df_sirena['PaxName'].str.upper().str.split().str[:2].str.join(' ')
+        parts.append(pd.DataFrame({'Name': names, 'Document': df_sirena['TravelDoc']}))
+    if df_boarding is not None:
+        names = df_boarding['PassengerLastName'].str.upper() + ' ' + df_boarding['PassengerFirstName'].str.upper()
+        parts.append(pd.DataFrame({'Name': names, 'Document': df_boarding['PassengerDocument']}))
+    documents = pd.concat(parts, ignore_index=True).dropna()
+    documents['Document'] = documents['Document'].astype(str)
+    if double_docs is not None:
+        domestic = double_docs.drop_duplicates('pass').set_index('pass')['PassengerDocument'].astype(str)
+        documents['Document'] = documents['Document'].map(domestic).fillna(documents['Document'])
+    return documents.drop_duplicates(ignore_index=True)
+
+def timetableRoutes(df_timetable: pd.DataFrame) -> pd.DataFrame:
+    """Маршруты (From, To) по кодам аэропортов из Skyteam_Timetable"""
+    routes = df_timetable[['From_Code', 'To_Code']].dropna().drop_duplicates()
+    return routes.rename(columns={'From_Code': 'From', 'To_Code': 'To'}).reset_index(drop=True)
+
+def _sharedFFKey(identities: pd.DataFrame, bad: pd.DataFrame | None) -> pd.Series:
+    pairs = identities[['ID', 'FFKey']].dropna().drop_duplicates()
+    owners = pairs.groupby('FFKey')['ID'].transform('size')
+    shared = owners > 1
+    if bad is not None:
+        shared |= pairs['FFKey'].isin(bad['FFKey'])
+    counts = pairs[shared].groupby('ID').size()
+    if bad is not None:
+        # Пользователи чужих карт из таблицы bad mergeLoyality
+        counts = counts.add(('id_' + bad['uid'].dropna().astype(str)).value_counts(), fill_value=0)
+    return counts
+
+def _multipleDocuments(documents: pd.DataFrame) -> pd.Series:
+    per_name = documents.groupby('Name')['Document'].transform('size') - 1
+    return pd.Series(per_name.to_numpy(), index='pass_' + documents['Document']).groupby(level=0).sum()
+
+def _encode(flights: pd.DataFrame) -> dict:
+    """
+    Целочисленные коды столбцов таблицы полётов (один проход factorize по каждому столбцу)
+
+    Аэропорты вылета и прилёта нумеруются общим словарём в порядке сортировки кодов,
+    чтобы наименьший номер соответствовал наименьшему значению, как в Series.mode().
+    """
+    encoded = {}
+    encoded['id'], encoded['ids'] = pd.factorize(flights['ID'])
+    encoded['date'], dates = pd.factorize(flights['Date'])
+    encoded['n_dates'] = len(dates)
+    airports, airport_names = pd.factorize(pd.concat([flights['From'], flights['To']], ignore_index=True), sort=True)
+    encoded['from'], encoded['to'] = airports[:len(flights)], airports[len(flights):]
+    encoded['n_airports'] = len(airport_names)
+    encoded['airport_names'] = airport_names
+    # Номер дня пассажира (ID, Date)
+    encoded['day'] = encoded['id'].astype(np.int64) * encoded['n_dates'] + encoded['date']
+    return encoded
+
+def _perId(encoded: dict, values: np.ndarray, ids: np.ndarray | None = None) -> pd.Series:
+    """Сумма values по ID"""
+    ids = encoded['id'] if ids is None else ids
+    return pd.Series(np.bincount(ids, weights=values, minlength=len(encoded['ids'])), index=encoded['ids'])
+
+def _groupModeCodes(groups: np.ndarray, values: np.ndarray, n_values: int) -> tuple:
+    """Мода кодов values в каждой группе (при равенстве частот - наименьший код): (группы, моды)"""
+    pairs, counts = np.unique(groups.astype(np.int64) * n_values + values, return_counts=True)
+    pair_groups = pairs // n_values
+    order = np.lexsort((-counts, pair_groups))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = pair_groups[order][1:] != pair_groups[order][:-1]
+    best = order[first]
+    return pair_groups[best], pairs[best] % n_values
+
+def _offRoute(flights: pd.DataFrame, encoded: dict, routes: pd.DataFrame | None) -> pd.Series:
+    n_airports = encoded['n_airports']
+    if routes is not None:
+        names = encoded['airport_names']
+        route_from = names.get_indexer(routes['From'])
+        route_to = names.get_indexer(routes['To'])
+        known_routes = route_from.astype(np.int64) * n_airports + route_to
+        known_routes = known_routes[(route_from >= 0) & (route_to >= 0)]
+        off = ~np.isin(encoded['from'].astype(np.int64) * n_airports + encoded['to'], known_routes)
+    else:
+        # Без расписания: маршрут отличается от самого частого маршрута этого рейса в тот же день
+        # (моды аэропортов вылета и прилёта отдельно, как в filterSuspicious)
+        flight_code, flight_names = pd.factorize(flights['Flight'])
+        valid = flight_code >= 0
+        groups = flight_code[valid].astype(np.int64) * encoded['n_dates'] + encoded['date'][valid]
+        groups, group_index = np.unique(groups, return_inverse=True)
+        off = np.zeros(len(flights), dtype=bool)
+        for column in ('from', 'to'):
+            mode_groups, modes = _groupModeCodes(group_index, encoded[column][valid], n_airports)
+            usual = np.full(len(groups), -1, dtype=np.int64)
+            usual[mode_groups] = modes
+            off[valid] |= encoded[column][valid] != usual[group_index]
+    return _perId(encoded, off)
+
+def _overlapping(encoded: dict) -> pd.Series:
+    # Точка начала маршрута дня - аэропорт вылета, в который в тот же день не прилетали.
+    # Больше одной такой точки - полёты дня не складываются в один маршрут
+    n_airports = encoded['n_airports']
+    departures = encoded['day'] * n_airports + encoded['from']
+    arrivals = encoded['day'] * n_airports + encoded['to']
+    starts = np.unique(departures[~np.isin(departures, arrivals)])
+    start_days, per_day = np.unique(starts // n_airports, return_counts=True)
+    overlap_days = start_days[per_day > 1]
+    return _perId(encoded, np.ones(len(overlap_days)), ids=overlap_days // encoded['n_dates'])
+
+def _singleSource(flights: pd.DataFrame, encoded: dict) -> pd.Series:
+    n_airports = encoded['n_airports']
+    _, day = np.unique(encoded['day'], return_inverse=True)
+    legs, leg_index = np.unique((day.astype(np.int64) * n_airports + encoded['from']) * n_airports + encoded['to'],
+                                return_inverse=True)
+    source, _ = pd.factorize(flights['Source'])
+    pairs = np.unique(leg_index.astype(np.int64) * (source.max(initial=0) + 2) + source + 1)
+    sources = np.bincount(pairs // (source.max(initial=0) + 2), minlength=len(legs))
+    # ID полёта: первая строка с этим полётом
+    leg_ids = np.empty(len(legs), dtype=np.intp)
+    leg_ids[leg_index] = encoded['id']
+    single = _perId(encoded, (sources == 1).astype(np.float64), ids=leg_ids)
+    total = _perId(encoded, np.ones(len(legs)), ids=leg_ids)
+    return single / total
+
+def scoreTravellers(flights: pd.DataFrame, identities: pd.DataFrame | None = None,
+                    documents: pd.DataFrame | None = None, routes: pd.DataFrame | None = None,
+                    bad: pd.DataFrame | None = None, weights: dict | None = None) -> pd.DataFrame:
+    """
+    Оценка подозрительности каждого ID
+
+    Правила (RULE_WEIGHTS):
+    - shared_ffkey: количество FF ключей ID, которые есть и у других ID или в таблице bad
+    - multiple_documents: количество других документов на то же имя (namedDocuments)
+    - off_route: количество полётов по маршруту не из routes; если routes не задан - отличающихся
+      от самого частого маршрута того же рейса в тот же день (как в filterSuspicious)
+    - overlapping: количество дней с полётами из разных мест, не связанными в один маршрут
+    - single_source: доля полётов (ID, Date, From, To), найденных только в одном источнике (столбец Source)
+
+    Args:
+        flights (pd.DataFrame): Столбцы ID, Date, From, To; для правил - Flight и Source (если есть)
+        identities (pd.DataFrame | None): Результат mergeLoyalityIdNickPasports (ID, FFKey)
+        documents (pd.DataFrame | None): Результат namedDocuments
+        routes (pd.DataFrame | None): Маршруты From, To (timetableRoutes)
+        bad (pd.DataFrame | None): Таблица bad из mergeLoyality (uid, FFKey)
+        weights (dict | None): Веса правил; по умолчанию RULE_WEIGHTS
+
+    Returns:
+        pd.DataFrame: Индекс ID; столбцы правил, flights, score; по убыванию score
+    """
+    weights = {**RULE_WEIGHTS, **(weights or {})}
+    flights = flights.dropna(subset=['ID', 'Date', 'From', 'To'])
+
+    encoded = _encode(flights)
+    rules = {}
+    if identities is not None:
+        rules['shared_ffkey'] = _sharedFFKey(identities, bad)
+    if documents is not None:
+        rules['multiple_documents'] = _multipleDocuments(documents)
+    if routes is not None or 'Flight' in flights.columns:
+        rules['off_route'] = _offRoute(flights, encoded, routes)
+    rules['overlapping'] = _overlapping(encoded)
+    if 'Source' in flights.columns:
+        rules['single_source'] = _singleSource(flights, encoded)
+
+    ids = pd.Series(np.bincount(encoded['id'], minlength=len(encoded['ids'])), index=encoded['ids'], name='flights')
+    table = pd.concat([ids] + [rules.get(rule, pd.Series(dtype=float)).rename(rule) for rule in RULE_WEIGHTS], axis=1)
+    # Прочие ID (без полётов) тоже попадают в таблицу, если по ним сработало какое-либо правило
+    table = table.fillna(0)
+    table['flights'] = table['flights'].astype(np.int64)
+    table['score'] = sum(weights[rule] * table[rule] for rule in RULE_WEIGHTS)
+    table.index.name = 'ID'
+    return table.sort_values(['score', 'flights'], ascending=False, kind='stable')
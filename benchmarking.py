@@ -0,0 +1,689 @@
+"""Модуль замеров производительности функций извлечения и слияния данных"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import re
+import queue as queue_module
+import subprocess
+import tempfile
+import time
+import warnings
+import xml.etree.ElementTree as ET
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+import data_extracting
+import encoding
+import merging
+import query
+import reconciliation
+import storage
+from profiling import peakRssMb
+import synthetic_data
+import timetable
+
+def _countRows(result) -> int:
+    """Количество строк в результате: DataFrame, Series, кортеж таблиц или итератор порций"""
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    if isinstance(result, tuple):
+        return sum(_countRows(part) for part in result)
+    return sum(len(chunk) for chunk in result)
+
+def _measureChild(queue, func, args, kwargs):
+    start = time.perf_counter()
+    rows = _countRows(func(*args, **kwargs))
+    wall_time = time.perf_counter() - start
+    queue.put({'rows': rows, 'wall_time': wall_time, 'peak_rss_mb': peakRssMb()})
+
+def measure(func, *args, **kwargs) -> dict:
+    """
+    Замер функции в отдельном (новом) процессе, чтобы пиковая память не зависела от предыдущих замеров
+
+    Returns:
+        dict: rows - количество строк, wall_time - время (с), peak_rss_mb - пиковый RSS (МБ), rows_per_sec
+    """
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_measureChild, args=(queue, func, args, kwargs))
+    process.start()
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except queue_module.Empty:
+            if not process.is_alive():
+                raise RuntimeError(f'Замер {func.__name__} завершился с кодом {process.exitcode}')
+    process.join()
+    result['rows_per_sec'] = result['rows'] / result['wall_time'] if result['wall_time'] else float('inf')
+    return result
+
+def _baselineExtractAirlinesData(path: str) -> pd.DataFrame:
+    """Исходная реализация extractAirlinesData: ET.parse всего файла и словарь на каждую активность"""
+    root = ET.parse(path).getroot()
+    data = []
+    for user in root.findall('user'):
+        uid = user.get('uid')
+        first_name = user.find('name').get('first')
+        last_name = user.find('name').get('last')
+        for card in user.find('cards').findall('card'):
+            card_number = card.get('number')
+            bonus_program = card.find('bonusprogramm').text
+            for activity in card.find('activities').findall('activity'):
+                data.append({
+                    'uid': uid,
+                    'first_name': first_name,
+                    'last_name': last_name,
+                    'card_number': card_number,
+                    'bonus_program': bonus_program,
+                    'activity_type': activity.get('type'),
+                    'code': activity.find('Code').text,
+                    'date': activity.find('Date').text,
+                    'departure': activity.find('Departure').text,
+                    'arrival': activity.find('Arrival').text,
+                    'fare': activity.find('Fare').text
+                })
+    return pd.DataFrame(data)
+
+def benchmarkAirlinesData(path: str, chunksize: int = 100_000) -> pd.DataFrame:
+    """
+    Сравнение исходного, полного и потокового извлечения PointzAggregator-AirlinesData.xml
+
+    Args:
+        path (str): Путь к xml файлу (например, созданному synthetic_data.generateAirlinesData)
+        chunksize (int): Размер порции для потокового режима
+    """
+    results = {
+        'baseline': measure(_baselineExtractAirlinesData, path),
+        'extractAirlinesData': measure(data_extracting.extractAirlinesData, path),
+        'iterAirlinesData': measure(data_extracting.iterAirlinesData, path, chunksize=chunksize),
+    }
+    return pd.DataFrame(results).T
+
+def _baselineExtractBoardingPass(path: str) -> pd.DataFrame:
+    """Исходная реализация extractBoardingPass: распаковка на диск и pd.read_excel каждого файла"""
+    all_data = []
+    with tempfile.TemporaryDirectory() as extract_dir:
+        with zipfile.ZipFile(path, 'r') as zip_ref:
+            zip_ref.extractall(extract_dir)
+        for filename in os.listdir(extract_dir):
+            if filename.endswith(".xlsx"):
+                df = pd.read_excel(os.path.join(extract_dir, filename), header=None)
+                data = {name: df.iloc[row, column] for name, (row, column) in data_extracting.BOARDING_PASS_CELLS.items()}
+                if pd.isna(data['passenger_name']):
+                    data['passenger_name'] = "Unknown"
+                all_data.append(data)
+    return pd.DataFrame(all_data)
+
+def _sortedRows(df: pd.DataFrame) -> pd.DataFrame:
+    """Строки в порядке значений: исходные реализации читали файлы в порядке os.listdir"""
+    return df.sort_values(list(df.columns), kind='stable').reset_index(drop=True)
+
+def benchmarkBoardingPass(path: str, workers=(1, None)) -> pd.DataFrame:
+    """
+    Сравнение исходного и нового извлечения посадочных талонов
+
+    Перед замером проверяется, что таблицы совпадают (с точностью до порядка строк).
+
+    Args:
+        path (str): Путь к zip архиву (например, созданному synthetic_data.generateBoardingPasses)
+        workers (tuple): Варианты количества процессов для extractBoardingPass
+    """
+    expected = _sortedRows(_baselineExtractBoardingPass(path))
+    for count in workers:
+        pd.testing.assert_frame_equal(_sortedRows(data_extracting.extractBoardingPass(path, workers=count)), expected)
+    results = {'baseline': measure(_baselineExtractBoardingPass, path)}
+    for count in workers:
+        results[f'extractBoardingPass(workers={count})'] = measure(data_extracting.extractBoardingPass, path, workers=count)
+    return pd.DataFrame(results).T
+
+def _baselineExtractSkyTeamExchange(path: str) -> pd.DataFrame:
+    """Исходная реализация extractSkyTeamExchange: до шести re.match на строку и восемь списков"""
+    with open(path, 'r') as yaml_file:
+        data = {'Date': [], 'FlightNumber': [], 'FFKey': [], 'Class': [], 'Fare': [], 'From': [], 'Status': [], 'To' : []}
+        current_date = flight_number = flight_from = flight_status = None
+        ff = []
+        for line in yaml_file:
+            line = line.strip().strip(':')
+            if re.match(r"^\s*\'(\d{4}-\d{2}-\d{2})\'$", line):
+                current_date = line.strip('\'').strip()
+                continue
+            if re.match(r"^\s*(\w{2}\d{4})$", line):
+                flight_number = line.strip()
+                continue
+            match = re.match(r"^\s*(\w{2}\s\d+):\s\{CLASS:\s(\w),\sFARE:\s(\w{6})\}$", line)
+            if match:
+                ff.append(match.groups())
+                continue
+            if re.match(r"^\s*FROM:\s\w{3}$", line):
+                flight_from = line.split(': ')[1].strip()
+                continue
+            if re.match(r"^\s*STATUS:\s\w+$", line):
+                flight_status = line.split(': ')[1].strip()
+                continue
+            if re.match(r"^\s*TO:\s\w{3}$", line):
+                flight_to = line.split(': ')[1].strip()
+                for i in ff:
+                    for column, value in zip(data, (current_date, flight_number, *i, flight_from, flight_status, flight_to)):
+                        data[column].append(value)
+                ff.clear()
+    return pd.DataFrame(data)
+
+def benchmarkSkyTeamExchange(path: str, workers=(1, os.cpu_count())) -> pd.DataFrame:
+    """
+    Сравнение исходного и нового разбора SkyTeam-Exchange.yaml
+
+    Перед замером проверяется, что таблицы совпадают при каждом количестве процессов.
+
+    Args:
+        path (str): Путь к yaml файлу (например, созданному synthetic_data.generateSkyTeamExchange)
+        workers (tuple): Варианты количества процессов для extractSkyTeamExchange
+    """
+    expected = _baselineExtractSkyTeamExchange(path)
+    for count in workers:
+        pd.testing.assert_frame_equal(data_extracting.extractSkyTeamExchange(path, workers=count), expected)
+    results = {'baseline': measure(_baselineExtractSkyTeamExchange, path)}
+    for count in workers:
+        results[f'extractSkyTeamExchange(workers={count})'] = measure(data_extracting.extractSkyTeamExchange, path, workers=count)
+    return pd.DataFrame(results).T
+
+def _baselineExtractSirenaExportFixed(path: str) -> pd.DataFrame:
+    """Исходная реализация extractSirenaExportFixed через pd.read_fwf"""
+    return pd.read_fwf(path, colspecs=data_extracting.SIRENA_COLSPECS)
+
+def benchmarkSirenaExportFixed(path: str) -> pd.DataFrame:
+    """
+    Сравнение pd.read_fwf и чтения через отображение в память (всех столбцов и только нужных mergeDataPasports)
+
+    Args:
+        path (str): Путь к файлу (например, созданному synthetic_data.generateSirenaExportFixed)
+    """
+    results = {
+        'read_fwf': measure(_baselineExtractSirenaExportFixed, path),
+        'extractSirenaExportFixed': measure(data_extracting.extractSirenaExportFixed, path),
+        'extractSirenaExportFixed(usecols)': measure(data_extracting.extractSirenaExportFixed, path,
+                                                     usecols=merging.SIRENA_PASPORTS_COLUMNS),
+    }
+    return pd.DataFrame(results).T
+
+def _baselineFilterSuspicious(df: pd.DataFrame) -> pd.DataFrame:
+    """Исходная фильтрация подозрительных полётов: groupby.apply с двумя mode() на каждый рейс"""
+    def filter_suspicious(group):
+        most_common_from = group['From'].mode()[0]
+        most_common_dest = group['Dest'].mode()[0]
+        frequent_records = group[(group['From'] == most_common_from) & (group['Dest'] == most_common_dest)]
+        suspicious_records = group[(group['From'] != most_common_from) | (group['Dest'] != most_common_dest)]
+        if len(frequent_records) >= 1 * len(suspicious_records):
+            return frequent_records
+        return group
+    return df.groupby(['FlightDate', 'FlightTime', 'FlightNumber']).apply(filter_suspicious).reset_index(drop=True)
+
+def benchmarkFilterSuspicious(n_rows: int = 1_000_000, n_flights: int = 100_000, seed: int = 0) -> pd.DataFrame:
+    """
+    Сравнение исходной и векторизованной фильтрации подозрительных полётов на синтетических данных
+
+    Перед замером проверяется, что результаты совпадают построчно (AssertionError при расхождении).
+    """
+    df = synthetic_data.generateFlightRecords(n_rows, n_flights, seed=seed)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        expected = _baselineFilterSuspicious(df)
+    pd.testing.assert_frame_equal(merging.filterSuspicious(df), expected)
+
+    results = {
+        'groupby.apply': measure(_baselineFilterSuspicious, df),
+        'filterSuspicious': measure(merging.filterSuspicious, df),
+    }
+    return pd.DataFrame(results).T
+
+def _baselineExtractFFKey(values: pd.Series) -> pd.Series:
+    """Исходное выделение FF ключа: re.search на каждую строку через apply"""
+    def f(col):
+        m = re.search(r'FF#\w\w\s\d+', str(col))
+        if m:
+            return m.group().replace('FF#','')
+        return None
+    return values.apply(f)
+
+def benchmarkFFKey(n_rows: int = 10_000_000, seed: int = 0) -> pd.DataFrame:
+    """
+    Сравнение построчного и векторизованного выделения FF ключа из PaxAdditionalInfo
+
+    Перед замером проверяется совпадение результатов (AssertionError при расхождении).
+    """
+    values = synthetic_data.generatePaxAdditionalInfo(n_rows, seed=seed)
+    check = values[:100_000]
+    pd.testing.assert_series_equal(data_extracting.extractFFKey(check).fillna(-1),
+                                   _baselineExtractFFKey(check).fillna(-1), check_dtype=False)
+    results = {
+        'apply(re.search)': measure(_baselineExtractFFKey, values),
+        'extractFFKey': measure(data_extracting.extractFFKey, values),
+    }
+    return pd.DataFrame(results).T
+
+def _mergeDataPasportsInMemory(sirena_path: str, boarding_path: str) -> pd.DataFrame:
+    """mergeDataPasports с загрузкой обоих файлов целиком"""
+    df_sirena = data_extracting.extractSirenaExportFixed(sirena_path, usecols=merging.SIRENA_PASPORTS_COLUMNS)
+    df_boarding = pd.read_csv(boarding_path, sep=';', dtype=str, usecols=merging.BOARDING_PASPORTS_COLUMNS)
+    return merging.mergeDataPasports(df_sirena, df_boarding)[0]
+
+def _mergeDataPasportsOutOfCore(sirena_path: str, boarding_path: str, work_dir: str, n_shards: int, chunksize: int,
+                                workers: int) -> pd.DataFrame:
+    """mergeDataPasportsChunked с чтением файлов по частям; результат читается с диска только для подсчёта строк"""
+    sirena_chunks = data_extracting.iterFixedWidth(sirena_path, data_extracting.SIRENA_COLSPECS,
+                                                   data_extracting.SIRENA_ROW_LENGTH,
+                                                   usecols=merging.SIRENA_PASPORTS_COLUMNS, chunksize=chunksize)
+    boarding_chunks = pd.read_csv(boarding_path, sep=';', dtype=str, usecols=merging.BOARDING_PASPORTS_COLUMNS,
+                                  chunksize=chunksize)
+    output_dir, _ = merging.mergeDataPasportsChunked(sirena_chunks, boarding_chunks, work_dir, n_shards=n_shards,
+                                                     workers=workers)
+    return pd.read_parquet(output_dir, columns=['PassengerDocument'])
+
+def benchmarkMergeDataPasports(sirena_path: str, boarding_path: str, n_shards: int = 16, chunksize: int = 1_000_000,
+                               workers=(1,)) -> pd.DataFrame:
+    """
+    Сравнение mergeDataPasports в памяти и по шардам на диске (mergeDataPasportsChunked)
+
+    Args:
+        sirena_path (str): Путь к Sirena-export-fixed.tab
+        boarding_path (str): Путь к BoardingData.csv
+        n_shards (int): Количество шардов
+        chunksize (int): Количество строк в одной части при чтении
+        workers: Варианты количества процессов для обработки шардов
+    """
+    results = {'mergeDataPasports': measure(_mergeDataPasportsInMemory, sirena_path, boarding_path)}
+    for count in workers:
+        with tempfile.TemporaryDirectory() as work_dir:
+            results[f'mergeDataPasportsChunked(workers={count})'] = measure(
+                _mergeDataPasportsOutOfCore, sirena_path, boarding_path, work_dir, n_shards, chunksize, count)
+    return pd.DataFrame(results).T
+
+# Таблицы хранилища, которые используют слияния merging.py
+_MERGE_TABLES = ['BoardingData', 'PointzAggregator-AirlinesData', 'FrequentFlyerForum-Profiles_Base',
+                 'FrequentFlyerForum-Profiles_Flight', 'FrequentFlyerForum-Profiles_LoyalityProgram',
+                 'Sirena-export-fixed', 'SkyTeam-Exchange']
+
+def _runMerges(store_dir: str, encoded: bool) -> tuple:
+    """mergeLoyality, mergeDataPasports и mergeLoyalityIdNickPasports над таблицами хранилища"""
+    tables = {name: storage.loadTable(store_dir, name) for name in _MERGE_TABLES}
+    if encoded:
+        tables = encoding.encodeTables(tables)
+    forum = tuple(tables[name] for name in _MERGE_TABLES[2:5])
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        loyality = merging.mergeLoyality(tables['SkyTeam-Exchange'], forum, tables['PointzAggregator-AirlinesData'])
+        pasports = merging.mergeDataPasports(tables['Sirena-export-fixed'], tables['BoardingData'])
+        ids = merging.mergeLoyalityIdNickPasports(tables['Sirena-export-fixed'], loyality[2])
+    return tuple(encoding.decodeFrame(df) for df in (*loyality, *pasports, ids))
+
+def benchmarkCategoricalMerges(store_dir: str) -> pd.DataFrame:
+    """
+    Сравнение слияний над строковыми столбцами и над закодированными (encoding.encodeTables)
+
+    Перед замером проверяется совпадение результатов (AssertionError при расхождении).
+    Время закодированного варианта включает построение категорий и кодирование.
+
+    Args:
+        store_dir (str): Директория хранилища storage с таблицами источников
+    """
+    for plain, encoded in zip(_runMerges(store_dir, False), _runMerges(store_dir, True)):
+        pd.testing.assert_frame_equal(plain.reset_index(drop=True).astype(object),
+                                      encoded.reset_index(drop=True).astype(object))
+    results = {
+        'object': measure(_runMerges, store_dir, False),
+        'categorical': measure(_runMerges, store_dir, True),
+    }
+    return pd.DataFrame(results).T
+
+def _baselineExtractFrequentFlyerForumProfiles(path: str) -> tuple:
+    """Исходная реализация extractFrequentFlyerForumProfiles: json_normalize каждого профиля и concat"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    def extractSubtable(name: str) -> pd.DataFrame:
+        df = []
+        for i in range(len(data['Forum Profiles'])):
+            df_ = pd.json_normalize(data['Forum Profiles'][i][name])
+            df_["NickName"] = data['Forum Profiles'][i]['NickName']
+            df.append(df_)
+        return pd.concat(df)
+
+    return extractSubtable("Real Name"), extractSubtable("Registered Flights"), extractSubtable("Loyality Programm")
+
+def benchmarkForumProfiles(path: str, stream: bool = data_extracting.ijson is not None) -> pd.DataFrame:
+    """
+    Сравнение исходного извлечения FrequentFlyerForum-Profiles.json с однопроходным (и потоковым)
+
+    Перед замером проверяется, что таблицы совпадают после приведения к схемам хранилища.
+
+    Args:
+        path (str): Путь к json файлу (например, созданному synthetic_data.generateForumProfiles)
+        stream (bool): Замерить также потоковый разбор через ijson
+    """
+    names = storage.SOURCES['ForumProfiles'][2]
+    for name, baseline, fast in zip(names, _baselineExtractFrequentFlyerForumProfiles(path),
+                                    data_extracting.extractFrequentFlyerForumProfiles(path)):
+        pd.testing.assert_frame_equal(storage.applySchema(baseline, name), storage.applySchema(fast, name))
+    results = {
+        'baseline': measure(_baselineExtractFrequentFlyerForumProfiles, path),
+        'extractFrequentFlyerForumProfiles': measure(data_extracting.extractFrequentFlyerForumProfiles, path),
+    }
+    if stream:
+        results['extractFrequentFlyerForumProfiles(stream)'] = measure(
+            data_extracting.extractFrequentFlyerForumProfiles, path, stream=True)
+    return pd.DataFrame(results).T
+
+def _baselineBoardingData(path: str) -> pd.DataFrame:
+    """Исходное чтение BoardingData.csv с производными столбцами ноутбука и mergeDataPasports"""
+    df = pd.read_csv(path, sep=';')
+    df['PassangerName'] = df['PassengerLastName'] + ' ' + df['PassengerFirstName']
+    df['TicketNumber'] = df['TicketNumber'].apply(lambda col: None if col == 'Not presented' else col)
+    return df
+
+def benchmarkBoardingData(path: str, chunksize: int = 1_000_000) -> pd.DataFrame:
+    """
+    Сравнение pd.read_csv (с производными столбцами) и extractBoardingData по схеме: целиком и по частям
+
+    Перед замером проверяется совпадение PassangerName, пропусков TicketNumber, даты и времени рейса
+    (AssertionError при расхождении).
+
+    Args:
+        path (str): Путь к csv файлу (например, созданному synthetic_data.generateDataset)
+        chunksize (int): Размер части для чтения по частям
+    """
+    expected = _baselineBoardingData(path)
+    typed = data_extracting.extractBoardingData(path, typed=True)
+    pd.testing.assert_series_equal(typed['PassangerName'], expected['PassangerName'].astype(object))
+    pd.testing.assert_series_equal(typed['TicketNumber'].isna(), expected['TicketNumber'].isna())
+    pd.testing.assert_series_equal(typed['FlightDate'].dt.strftime('%Y-%m-%d'), expected['FlightDate'].astype(object))
+    pd.testing.assert_series_equal((typed['FlightTime'] + pd.Timestamp(0)).dt.strftime('%H:%M'),
+                                   expected['FlightTime'].astype(object))
+    del expected, typed
+
+    results = {
+        'read_csv': measure(_baselineBoardingData, path),
+        'extractBoardingData(typed)': measure(data_extracting.extractBoardingData, path, typed=True),
+        f'extractBoardingData(typed, chunksize={chunksize})': measure(data_extracting.extractBoardingData, path,
+                                                                      typed=True, chunksize=chunksize),
+    }
+    return pd.DataFrame(results).T
+
+def _scanFlightsOf(flights: pd.DataFrame, ids: pd.DataFrame, column: str, keys: list) -> pd.DataFrame:
+    """Полёты людей по ключам перебором с булевыми масками (как в ноутбуке)"""
+    found = []
+    for position, key in enumerate(keys):
+        people = ids.loc[ids[column] == key, 'ID'].dropna().unique()
+        found.append(flights[flights['ID'].isin(people)].assign(query=position))
+    return pd.concat(found, ignore_index=True)
+
+def _indexFlightsOf(directory: str, column: str, keys: list) -> pd.DataFrame:
+    """Открытие сохранённого индекса и пакетный запрос flightsOf"""
+    return query.QueryIndex(directory).flightsOf(column, keys)
+
+def benchmarkQueryIndex(flights: pd.DataFrame, ids: pd.DataFrame, directory: str, column: str = 'FFKey',
+                        n_keys: int = 1000, seed: int = 0) -> pd.DataFrame:
+    """
+    Сравнение поиска полётов по ключам масками и через индекс query (с открытием индекса)
+
+    Перед замером проверяется совпадение результатов (AssertionError при расхождении).
+
+    Args:
+        flights (pd.DataFrame): Результат этапа flights
+        ids (pd.DataFrame): Результат mergeLoyalityIdNickPasports
+        directory (str): Директория для индекса
+        column (str): Столбец ids, по которому ищутся полёты
+        n_keys (int): Количество ключей в запросе
+        seed (int): Зерно выбора ключей
+    """
+    start = time.perf_counter()
+    query.buildIndex(directory, flights, ids)
+    build_time = time.perf_counter() - start
+    values = ids[column].dropna().drop_duplicates()
+    keys = values.sample(min(n_keys, len(values)), random_state=seed).tolist()
+
+    columns = ['query'] + list(flights.columns)
+    expected = _scanFlightsOf(flights, ids, column, keys)[columns].astype(str)
+    found = _indexFlightsOf(directory, column, keys)[columns].astype(str)
+    pd.testing.assert_frame_equal(found.sort_values(columns, ignore_index=True),
+                                  expected.sort_values(columns, ignore_index=True))
+    del expected, found
+
+    results = {
+        'scan': measure(_scanFlightsOf, flights, ids, column, keys),
+        'QueryIndex.flightsOf': measure(_indexFlightsOf, directory, column, keys),
+    }
+    results = pd.DataFrame(results).T
+    results['build_time'] = [None, build_time]
+    return results
+
+_RECONCILE_KEY = ['Flight', 'Date', 'Ticket']
+
+def _baselineReconcile(df_sirena: pd.DataFrame, df_boarding: pd.DataFrame, df_pass: pd.DataFrame) -> pd.DataFrame:
+    """Сверка попарными внешними слияниями по (рейс, дата, билет) с indicator, как делается вручную"""
+    sirena = df_sirena[['Flight', 'DepartDate', 'e-Ticket', 'TravelDoc']].set_axis(
+        [*_RECONCILE_KEY, 'Document'], axis=1).assign(in_sirena=True)
+    boarding = df_boarding[['FlightNumber', 'FlightDate', 'TicketNumber', 'PassengerDocument']].set_axis(
+        [*_RECONCILE_KEY, 'Document'], axis=1).assign(in_boarding=True)
+    boarding_pass = df_pass[['flight_number', 'flight_date', 'ticket_number']].set_axis(
+        _RECONCILE_KEY, axis=1).assign(in_pass=True)
+    merged = pd.merge(sirena, boarding, on=_RECONCILE_KEY, how='outer', suffixes=('_sirena', '_boarding'))
+    merged = pd.merge(merged, boarding_pass, on=_RECONCILE_KEY, how='outer')
+    flags = ['in_sirena', 'in_boarding', 'in_pass']
+    merged[flags] = merged[flags].notna()
+    merged['conflict'] = merged['Document_sirena'].notna() & merged['Document_boarding'].notna() & \
+        (merged['Document_sirena'] != merged['Document_boarding'])
+    return merged
+
+def benchmarkReconcile(store_dir: str) -> pd.DataFrame:
+    """
+    Сравнение сверки внешними слияниями и reconciliation.reconcile по таблицам хранилища storage
+
+    Перед замером проверяется, что для строк с номером билета наличие ключей в источниках и ключи
+    с разными документами совпадают (AssertionError при расхождении).
+
+    Args:
+        store_dir (str): Директория хранилища с Sirena-export-fixed, BoardingData и YourBoardingPassDotAero
+    """
+    df_sirena = storage.loadTable(store_dir, 'Sirena-export-fixed')
+    df_boarding = storage.loadTable(store_dir, 'BoardingData')
+    df_pass = storage.loadTable(store_dir, 'YourBoardingPassDotAero')
+
+    ticketed = (df_sirena[df_sirena['e-Ticket'].notna()],
+                df_boarding[df_boarding['TicketNumber'] != 'Not presented'],
+                df_pass[df_pass['ticket_number'].notna()])
+    flags = ['in_sirena', 'in_boarding', 'in_pass']
+    expected = _baselineReconcile(*ticketed).groupby(_RECONCILE_KEY)[[*flags, 'conflict']].any()
+    summary, _ = reconciliation.reconcile(*ticketed)
+    found = summary.assign(conflict=summary['conflicts'].str.contains('Document')).set_index(_RECONCILE_KEY)
+    pd.testing.assert_frame_equal(found[[*flags, 'conflict']].sort_index(), expected.sort_index())
+
+    results = {
+        'outer merge': measure(_baselineReconcile, df_sirena, df_boarding, df_pass),
+        'reconcile': measure(reconciliation.reconcile, df_sirena, df_boarding, df_pass),
+    }
+    return pd.DataFrame(results).T
+
+def _baselineScheduled(df_timetable: pd.DataFrame, legs: pd.DataFrame, year: int = 2017) -> pd.Series:
+    """Проверка полётов по расписанию построчным циклом по интервалам рейса"""
+    intervals = {}
+    for row in zip(df_timetable['Flight'], df_timetable['Validity'], df_timetable['Days'], df_timetable['From_Code'],
+                   df_timetable['To_Code']):
+        flight, validity, days, origin, destination = row
+        intervals.setdefault(flight.replace(' ', '').upper(), []).append(
+            (*timetable.parseValidity(validity, year), timetable.parseDays(days), origin, destination))
+    result = []
+    for flight, date, origin, destination in zip(legs['Flight'], legs['Date'], legs['From'], legs['To']):
+        candidates = intervals.get(flight)
+        if candidates is None:
+            result.append(None)
+            continue
+        day = int(np.datetime64(date, 'D').astype(np.int64))
+        result.append(any(start <= day <= end and days >> (day + 3) % 7 & 1 and origin == departure
+                          and destination == arrival for start, end, days, departure, arrival in candidates))
+    return pd.Series(result, index=legs.index, dtype='boolean', name='Scheduled')
+
+def _vectorizedScheduled(df_timetable: pd.DataFrame, legs: pd.DataFrame) -> pd.Series:
+    """Построение индекса расписания и проверка всех полётов одним вызовом"""
+    return timetable.flagFlights(timetable.buildTimetable(df_timetable), legs)
+
+def benchmarkTimetable(n_legs: int = 1_000_000, n_flights: int = 10_000, seed: int = 0) -> pd.DataFrame:
+    """
+    Сравнение построчной проверки полётов по расписанию и timetable.scheduledOn на синтетических данных
+
+    Полёты берутся по рейсам расписания (synthetic_data.generateTimetable) на случайные даты 2017 года;
+    у 10% полётов случайный маршрут, у 5% - рейс, которого нет в расписании. Перед замером проверяется
+    совпадение результатов (AssertionError при расхождении).
+    """
+    df_timetable = synthetic_data.generateTimetable(n_flights, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    rows = df_timetable.iloc[rng.integers(0, len(df_timetable), n_legs)]
+    airports = np.array(synthetic_data.AIRPORTS, dtype=object)
+    noise = rng.random(n_legs) < 0.1
+    legs = pd.DataFrame({
+        'Flight': np.where(rng.random(n_legs) < 0.05, 'XX0000', rows['Flight'].to_numpy()),
+        'Date': synthetic_data.randomDates(rng, n_legs).astype(object),
+        'From': np.where(noise, airports[rng.integers(0, len(airports), n_legs)], rows['From_Code'].to_numpy()),
+        'To': rows['To_Code'].to_numpy(),
+    })
+    pd.testing.assert_series_equal(_vectorizedScheduled(df_timetable, legs), _baselineScheduled(df_timetable, legs))
+
+    results = {
+        'loop': measure(_baselineScheduled, df_timetable, legs),
+        'scheduledOn': measure(_vectorizedScheduled, df_timetable, legs),
+    }
+    return pd.DataFrame(results).T
+
+def _withoutWarnings(func, *args, **kwargs):
+    """Вызов func без вывода предупреждений (их выдают исходные слияния merging.py)"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return func(*args, **kwargs)
+
+def _gitCommit() -> str | None:
+    """Текущий коммит репозитория (None вне git)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmarkSuite(work_dir: str, scales=(1, 10, 100), n_people: int = 1000, seed: int = 0,
+                   output: str | None = None, **dataset_kwargs) -> pd.DataFrame:
+    """
+    Замер всех функций извлечения и слияния на синтетических данных разного масштаба
+
+    Для каждого масштаба synthetic_data.generateDataset создаёт файлы в work_dir/x<масштаб> (если их ещё нет),
+    каждая функция извлечения из storage.SOURCES замеряется на своём файле, слияния - на извлечённых таблицах.
+
+    Args:
+        work_dir (str): Директория для синтетических данных
+        scales: Масштабы; масштаб 1 - n_people людей
+        n_people (int): Количество людей при масштабе 1
+        seed (int): Зерно генератора синтетических данных
+        output (str | None): Путь для сохранения результатов в json (для compareResults)
+        **dataset_kwargs: Параметры synthetic_data.generateDataset (presence, conflicts и т. д.)
+
+    Returns:
+        pd.DataFrame: scale, function, rows, wall_time, peak_rss_mb, rows_per_sec
+    """
+    results = []
+    for scale in scales:
+        data_dir = os.path.join(work_dir, f'x{scale}')
+        if not os.path.exists(os.path.join(data_dir, 'Airports.csv')):
+            synthetic_data.generateDataset(data_dir, n_people=n_people * scale, seed=seed, **dataset_kwargs)
+
+        tables = {}
+        for source, (func, filename, names, kwargs) in storage.SOURCES.items():
+            path = os.path.join(data_dir, filename)
+            if not os.path.exists(path):
+                continue
+            results.append({'scale': scale, 'function': f'data_extracting.{func.__name__}',
+                            **measure(func, path, **kwargs)})
+            result = storage.loadSource(data_dir, os.path.join(data_dir, 'store'), source)
+            tables.update(zip(names, result if isinstance(result, tuple) else (result,)))
+
+        forum = tuple(tables[name] for name in storage.SOURCES['ForumProfiles'][2])
+        sirena, boarding = tables['Sirena-export-fixed'], tables['BoardingData']
+        loyality = _withoutWarnings(merging.mergeLoyality, tables['SkyTeam-Exchange'], forum,
+                                    tables['PointzAggregator-AirlinesData'].copy())
+        merges = {
+            'merging.mergeLoyality': (merging.mergeLoyality, tables['SkyTeam-Exchange'], forum,
+                                      tables['PointzAggregator-AirlinesData']),
+            'merging.mergeDataPasports': (merging.mergeDataPasports, sirena, boarding),
+            'merging.mergeLoyalityIdNickPasports': (merging.mergeLoyalityIdNickPasports, sirena, loyality[2]),
+        }
+        for name, (func, *args) in merges.items():
+            results.append({'scale': scale, 'function': name, **measure(_withoutWarnings, func, *args)})
+        with tempfile.TemporaryDirectory() as shards_dir:
+            results.append({'scale': scale, 'function': 'merging.mergeDataPasportsChunked',
+                            **measure(_mergeDataPasportsOutOfCore, os.path.join(data_dir, 'Sirena-export-fixed.tab'),
+                                      os.path.join(data_dir, 'BoardingData.csv'), shards_dir, 16, 1_000_000, 1)})
+
+    df = pd.DataFrame(results)
+    if output is not None:
+        metadata = {
+            'commit': _gitCommit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'n_people': n_people,
+            'seed': seed,
+            'dataset': {key: repr(value) for key, value in dataset_kwargs.items()},
+        }
+        with open(output, 'w') as f:
+            json.dump({'metadata': metadata, 'results': df.to_dict('records')}, f, indent=1)
+    return df
+
+def loadResults(path: str) -> pd.DataFrame:
+    """Результаты benchmarkSuite, сохранённые в json"""
+    with open(path, 'r') as f:
+        return pd.DataFrame(json.load(f)['results'])
+
+def compareResults(baseline: str, current: str) -> pd.DataFrame:
+    """
+    Сравнение двух запусков benchmarkSuite
+
+    Args:
+        baseline (str): Путь к json с результатами до изменения
+        current (str): Путь к json с результатами после изменения
+
+    Returns:
+        pd.DataFrame: Время и пиковая память обоих запусков по (scale, function) и их отношения (current / baseline)
+    """
+    columns = ['wall_time', 'peak_rss_mb']
+    df = pd.merge(loadResults(baseline)[['scale', 'function', *columns]],
+                  loadResults(current)[['scale', 'function', *columns]],
+                  on=['scale', 'function'], how='outer', suffixes=('_baseline', '_current'))
+    for column in columns:
+        df[f'{column}_ratio'] = df[f'{column}_current'] / df[f'{column}_baseline']
+    return df.set_index(['scale', 'function'])
+
+def main(argv: list | None = None):
+    parser = argparse.ArgumentParser(description='Замеры функций извлечения и слияния на синтетических данных')
+    parser.add_argument('--work-dir', required=True, help='директория для синтетических данных')
+    parser.add_argument('--scale', type=int, action='append', dest='scales',
+                        help='масштаб данных (можно указать несколько раз); по умолчанию 1, 10 и 100')
+    parser.add_argument('--people', type=int, default=1000, help='количество людей при масштабе 1')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора синтетических данных')
+    parser.add_argument('--output', help='путь для сохранения результатов в json')
+    parser.add_argument('--compare', help='json с результатами предыдущего запуска для сравнения')
+    args = parser.parse_args(argv)
+    if args.compare and not args.output:
+        parser.error('для --compare нужен --output')
+
+    report = benchmarkSuite(args.work_dir, scales=args.scales or (1, 10, 100), n_people=args.people, seed=args.seed,
+                            output=args.output)
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(report)
+        if args.compare:
+            print(compareResults(args.compare, args.output))
+
+if __name__ == '__main__':
+    main()
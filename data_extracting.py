@@ -1,287 +1,772 @@
 """Модуль функций для извлечения данных из файлов в DataFrame"""
 import pandas as pd
 import json
-import xml.etree.ElementTree as ET
+from lxml import etree
 import re
 import zipfile
 import os
-import shutil
+import io
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import openpyxl
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.io.parsers import TextParser
 import pdfplumber
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+import pyarrow.compute as pc
 
-def extractBoardingData(path: str) -> pd.DataFrame:
-    return pd.read_csv(path, sep=';')
+from profiling import profiled
 
-def extractAirlinesData(path: str)  -> pd.DataFrame:
-    tree = ET.parse(path)
-    root = tree.getroot()
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
-    # Извлечение данных о пользователях, картах и активностях
-    data = []
-    for user in root.findall('user'):
+BOARDING_COLUMNS = ['PassengerFirstName', 'PassengerSecondName', 'PassengerLastName', 'PassengerSex',
+                    'PassengerBirthDate', 'PassengerDocument', 'BookingCode', 'TicketNumber', 'Baggage', 'FlightDate',
+                    'FlightTime', 'FlightNumber', 'CodeShare', 'Destination']
+# Схема extractBoardingData(typed=True): коды рейсов и аэропортов и столбцы с немногими значениями - категории,
+# остальные - строки (документы и билеты с ведущими нулями); 'Not presented' и пустое поле - пропуск
+BOARDING_CATEGORIES = ['PassengerSex', 'Baggage', 'FlightNumber', 'CodeShare', 'Destination']
+BOARDING_NA_VALUES = ['', 'Not presented']
+
+def _boardingConvertOptions() -> pa_csv.ConvertOptions:
+    column_types = {column: pa.dictionary(pa.int32(), pa.string()) if column in BOARDING_CATEGORIES else pa.string()
+                    for column in BOARDING_COLUMNS}
+    column_types['FlightDate'] = pa.timestamp('ns')
+    return pa_csv.ConvertOptions(column_types=column_types, null_values=BOARDING_NA_VALUES, strings_can_be_null=True)
+
+def _typedBoardingData(table: pa.Table) -> pd.DataFrame:
+    """
+    Таблица pyarrow -> DataFrame: FlightTime - timedelta64 от начала суток, PassangerName - 'Фамилия Имя'
+
+    Производные столбцы вычисляются в pyarrow до перевода строк в объекты Python.
+    """
+    departure = pc.strptime(pc.binary_join_element_wise('1970-01-01 ', table['FlightTime'], ''),
+                            format='%Y-%m-%d %H:%M', unit='s')
+    flight_time = pc.cast(pc.cast(pc.cast(departure, pa.int64()), pa.duration('s')), pa.duration('ns'))
+    table = table.set_column(table.schema.get_field_index('FlightTime'), 'FlightTime', flight_time)
+    table = table.append_column('PassangerName', pc.binary_join_element_wise(
+        table['PassengerLastName'], table['PassengerFirstName'], ' '))
+    return table.to_pandas()
+
+def _iterBoardingData(path: str, chunksize: int, typed: bool):
+    if not typed:
+        with pd.read_csv(path, sep=';', chunksize=chunksize) as reader:
+            yield from reader
+        return
+    reader = pa_csv.open_csv(path, parse_options=pa_csv.ParseOptions(delimiter=';'),
+                             convert_options=_boardingConvertOptions())
+    batches, rows = [], 0
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        while rows >= chunksize:
+            table = pa.Table.from_batches(batches)
+            yield _typedBoardingData(table.slice(0, chunksize))
+            batches, rows = table.slice(chunksize).to_batches(), rows - chunksize
+    if rows:
+        yield _typedBoardingData(pa.Table.from_batches(batches))
+
+@profiled
+def extractBoardingData(path: str, typed: bool = False, chunksize: int | None = None):
+    """
+    Функция для извлечения данных из BoardingData.csv
+
+    Args:
+        path (str): Путь к csv файлу (или файловый объект)
+        typed (bool): Если True - столбцы по схеме (BOARDING_CATEGORIES - категории, прочие - строки),
+            'Not presented' - пропуск, FlightDate - datetime64, FlightTime - timedelta64, добавляется PassangerName;
+            файл читается парсером pyarrow (многопоточным, если читается целиком)
+        chunksize (int | None): Если задан - итератор таблиц по chunksize строк (категории у каждой таблицы свои);
+            в памяти одновременно только одна часть файла
+
+    Returns:
+        pd.DataFrame | Iterator[pd.DataFrame]: Столбцы BoardingData.csv (и PassangerName при typed)
+    """
+    if chunksize is not None:
+        return _iterBoardingData(path, chunksize, typed)
+    if not typed:
+        return pd.read_csv(path, sep=';')
+
+    table = pa_csv.read_csv(path, read_options=pa_csv.ReadOptions(use_threads=True),
+                            parse_options=pa_csv.ParseOptions(delimiter=';'), convert_options=_boardingConvertOptions())
+    return _typedBoardingData(table)
+
+def iterAirlinesData(path: str, chunksize: int | None = 100_000):
+    """
+    Потоковое извлечение данных из PointzAggregator-AirlinesData.xml
+
+    Файл разбирается через iterparse, каждый элемент <user> очищается сразу после обработки,
+    а активности накапливаются в буферах столбцов, поэтому память не зависит от размера файла.
+
+    Args:
+        path (str): Путь к xml файлу
+        chunksize (int | None): Количество строк в одном DataFrame; None - весь файл одним DataFrame
+
+    Yields:
+        pd.DataFrame: Очередная порция активностей
+    """
+    columns = ['uid', 'first_name', 'last_name', 'card_number', 'bonus_program',
+               'activity_type', 'code', 'date', 'departure', 'arrival', 'fare']
+    buffers = {column: [] for column in columns}
+    size = 0
+
+    for _, user in etree.iterparse(path, events=('end',), tag='user'):
         uid = user.get('uid')
-        first_name = user.find('name').get('first')
-        last_name = user.find('name').get('last')
-        
-        for card in user.find('cards').findall('card'):
+        name = user.find('name')
+        first_name = name.get('first')
+        last_name = name.get('last')
+
+        for card in user.find('cards').iterfind('card'):
             card_number = card.get('number')
             bonus_program = card.find('bonusprogramm').text
-            
-            for activity in card.find('activities').findall('activity'):
-                activity_type = activity.get('type')
-                code = activity.find('Code').text
-                date = activity.find('Date').text
-                departure = activity.find('Departure').text
-                arrival = activity.find('Arrival').text
-                fare = activity.find('Fare').text
-                
-                data.append({
-                    'uid': uid,
-                    'first_name': first_name,
-                    'last_name': last_name,
-                    'card_number': card_number,
-                    'bonus_program': bonus_program,
-                    'activity_type': activity_type,
-                    'code': code,
-                    'date': date,
-                    'departure': departure,
-                    'arrival': arrival,
-                    'fare': fare
-                })
-
-    return pd.DataFrame(data)
-
-def extractSirenaExportFixed(path: str) -> pd.DataFrame:
-    colspecs = [
-        (0, 60),    # PaxName
-        (60, 72),   # PaxBirthDate
-        (72, 84),   # DepartDate
-        (84, 96),   # DepartTime
-        (96, 108),  # ArrivalDate
-        (108, 120), # ArrivalTime
-        (120, 126), # Flight
-        (126, 132), # CodeSh
-        (132, 138), # From
-        (138, 144), # Dest
-        (144, 150), # Code
-        (150, 168), # e-Ticket
-        (168, 180), # TravelDoc
-        (180, 186), # Seat
-        (186, 192), # Meal
-        (192, 198), # TrvCls
-        (198, 204), # Fare
-        (204, 216), # Baggage
-        (216, 276), # PaxAdditionalInfo
-        (276, 357)  # AgentInfo
-    ]
-    return pd.read_fwf(path, colspecs=colspecs)
-
-def extractSkyTeamExchange(path: str) -> pd.DataFrame:
-    with open(path, 'r') as yaml_file:
-        data = {'Date': [], 'FlightNumber': [], 'FFKey': [], 'Class': [], 'Fare': [], 'From': [], 'Status': [], 'To' : []}
-        current_date = None
-        flight_number = None
-        flight_from = None
-        flight_status = None
-        flight_to = None
-        ff = []
-
-        for line in yaml_file:
-            line = line.strip().strip(':')
-            # Проверяем, является ли строка датой
-            if re.match(r"^\s*\'(\d{4}-\d{2}-\d{2})\'$", line):
-                current_date = line.strip('\'').strip()
-                continue
 
-            # Проверяем, является ли строка номером рейса
-            if re.match(r"^\s*(\w{2}\d{4})$", line):
-                flight_number = line.strip()
-                continue
+            for activity in card.find('activities').iterfind('activity'):
+                fields = {child.tag: child.text for child in activity}
+                buffers['uid'].append(uid)
+                buffers['first_name'].append(first_name)
+                buffers['last_name'].append(last_name)
+                buffers['card_number'].append(card_number)
+                buffers['bonus_program'].append(bonus_program)
+                buffers['activity_type'].append(activity.get('type'))
+                buffers['code'].append(fields['Code'])
+                buffers['date'].append(fields['Date'])
+                buffers['departure'].append(fields['Departure'])
+                buffers['arrival'].append(fields['Arrival'])
+                buffers['fare'].append(fields['Fare'])
+                size += 1
 
-            match = re.match(r"^\s*(\w{2}\s\d+):\s\{CLASS:\s(\w),\sFARE:\s(\w{6})\}$", line)
-            if match:
-                ff_key, class_value, fare_value = match.groups()
-                ff.append((ff_key, class_value, fare_value))
-                continue
+                if chunksize is not None and size == chunksize:
+                    yield pd.DataFrame(buffers)
+                    buffers = {column: [] for column in columns}
+                    size = 0
 
-            if re.match(r"^\s*FROM:\s\w{3}$", line):
-                flight_from = line.split(': ')[1].strip()
-                continue
-            
-            if re.match(r"^\s*STATUS:\s\w+$", line):
-                flight_status = line.split(': ')[1].strip()
+        # Освобождаем обработанного пользователя и уже разобранных соседей
+        user.clear()
+        while user.getprevious() is not None:
+            del user.getparent()[0]
+
+    if size > 0:
+        yield pd.DataFrame(buffers)
+
+@profiled
+def extractAirlinesData(path: str)  -> pd.DataFrame:
+    return next(iterAirlinesData(path, chunksize=None), pd.DataFrame())
+
+SIRENA_COLSPECS = [
+    (0, 60),    # PaxName
+    (60, 72),   # PaxBirthDate
+    (72, 84),   # DepartDate
+    (84, 96),   # DepartTime
+    (96, 108),  # ArrivalDate
+    (108, 120), # ArrivalTime
+    (120, 126), # Flight
+    (126, 132), # CodeSh
+    (132, 138), # From
+    (138, 144), # Dest
+    (144, 150), # Code
+    (150, 168), # e-Ticket
+    (168, 180), # TravelDoc
+    (180, 186), # Seat
+    (186, 192), # Meal
+    (192, 198), # TrvCls
+    (198, 204), # Fare
+    (204, 216), # Baggage
+    (216, 276), # PaxAdditionalInfo
+    (276, 357)  # AgentInfo
+]
+SIRENA_ROW_LENGTH = 357
+
+def _decodeColumn(values: np.ndarray, encoding: str) -> np.ndarray:
+    """Декодирование S-массива; ASCII декодируется приведением типа без вызова Python на каждый элемент"""
+    if encoding in ('ascii', 'utf-8'):
+        try:
+            return values.astype(np.str_)
+        except UnicodeDecodeError:
+            pass
+    return np.strings.decode(values, encoding)
+
+def iterFixedWidth(path: str, colspecs: list, row_length: int, usecols: list | None = None, encoding: str = 'utf-8',
+                   chunksize: int | None = 1_000_000):
+    """
+    Чтение файла с записями фиксированной длины и строкой заголовка по частям
+
+    Файл отображается в память как массив записей, столбцы берутся как S-представления без копирования;
+    декодируются и очищаются от пробелов только запрошенные столбцы. Ширины столбцов задаются в байтах.
+
+    Args:
+        path (str): Путь к файлу
+        colspecs (list): Границы столбцов [(начало, конец), ...]
+        row_length (int): Длина записи без символа перевода строки
+        usecols (list | None): Имена нужных столбцов; None - все столбцы
+        encoding (str): Кодировка значений
+        chunksize (int | None): Количество строк в одном DataFrame; None - весь файл одним DataFrame
+
+    Yields:
+        pd.DataFrame: Строковые столбцы в порядке файла, пустые значения - NaN; индекс сквозной по файлу
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+    newline = b'\r\n' if header.endswith(b'\r\n') else b'\n'
+    names = [header[start:end].decode(encoding).strip() for start, end in colspecs]
+    selected = [i for i, name in enumerate(names) if usecols is None or name in usecols]
+    missing = set(usecols or []) - set(names)
+    if missing:
+        raise ValueError(f'Нет столбцов {sorted(missing)} в {path}')
+
+    record_length = row_length + len(newline)
+    body = os.path.getsize(path) - len(header)
+    count, rest = divmod(body, record_length)
+    if rest not in (0, row_length):
+        raise ValueError(f'Длина данных {path} не кратна длине записи {record_length}')
+
+    record = np.dtype({
+        'names': [names[i] for i in selected],
+        'formats': [f'S{colspecs[i][1] - colspecs[i][0]}' for i in selected],
+        'offsets': [colspecs[i][0] for i in selected],
+        'itemsize': record_length,
+    })
+    last = None
+    if rest:
+        # Последняя запись без перевода строки
+        with open(path, 'rb') as f:
+            f.seek(len(header) + count * record_length)
+            last = np.frombuffer(f.read() + newline, dtype=record)
+    total = count + (1 if rest else 0)
+
+    def rows(start, stop):
+        # Каждая часть отображается отдельно, чтобы прочитанные страницы файла освобождались вместе с частью
+        parts = []
+        if start < count:
+            parts.append(np.memmap(path, dtype=record, mode='r', offset=len(header) + start * record_length,
+                                   shape=(min(stop, count) - start,)))
+        if stop > count:
+            parts.append(last)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    step = chunksize or total
+    for start in range(0, total, step) if total else [0]:
+        chunk = rows(start, min(start + step, total)) if total else np.empty(0, dtype=record)
+        data = {}
+        for name in record.names:
+            values = np.strings.strip(chunk[name]) if len(chunk) else np.array([], dtype='S1')
+            column = _decodeColumn(values, encoding).astype(object)
+            column[values == b''] = np.nan
+            data[name] = column
+        yield pd.DataFrame(data, columns=list(record.names), index=pd.RangeIndex(start, start + len(chunk)))
+
+@profiled
+def readFixedWidth(path: str, colspecs: list, row_length: int, usecols: list | None = None, encoding: str = 'utf-8') -> pd.DataFrame:
+    """Чтение всего файла с записями фиксированной длины одним DataFrame (см. iterFixedWidth)"""
+    return next(iterFixedWidth(path, colspecs, row_length, usecols=usecols, encoding=encoding, chunksize=None))
+
+# FF ключ в PaxAdditionalInfo: 'FF#SU 123456' -> 'SU 123456'
+FF_KEY_PATTERN = re.compile(r'FF#(\w\w\s\d+)')
+
+@profiled
+def extractFFKey(values: pd.Series) -> pd.Series:
+    """
+    Векторизованное выделение FF ключа из столбца PaxAdditionalInfo
+
+    Returns:
+        pd.Series: FF ключ без префикса 'FF#', NaN если ключа нет
+    """
+    return values.astype(object).str.extract(FF_KEY_PATTERN, expand=False)
+
+def _numberString(value) -> str:
+    """Номер строкой; целое число, прочитанное как float (123.0), пишется без '.0'"""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+def forumFFKey(loyality: pd.DataFrame) -> pd.Series:
+    """
+    FF ключи программ лояльности форума в том же виде, что и в остальных источниках ('SU 123')
+
+    Number бывает float64 (json, если у части профилей нет программ), int64, Int64 (хранилище storage)
+    или строкой, поэтому ключ не зависит от способа чтения FrequentFlyerForum-Profiles.json.
+
+    Args:
+        loyality (pd.DataFrame): Таблица программ лояльности extractFrequentFlyerForumProfiles (programm, Number)
+
+    Returns:
+        pd.Series: 'программа номер'; NaN, если нет программы или номера
+    """
+    numbers = loyality['Number'].astype(object).map(_numberString, na_action='ignore')
+    keys = loyality['programm'].astype(object) + ' ' + numbers
+    # Пропуски Int64 (pd.NA) приводятся к NaN, как у остальных столбцов FF ключей
+    return keys.where(keys.notna(), np.nan).rename('FFKey')
+
+@profiled
+def extractSirenaExportFixed(path: str, usecols: list | None = None, ff_key: bool = False) -> pd.DataFrame:
+    """
+    Функция для извлечения данных из Sirena-export-fixed.tab
+
+    Args:
+        path (str): Путь к файлу
+        usecols (list | None): Имена нужных столбцов; None - все столбцы
+        ff_key (bool): Если True - добавляется столбец FFKey из PaxAdditionalInfo (см. extractFFKey)
+    """
+    read_cols = usecols
+    if ff_key and usecols is not None and 'PaxAdditionalInfo' not in usecols:
+        read_cols = [*usecols, 'PaxAdditionalInfo']
+    df = readFixedWidth(path, SIRENA_COLSPECS, SIRENA_ROW_LENGTH, usecols=read_cols)
+    if ff_key:
+        df['FFKey'] = extractFFKey(df['PaxAdditionalInfo'])
+        if read_cols is not usecols:
+            df = df.drop(columns='PaxAdditionalInfo')
+    return df
+
+# Единый шаблон строки SkyTeam-Exchange.yaml: дата / рейс / FF ключ / FROM / STATUS / TO
+_EXCHANGE_LINE = re.compile(
+    r"'(?P<date>\d{4}-\d{2}-\d{2})'"
+    r"|(?P<flight>\w{2}\d{4})"
+    r"|(?P<ff>\w{2}\s\d+):\s\{CLASS:\s(?P<cls>\w),\sFARE:\s(?P<fare>\w{6})\}"
+    r"|FROM:\s(?P<from>\w{3})"
+    r"|STATUS:\s(?P<status>\w+)"
+    r"|TO:\s(?P<to>\w{3})"
+)
+_EXCHANGE_DATE = re.compile(rb"\s*'\d{4}-\d{2}-\d{2}':?\s*")
+_EXCHANGE_COLUMNS = ['Date', 'FlightNumber', 'FFKey', 'Class', 'Fare', 'From', 'Status', 'To']
+_READ_BLOCK = 1 << 24
+
+def _iterLines(path: str, start: int, end: int):
+    """Строки файла в диапазоне байт [start, end), читаемые крупными блоками"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        tail = b''
+        while remaining > 0:
+            block = f.read(min(_READ_BLOCK, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            block = tail + block
+            cut = block.rfind(b'\n') + 1 if remaining > 0 else len(block)
+            block, tail = block[:cut], block[cut:]
+            yield from block.decode().split('\n')
+        if tail:
+            yield from tail.decode().split('\n')
+
+def _parseSkyTeamExchangeRange(path: str, start: int, end: int) -> pd.DataFrame:
+    """
+    Разбор части файла SkyTeam-Exchange.yaml в диапазоне байт [start, end)
+
+    Диапазон должен начинаться со строки даты (или с начала файла).
+    """
+    rows = []
+    current_date = None
+    flight_number = None
+    flight_from = None
+    flight_status = None
+    ff = []
+    fullmatch = _EXCHANGE_LINE.fullmatch
+
+    for line in _iterLines(path, start, end):
+        match = fullmatch(line.strip().strip(':'))
+        if match is None:
+            continue
+        kind = match.lastgroup
+        if kind == 'date':
+            current_date = match['date']
+        elif kind == 'flight':
+            flight_number = match['flight']
+        elif kind == 'fare':
+            ff.append((match['ff'], match['cls'], match['fare']))
+        elif kind == 'from':
+            flight_from = match['from']
+        elif kind == 'status':
+            flight_status = match['status']
+        else:
+            flight_to = match['to']
+            rows.extend((current_date, flight_number, key, class_value, fare_value, flight_from, flight_status, flight_to)
+                        for key, class_value, fare_value in ff)
+            ff.clear()
+
+    return pd.DataFrame(rows, columns=_EXCHANGE_COLUMNS, dtype=object)
+
+def _snapToExchangeDate(f, offset: int) -> int:
+    """Смещение начала первой строки даты, расположенной не раньше offset"""
+    f.seek(offset)
+    if offset > 0:
+        f.readline()
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line or _EXCHANGE_DATE.fullmatch(line):
+            return position
+
+@profiled
+def extractSkyTeamExchange(path: str, workers: int = 1, typed: bool = False) -> pd.DataFrame:
+    """
+    Функция для извлечения данных из SkyTeam-Exchange.yaml
+
+    Каждая строка разбирается одним скомпилированным шаблоном. При workers > 1 файл делится
+    на диапазоны байт, границы которых сдвигаются на строки дат, и диапазоны разбираются параллельно.
+
+    Args:
+        path (str): Путь к yaml файлу
+        workers (int): Количество процессов
+        typed (bool): Если True - Date приводится к datetime64, Class и Status к category
+
+    Returns:
+        pd.DataFrame: Столбцы Date, FlightNumber, FFKey, Class, Fare, From, Status, To
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        bounds = sorted({0, size} | {_snapToExchangeDate(f, size * i // workers) for i in range(1, workers)})
+
+    if len(bounds) <= 2:
+        df = _parseSkyTeamExchangeRange(path, 0, size)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(_parseSkyTeamExchangeRange, [path] * (len(bounds) - 1), bounds[:-1], bounds[1:]))
+        df = pd.concat(parts, ignore_index=True)
+
+    if typed:
+        df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+        df['Class'] = df['Class'].astype('category')
+        df['Status'] = df['Status'].astype('category')
+    return df
+
+# Поля профиля форума -> таблицы extractFrequentFlyerForumProfiles (в порядке результата)
+FORUM_SUBTABLES = ['Real Name', 'Registered Flights', 'Loyality Programm']
+
+def _flattenRecord(record: dict, prefix: str = '') -> dict:
+    """Плоская запись как в pd.json_normalize: вложенные словари - столбцы 'поле.ключ' после остальных полей"""
+    flat = {}
+    nested = []
+    for key, value in record.items():
+        if isinstance(value, dict):
+            nested.append((key, value))
+        else:
+            flat[prefix + key] = value
+    for key, value in nested:
+        flat.update(_flattenRecord(value, prefix + key + '.'))
+    return flat
+
+class _ColumnBuffer:
+    """
+    Столбцы таблицы списками значений; новые поля добавляются по мере появления (пропуски - NaN)
+
+    Типы столбцов совпадают с concat таблиц профилей: столбец, которого нет хотя бы в одном профиле
+    (в том числе в профиле без записей), получает тип с пропусками - целые становятся float64, bool - object.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.index = []
+        # Количество профилей, в записях которых встретился столбец
+        self.profiles = 0
+        self.seen = {}
+        self.current = set()
+
+    def addColumn(self, name: str):
+        if name not in self.columns:
+            self.columns[name] = [np.nan] * len(self.index)
+        self.current.add(name)
+
+    def append(self, row: dict, position: int):
+        for name in row:
+            self.addColumn(name)
+        for name, values in self.columns.items():
+            values.append(row.get(name, np.nan))
+        self.index.append(position)
+
+    def endProfile(self):
+        """Конец записей профиля; профиль без записей добавляет только столбец NickName, как пустая таблица с ником"""
+        self.addColumn('NickName')
+        for name in self.current:
+            self.seen[name] = self.seen.get(name, 0) + 1
+        self.current = set()
+        self.profiles += 1
+
+    def frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.columns, index=pd.Index(self.index, dtype=np.int64))
+        for name in df.columns:
+            if self.seen.get(name, 0) == self.profiles:
                 continue
-            
-            if re.match(r"^\s*TO:\s\w{3}$", line):
-                flight_to = line.split(': ')[1].strip()
-                for i in ff:
-                    data['Date'].append(current_date)
-                    data['FlightNumber'].append(flight_number)
-                    data['FFKey'].append(i[0])
-                    data['Class'].append(i[1])
-                    data['Fare'].append(i[2])
-                    data['From'].append(flight_from)
-                    data['Status'].append(flight_status)
-                    data['To'].append(flight_to)
-                ff.clear()
-    return pd.DataFrame(data)
-
-def extractFrequentFlyerForumProfiles(path: str):
+            if pd.api.types.is_bool_dtype(df[name]):
+                df[name] = df[name].astype(object)
+            elif pd.api.types.is_integer_dtype(df[name]):
+                df[name] = df[name].astype(np.float64)
+        return df
+
+def iterForumProfiles(path: str, stream: bool = False):
+    """
+    Профили из FrequentFlyerForum-Profiles.json по одному
+
+    Args:
+        path (str): Путь к json файлу
+        stream (bool): Инкрементальный разбор через ijson (документ целиком в памяти не держится)
+    """
+    if not stream:
+        with open(path, 'r') as f:
+            yield from json.load(f)['Forum Profiles']
+        return
+    if ijson is None:
+        raise ImportError('Для stream=True требуется пакет ijson')
+    with open(path, 'rb') as f:
+        yield from ijson.items(f, 'Forum Profiles.item', use_float=True)
+
+@profiled
+def extractFrequentFlyerForumProfiles(path: str, stream: bool = False):
     """
     Функция для извлечения данных из FrequentFlyerForum-Profiles.json;
 
-    Извлекает как систему связанных ником таблиц;
+    Извлекает как систему связанных ником таблиц за один проход по профилям: записи сразу раскладываются
+    по спискам значений столбцов всех трёх таблиц, без json_normalize и concat на каждый профиль.
+    Столбцы, индекс (номер записи внутри профиля) и типы такие же, как при json_normalize и concat профилей:
+    в частности, Number программ лояльности - float64, если хотя бы у одного профиля нет программ
+    (FF ключи из него строит forumFFKey).
+
+    Args:
+        path (str): Путь к json файлу
+        stream (bool): Читать профили потоково через ijson (см. iterForumProfiles)
 
     Returns:
         (pd.DataFrame, pd.DataFrame, pd.DataFrame):  Таблица общей информации, Таблица о полётах, Таблица о программах лояльности
     """
-
-    with open(path, 'r') as f:
-        data = json.load(f)
-
-    def extractSubtable(name: str) -> pd.DataFrame:
-        """Функция для объединения записей json разных пользователей в одну таблицу
-            Args:
-                name (str): Название поля
-        """
-        df = []
-        for i in range(len(data['Forum Profiles'])):
-            df_ = pd.json_normalize(data['Forum Profiles'][i][name])
-            df_["NickName"] = data['Forum Profiles'][i]['NickName']
-
-            df.append(df_)
-        return pd.concat(df)
-    
-    flights_table = extractSubtable("Registered Flights")
-    loyality_table = extractSubtable("Loyality Programm")
-    # documents_table = concat("Travel Documents") # Все - NaN
-    names_table = extractSubtable("Real Name")
- 
+    buffers = {name: _ColumnBuffer() for name in FORUM_SUBTABLES}
+    for profile in iterForumProfiles(path, stream=stream):
+        for name, buffer in buffers.items():
+            records = profile[name]
+            for position, record in enumerate([records] if isinstance(records, dict) else records):
+                row = _flattenRecord(record)
+                row['NickName'] = profile['NickName']
+                buffer.append(row, position)
+            buffer.endProfile()
+    # documents_table = buffers["Travel Documents"] # Все - NaN
+    names_table, flights_table, loyality_table = (buffers[name].frame() for name in FORUM_SUBTABLES)
     return names_table, flights_table, loyality_table,
 
-def extractSkyteamTimetable(path: str) ->pd.DataFrame:
+_TIMETABLE_COLUMNS = ['From','From_Code','To','To_Code','Validity','Days','Dep_Time','Arr_Time','Flight','Aircraft','Travel_Time']
+_TIMETABLE_FIRST_PAGE = 4
+
+def _extractTimetableTables(path: str, page_numbers: list) -> dict:
+    """
+    Выделение таблиц на страницах PDF (выполняется в отдельном процессе)
+
+    Returns:
+        dict: номер страницы -> первая таблица страницы (список строк) или None
+    """
+    result = {}
     with pdfplumber.open(path) as pdf:
-        tables = []
-        info1 = {'From':None, 'From_Code':None, 'To':None,'To_Code':None}
-        info2 = {'From':None, 'From_Code':None, 'To':None,'To_Code':None}
-        
-        for page_number in range(4, len(pdf.pages)):
-            data = []
+        for page_number in page_numbers:
             page = pdf.pages[page_number]
-            # выделение таблицы
             table_objects = page.extract_tables()
+            result[page_number] = table_objects[0] if table_objects else None
+            page.flush_cache()
+    return result
 
-            data_start = 0
-            # Заголовки таблицы
-            if ('FROM:' in table_objects[0][0]):
-                info1['From'] = table_objects[0][0][1]
-                info1['From_Code'] = table_objects[0][0][7]
+def _parseTimetableTable(table: list):
+    """
+    Разбор таблицы одной страницы без учёта заголовков предыдущих страниц
 
-                info2['From'] = table_objects[0][0][11:][1]
-                info2['From_Code'] = table_objects[0][0][11:][7]
+    Returns:
+        (tuple | None, list | None): Заголовки FROM/TO страницы (если есть) и строки вида (сторона, значения);
+            None вместо строк - страница без рейсов
+    """
+    header = None
+    data_start = 0
+    # Заголовки таблицы
+    if ('FROM:' in table[0]):
+        header = (
+            {'From': table[0][1], 'From_Code': table[0][7], 'To': table[1][1], 'To_Code': table[1][7]},
+            {'From': table[0][11:][1], 'From_Code': table[0][11:][7], 'To': table[1][11:][1], 'To_Code': table[1][11:][7]},
+        )
+        data_start = 3
 
-                info1['To'] = table_objects[0][1][1]
-                info1['To_Code'] = table_objects[0][1][7]
+    # Пропускаем пустые таблицы
+    if ('Consult your travel agent for details' in table[data_start]):
+        return header, None
 
-                info2['To'] = table_objects[0][1][11:][1]
-                info2['To_Code'] = table_objects[0][1][11:][7]
-                
-                data_start = 3
+    rows = []
+    for table_object in table:
+        # очистка от пропусков и от лишних данных
+        cleared = list(filter(lambda x: x is not None and x != '' and 'Operated by' not in x, table_object))
+        if (len(cleared) < 7):
+            continue
+        have_left = not (table_object[0] == None or table_object[0] == '')
 
-            # Пропускаем пустые таблицы
-            if ('Consult your travel agent for details' in table_objects[0][data_start]):
-                continue
-        
-            # Проход по таблице
-            for table_object in table_objects[0]:
-                # очистка от пропусков и от лишних данных
-                cleared = list(filter(lambda x: x is not None and x != '' and 'Operated by' not in x, table_object))
-                if (len(cleared) < 7):
-                    continue
-                have_left = True
-                if (table_object[0] == None or table_object[0] == ''):
-                    have_left = False
-
-                data1 = [info1['From'],info1['From_Code'], info1['To'], info1['To_Code']]
-                data2 = [info2['From'],info2['From_Code'], info2['To'], info2['To_Code']]
-
-                if (len(cleared) == 14):
-                    data1.extend(cleared[:7])
-                    data.append(data1)
-
-                    data2.extend(cleared[7:])
-                    data.append(data2)
-                elif have_left:
-                    data1.extend(cleared)
-                    data.append(data1)
-                else:
-                    data2.extend(cleared)
-                    data.append(data2)
-                    
-
-            tables.append(pd.DataFrame(data, columns=['From','From_Code','To','To_Code','Validity','Days','Dep_Time','Arr_Time','Flight','Aircraft','Travel_Time']))
-            page.flush_cache()
+        if (len(cleared) == 14):
+            rows.append((0, cleared[:7]))
+            rows.append((1, cleared[7:]))
+        elif have_left:
+            rows.append((0, cleared))
+        else:
+            rows.append((1, cleared))
+    return header, rows
 
-        return pd.concat(tables)
+def _fileDigest(path: str) -> str:
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
-def extractBoardingPass(path: str, clear_temp = False):
+@profiled
+def extractSkyteamTimetable(path: str, workers: int = 1, cache_dir: str | None = None) -> pd.DataFrame:
     """
-    Функция для обработки всех файлов в архиве
-    
+    Функция для извлечения расписания из Skyteam_Timetable.pdf
+
+    Выделение таблиц (самая долгая часть) выполняется независимо для каждой страницы, поэтому
+    диапазоны страниц раздаются пулу процессов. Заголовки FROM/TO, переходящие между страницами,
+    применяются после этого одним последовательным проходом по уже выделенным таблицам.
+
     Args:
-        clear_temp (bool): Если True - промежуточные разархивированные данные удаляются
-    """
-    def extractOneBoardingPass(filepath):
-        """
-        Функция для извлечения данныx одного файла xlsx из zip
-        """
-        df = pd.read_excel(filepath, header=None)
-        sequence = df.iloc[0, 7]
-        gender = df.iloc[2, 0]
-        passenger_name = df.iloc[2, 1] if not pd.isna(df.iloc[2, 1]) else "Unknown"
-        flight_number = df.iloc[4, 0]
-        departure_city = df.iloc[4, 3]
-        arrival_city = df.iloc[4, 7]
-        aeroport1 = df.iloc[6, 3]
-        aeroport2 = df.iloc[6, 7]
-        flight_date = df.iloc[8, 0]
-        departure_time = df.iloc[8, 2]
-        pnr = df.iloc[12, 1]
-        ticket_number = df.iloc[12, 4]
-        seat = df.iloc[10, 7]
-        gate = df.iloc[6, 1]
-        trvCls = df.iloc[2, 7]
-        return {
-            'sequence': sequence,
-            'gender': gender,
-            'passenger_name': passenger_name,
-            'flight_number': flight_number,
-            'departure_city': departure_city,
-            'arrival_city': arrival_city,
-            'aeroport1': aeroport1,
-            'aeroport2': aeroport2,
-            'flight_date': flight_date,
-            'departure_time': departure_time,
-            'pnr': pnr,
-            'ticket_number': ticket_number,
-            'seat': seat,
-            'gate': gate,
-            'trvCls': trvCls
-        }
-
-    extract_dir = "temp_extract"
-    os.makedirs(extract_dir, exist_ok=True)
+        path (str): Путь к pdf файлу
+        workers (int): Количество процессов
+        cache_dir (str | None): Директория кэша таблиц страниц (ключ - хэш pdf и номер страницы);
+            при повторном запуске, в том числе после исправления разбора, таблицы берутся из кэша
+    """
+    with pdfplumber.open(path) as pdf:
+        page_numbers = list(range(_TIMETABLE_FIRST_PAGE, len(pdf.pages)))
+
+    tables = {}
+    page_cache = None
+    if cache_dir is not None:
+        page_cache = os.path.join(cache_dir, f'{_fileDigest(path)}-{pdfplumber.__version__}')
+        os.makedirs(page_cache, exist_ok=True)
+        for page_number in page_numbers:
+            cached = os.path.join(page_cache, f'{page_number}.json')
+            if os.path.exists(cached):
+                with open(cached, 'r') as f:
+                    tables[page_number] = json.load(f)
+
+    missing = [page_number for page_number in page_numbers if page_number not in tables]
+    if workers > 1 and len(missing) > 1:
+        # Непрерывные диапазоны страниц, по несколько на процесс
+        parts = min(len(missing), workers * 4)
+        ranges = [missing[len(missing) * i // parts: len(missing) * (i + 1) // parts] for i in range(parts)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for extracted in executor.map(_extractTimetableTables, [path] * parts, ranges):
+                tables.update(extracted)
+    elif missing:
+        tables.update(_extractTimetableTables(path, missing))
+
+    if page_cache is not None:
+        for page_number in missing:
+            with open(os.path.join(page_cache, f'{page_number}.json'), 'w') as f:
+                json.dump(tables[page_number], f)
+
+    info1 = {'From':None, 'From_Code':None, 'To':None,'To_Code':None}
+    info2 = {'From':None, 'From_Code':None, 'To':None,'To_Code':None}
+    data = []
+    index = []
+    for page_number in page_numbers:
+        if tables[page_number] is None:
+            continue
+        header, rows = _parseTimetableTable(tables[page_number])
+        if header is not None:
+            info1, info2 = header
+        if rows is None:
+            continue
+        for side, cleared in rows:
+            info = info1 if side == 0 else info2
+            data.append([info['From'], info['From_Code'], info['To'], info['To_Code'], *cleared])
+        # Индекс как у постраничного pd.concat: нумерация с нуля на каждой странице
+        index.extend(range(len(rows)))
+
+    return pd.DataFrame(data, columns=_TIMETABLE_COLUMNS, index=index)
+
+# Ячейки посадочного талона (строка, столбец), из которых извлекаются данные
+BOARDING_PASS_CELLS = {
+    'sequence': (0, 7),
+    'gender': (2, 0),
+    'passenger_name': (2, 1),
+    'flight_number': (4, 0),
+    'departure_city': (4, 3),
+    'arrival_city': (4, 7),
+    'aeroport1': (6, 3),
+    'aeroport2': (6, 7),
+    'flight_date': (8, 0),
+    'departure_time': (8, 2),
+    'pnr': (12, 1),
+    'ticket_number': (12, 4),
+    'seat': (10, 7),
+    'gate': (6, 1),
+    'trvCls': (2, 7)
+}
+BOARDING_PASS_ROWS = 13
+BOARDING_PASS_COLUMNS = 8
+
+def _convertBoardingPassCell(cell):
+    """Преобразование ячейки openpyxl так же, как это делает pd.read_excel"""
+    if cell.value is None:
+        return ''
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+def extractOneBoardingPass(content: bytes) -> dict:
+    """
+    Функция для извлечения данныx одного файла xlsx из zip
+
+    Читается только блок ячеек BOARDING_PASS_ROWS x BOARDING_PASS_COLUMNS в режиме read-only,
+    типы столбцов выводятся тем же TextParser, что и в pd.read_excel.
+
+    Args:
+        content (bytes): Содержимое xlsx файла
+    """
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = [[_convertBoardingPassCell(cell) for cell in row]
+                for row in sheet.iter_rows(max_row=BOARDING_PASS_ROWS, max_col=BOARDING_PASS_COLUMNS)]
+    finally:
+        workbook.close()
+    df = TextParser(rows, header=None, skip_blank_lines=False).read()
+
+    data = {name: df.iloc[row, column] for name, (row, column) in BOARDING_PASS_CELLS.items()}
+    if pd.isna(data['passenger_name']):
+        data['passenger_name'] = "Unknown"
+    return data
+
+def _extractBoardingPassMembers(path: str, names: list) -> list:
+    """Обработка части файлов архива (выполняется в отдельном процессе)"""
     with zipfile.ZipFile(path, 'r') as zip_ref:
-        zip_ref.extractall(extract_dir)
-
-    all_data = []
-    for filename in os.listdir(extract_dir):
-        if filename.endswith(".xlsx"):
-            filepath = os.path.join(extract_dir, filename)
-            data = extractOneBoardingPass(filepath)
-            if data:
-                all_data.append(data)
-
-    df = pd.DataFrame(all_data)
-    if (clear_temp):
-        shutil.rmtree('temp_extract')
-    return df
+        return [extractOneBoardingPass(zip_ref.read(name)) for name in names]
+
+def boardingPassMembers(path: str) -> list:
+    """Имена xlsx файлов посадочных талонов в архиве (в порядке архива)"""
+    with zipfile.ZipFile(path, 'r') as zip_ref:
+        return [info.filename for info in zip_ref.infolist()
+                if '/' not in info.filename and info.filename.endswith(".xlsx")]
+
+@profiled
+def extractBoardingPass(path: str, clear_temp = False, workers: int | None = 1):
+    """
+    Функция для обработки всех файлов в архиве
+
+    Файлы читаются прямо из архива, без распаковки на диск, поэтому функцию можно
+    вызывать одновременно из нескольких процессов.
+
+    Args:
+        clear_temp (bool): Не используется, оставлен для совместимости (промежуточные файлы больше не создаются)
+        workers (int | None): Количество процессов; 1 - без пула процессов (по умолчанию), None - по числу ядер
+    """
+    names = boardingPassMembers(path)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(names) < 2:
+        all_data = _extractBoardingPassMembers(path, names)
+    else:
+        # Несколько частей на процесс, чтобы выровнять нагрузку
+        parts = min(len(names), workers * 4)
+        chunks = [names[i::parts] for i in range(parts)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_extractBoardingPassMembers, [path] * parts, chunks)
+            by_name = {}
+            for chunk, chunk_data in zip(chunks, results):
+                by_name.update(zip(chunk, chunk_data))
+        all_data = [by_name[name] for name in names]
+
+    return pd.DataFrame(all_data)
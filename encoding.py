@@ -0,0 +1,147 @@
+"""Модуль словарного кодирования идентификаторов
+
+Каждому домену идентификаторов (FF ключи, uid, ники, документы, билеты, рейсы, аэропорты) соответствует
+один общий список категорий для всех таблиц. Столбцы переводятся в pd.Categorical с этими категориями,
+поэтому слияния, drop_duplicates и isin в merging.py выполняются над целочисленными кодами,
+а строки восстанавливаются только при выводе результата (decodeFrame).
+Этапы слияния pipeline.py кодируют свои входы и декодируют результаты при сохранении.
+"""
+import numpy as np
+import pandas as pd
+
+from data_extracting import forumFFKey
+
+# Домен -> таблица (имена как в storage.SCHEMAS; 'mergeLoyality' - третья таблица этапа mergeLoyality) -> столбцы
+DOMAINS = {
+    'ffkey': {
+        'SkyTeam-Exchange': ['FFKey'],
+        'PointzAggregator-AirlinesData': ['card_number'],
+        'Sirena-export-fixed': ['FFKey'],
+        'mergeLoyality': ['FFKey'],
+    },
+    'uid': {
+        'PointzAggregator-AirlinesData': ['uid'],
+        'mergeLoyality': ['uid'],
+    },
+    'nickname': {
+        'FrequentFlyerForum-Profiles_Base': ['NickName'],
+        'FrequentFlyerForum-Profiles_Flight': ['NickName'],
+        'FrequentFlyerForum-Profiles_LoyalityProgram': ['NickName'],
+        'mergeLoyality': ['NickName'],
+    },
+    'document': {
+        'Sirena-export-fixed': ['TravelDoc'],
+        'BoardingData': ['PassengerDocument'],
+    },
+    'ticket': {
+        'Sirena-export-fixed': ['e-Ticket'],
+        'BoardingData': ['TicketNumber'],
+    },
+    'flight': {
+        'Sirena-export-fixed': ['Flight'],
+        'BoardingData': ['FlightNumber'],
+        'SkyTeam-Exchange': ['FlightNumber'],
+        'PointzAggregator-AirlinesData': ['code'],
+        'FrequentFlyerForum-Profiles_Flight': ['Flight'],
+    },
+    'airport': {
+        'Sirena-export-fixed': ['From', 'Dest'],
+        'SkyTeam-Exchange': ['From', 'To'],
+        'PointzAggregator-AirlinesData': ['departure', 'arrival'],
+        'FrequentFlyerForum-Profiles_Flight': ['Departure.Airport', 'Arrival.Airport'],
+    },
+}
+
+def _asStrings(series: pd.Series) -> pd.Series:
+    """Значения как строки (пропуски сохраняются)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    if pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return series
+    return series.map(str, na_action='ignore')
+
+def _extraValues(tables: dict) -> dict:
+    """
+    Значения, которые появляются только внутри слияний, но должны входить в категории домена:
+    FF ключи форума (программа + номер, mergeLoyality) и 'nan' - билет Sirena без номера после apply(str)
+    """
+    extra = {'ticket': [pd.Series(['nan'])]}
+    loyality = tables.get('FrequentFlyerForum-Profiles_LoyalityProgram')
+    if loyality is not None:
+        extra['ffkey'] = [forumFFKey(loyality)]
+    return extra
+
+def _domainColumns(tables: dict, domain: str) -> list:
+    """(таблица, столбец) домена, которые есть в tables"""
+    return [(table, column) for table, names in DOMAINS[domain].items() if table in tables
+            for column in names if column in tables[table].columns]
+
+def _factorizeColumns(tables: dict, domain: str) -> dict:
+    """Коды и уникальные значения каждого столбца домена"""
+    return {(table, column): pd.factorize(_asStrings(tables[table][column]))
+            for table, column in _domainColumns(tables, domain)}
+
+def _categoriesOf(uniques: list) -> pd.Index:
+    return pd.Index(pd.concat([pd.Series(values, dtype=object) for values in uniques], ignore_index=True)
+                    .drop_duplicates()).sort_values()
+
+def buildCategories(tables: dict) -> dict:
+    """
+    Общие категории каждого домена по всем таблицам
+
+    Args:
+        tables (dict): Имя таблицы (как в storage.SCHEMAS) -> DataFrame
+
+    Returns:
+        dict: Домен -> pd.Index отсортированных уникальных значений
+    """
+    extra = _extraValues(tables)
+    categories = {}
+    for domain in DOMAINS:
+        uniques = [unique for _, unique in _factorizeColumns(tables, domain).values()]
+        uniques += [values.dropna().unique() for values in extra.get(domain, [])]
+        if uniques:
+            categories[domain] = _categoriesOf(uniques)
+    return categories
+
+def encodeTables(tables: dict, categories: dict | None = None) -> dict:
+    """
+    Перевод столбцов-идентификаторов в pd.Categorical с общими категориями домена
+
+    Каждый столбец нумеруется один раз (factorize), после чего коды переводятся в коды общих категорий
+    по его уникальным значениям. Сортированные категории сохраняют порядок строк при сортировке
+    и выборе моды (filterSuspicious).
+
+    Args:
+        tables (dict): Имя таблицы -> DataFrame
+        categories (dict | None): Результат buildCategories; None - строится по tables
+
+    Returns:
+        dict: Имя таблицы -> копия DataFrame с закодированными столбцами (прочие таблицы без изменений)
+    """
+    extra = _extraValues(tables) if categories is None else {}
+    encoded = dict(tables)
+    for domain in DOMAINS:
+        factorized = _factorizeColumns(tables, domain)
+        if categories is not None and domain in categories:
+            domain_categories = categories[domain]
+        elif categories is None and (factorized or domain in extra):
+            uniques = [unique for _, unique in factorized.values()]
+            uniques += [values.dropna().unique() for values in extra.get(domain, [])]
+            domain_categories = _categoriesOf(uniques)
+        else:
+            continue
+        for (table, column), (codes, unique) in factorized.items():
+            if encoded[table] is tables[table]:
+                encoded[table] = tables[table].copy()
+            positions = domain_categories.get_indexer(unique)
+            codes = np.where(codes >= 0, positions[codes], -1) if len(positions) else codes
+            encoded[table][column] = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(domain_categories))
+    return encoded
+
+def decodeFrame(df: pd.DataFrame) -> pd.DataFrame:
+    """Восстановление строк во всех категориальных столбцах (пропуски - NaN)"""
+    categorical = [column for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return df
+    return df.astype({column: object for column in categorical})
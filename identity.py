@@ -0,0 +1,190 @@
+"""Модуль связывания идентификаторов одного человека (паспорт, билет, FF ключ, uid, ник) в кластеры"""
+import numpy as np
+import pandas as pd
+
+from data_extracting import extractFFKey, forumFFKey
+
+# Виды идентификаторов в порядке приоритета при выборе ID кластера
+IDENTIFIER_KINDS = ['passport', 'uid', 'nickname', 'ffkey', 'ticket']
+ID_PREFIXES = {'passport': 'pass_', 'uid': 'id_', 'nickname': 'nick_', 'ffkey': 'ff_', 'ticket': 'ticket_'}
+
+class UnionFind:
+    """
+    Система непересекающихся множеств над узлами 0..n-1, хранящаяся в массиве NumPy
+
+    Объединения выполняются пачками: корень с большим номером подвешивается к меньшему,
+    после чего пути сжимаются перескоком указателей. Число проходов растёт логарифмически от длины цепочек.
+    """
+    def __init__(self, n: int):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def _compress(self):
+        while True:
+            grand = self.parent[self.parent]
+            if np.array_equal(grand, self.parent):
+                return
+            self.parent = grand
+
+    def find(self, nodes: np.ndarray | None = None) -> np.ndarray:
+        """Корни узлов (всех, если nodes не задан)"""
+        self._compress()
+        return self.parent.copy() if nodes is None else self.parent[nodes]
+
+    def union(self, left: np.ndarray, right: np.ndarray):
+        """Объединение множеств для каждой пары (left[i], right[i])"""
+        left = np.asarray(left, dtype=np.int64)
+        right = np.asarray(right, dtype=np.int64)
+        while len(left):
+            self._compress()
+            root_left = self.parent[left]
+            root_right = self.parent[right]
+            differ = root_left != root_right
+            if not differ.any():
+                return
+            left, right = left[differ], right[differ]
+            high = np.maximum(root_left[differ], root_right[differ])
+            low = np.minimum(root_left[differ], root_right[differ])
+            np.minimum.at(self.parent, high, low)
+
+def _asStrings(values: np.ndarray) -> pd.Series:
+    """Значения как строки (пропуски сохраняются), чтобы '123' и 123 считались одним идентификатором"""
+    values = pd.Series(values, dtype=object)
+    if pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        return values
+    return values.map(str, na_action='ignore')
+
+def _edge(kind_left: str, left: pd.Series, kind_right: str, right: pd.Series) -> tuple:
+    return kind_left, left.to_numpy(dtype=object), kind_right, right.to_numpy(dtype=object)
+
+def identityEdges(df_sirena: pd.DataFrame | None = None, df_boarding: pd.DataFrame | None = None,
+                  df_airlines: pd.DataFrame | None = None, df_forum: tuple | None = None,
+                  df_exchange: pd.DataFrame | None = None) -> list:
+    """
+    Рёбра графа идентичности из таблиц источников (в форматах функций data_extracting)
+
+    - Sirena: паспорт - билет, паспорт - FF ключ
+    - BoardingData: паспорт - билет (кроме 'Not presented')
+    - PointzAggregator: FF ключ (номер карты) - uid
+    - FrequentFlyerForum: FF ключ (программа и номер, forumFFKey) - ник; записи без номера пропускаются
+    - SkyTeam-Exchange: FF ключи без связей
+
+    Returns:
+        list: Рёбра (вид, значения, вид, значения); пропуски в значениях означают отдельный узел без связи
+    """
+    edges = []
+    if df_sirena is not None:
+        ff_key = df_sirena['FFKey'] if 'FFKey' in df_sirena.columns else extractFFKey(df_sirena['PaxAdditionalInfo'])
+        edges.append(_edge('passport', df_sirena['TravelDoc'], 'ticket', df_sirena['e-Ticket'].astype(object)))
+        edges.append(_edge('passport', df_sirena['TravelDoc'], 'ffkey', ff_key))
+    if df_boarding is not None:
+        tickets = df_boarding['TicketNumber'].astype(object).where(df_boarding['TicketNumber'] != 'Not presented')
+        edges.append(_edge('passport', df_boarding['PassengerDocument'], 'ticket', tickets))
+    if df_airlines is not None:
+        cards = df_airlines['card_number'] if 'card_number' in df_airlines.columns else df_airlines['FFKey']
+        edges.append(_edge('ffkey', cards, 'uid', df_airlines['uid']))
+    if df_forum is not None:
+        programs = forumFFKey(df_forum[2])
+        known = programs.notna()
+        edges.append(_edge('ffkey', programs[known], 'nickname', df_forum[2]['NickName'][known]))
+    if df_exchange is not None:
+        edges.append(_edge('ffkey', df_exchange['FFKey'], 'ffkey', df_exchange['FFKey']))
+    return edges
+
+def resolveIdentities(edges: list) -> pd.DataFrame:
+    """
+    Разбиение идентификаторов на кластеры (компоненты связности графа идентичности)
+
+    Значения каждого вида кодируются целыми числами, после чего компоненты находятся UnionFind за один проход по рёбрам.
+
+    Args:
+        edges (list): Рёбра из identityEdges
+
+    Returns:
+        pd.DataFrame: Столбцы kind (category), value, cluster_id (int32, от 0)
+    """
+    values_by_kind = {kind: [] for kind in IDENTIFIER_KINDS}
+    for kind_left, left, kind_right, right in edges:
+        values_by_kind[kind_left].append(left)
+        values_by_kind[kind_right].append(right)
+
+    # Сквозная нумерация: коды вида kind сдвинуты на количество значений предыдущих видов
+    offset = 0
+    uniques = {}
+    codes_by_kind = {}
+    for kind, parts in values_by_kind.items():
+        if not parts:
+            continue
+        codes, unique = pd.factorize(_asStrings(np.concatenate(parts)))
+        codes_by_kind[kind] = np.where(codes >= 0, codes + offset, -1)
+        uniques[kind] = unique
+        offset += len(unique)
+
+    union_find = UnionFind(offset)
+    position = dict.fromkeys(IDENTIFIER_KINDS, 0)
+    for kind_left, left, kind_right, right in edges:
+        codes_left = codes_by_kind[kind_left][position[kind_left]:position[kind_left] + len(left)]
+        position[kind_left] += len(left)
+        codes_right = codes_by_kind[kind_right][position[kind_right]:position[kind_right] + len(right)]
+        position[kind_right] += len(right)
+        linked = (codes_left >= 0) & (codes_right >= 0)
+        union_find.union(codes_left[linked], codes_right[linked])
+
+    roots = union_find.find()
+    _, cluster_ids = np.unique(roots, return_inverse=True)
+    kinds = np.concatenate([np.full(len(unique), kind, dtype=object) for kind, unique in uniques.items()])
+    values = np.concatenate([np.asarray(unique, dtype=object) for unique in uniques.values()])
+    return pd.DataFrame({
+        'kind': pd.Categorical(kinds, categories=IDENTIFIER_KINDS),
+        'value': values,
+        'cluster_id': cluster_ids.astype(np.int32),
+    })
+
+def extendIdentities(identities: pd.DataFrame, edges: list) -> pd.DataFrame:
+    """
+    Кластеры после добавления новых рёбер к уже найденным
+
+    Каждый прежний кластер заменяется рёбрами от его значений к первому значению кластера, поэтому компоненты
+    совпадают с resolveIdentities по всем рёбрам сразу, а исходные таблицы не нужны. Номера кластеров
+    могут отличаться от полного пересчёта.
+
+    Args:
+        identities (pd.DataFrame): Результат resolveIdentities
+        edges (list): Новые рёбра из identityEdges
+
+    Returns:
+        pd.DataFrame: Столбцы kind (category), value, cluster_id (int32, от 0)
+    """
+    anchors = identities.drop_duplicates('cluster_id').set_index('cluster_id')
+    clusters = identities['cluster_id'].to_numpy()
+    members = pd.DataFrame({
+        'kind': identities['kind'].astype(object).to_numpy(),
+        'value': identities['value'].to_numpy(dtype=object),
+        'anchor_kind': anchors['kind'].astype(object).reindex(clusters).to_numpy(),
+        'anchor_value': anchors['value'].reindex(clusters).to_numpy(dtype=object),
+    })
+    previous = [(kind, group['value'].to_numpy(), anchor_kind, group['anchor_value'].to_numpy())
+                for (kind, anchor_kind), group in members.groupby(['kind', 'anchor_kind'], sort=False)]
+    return resolveIdentities(previous + edges)
+
+def clusterSummary(identities: pd.DataFrame) -> pd.DataFrame:
+    """
+    Сводка по кластерам: количество идентификаторов каждого вида, ID и признак неоднозначности
+
+    ID строится как в mergeLoyalityIdNickPasports: 'pass_' + паспорт, иначе 'id_' + uid, иначе 'nick_' + ник
+    (наименьшее значение вида). Кластер неоднозначен, если в нём несколько uid или ников - так же,
+    как таблица bad в mergeLoyality отмечает FF ключи, которыми пользуются разные uid.
+
+    Returns:
+        pd.DataFrame: Индекс cluster_id; столбцы по видам, ID, ambiguous
+    """
+    counts = pd.crosstab(identities['cluster_id'], identities['kind'], dropna=False)
+    counts = counts.reindex(columns=IDENTIFIER_KINDS, fill_value=0)
+    counts.columns = [f'n_{kind}' for kind in IDENTIFIER_KINDS]
+
+    # Первый по приоритету вид, затем наименьшее значение
+    ordered = identities.sort_values(['cluster_id', 'kind', 'value'])
+    first = ordered.drop_duplicates('cluster_id').set_index('cluster_id')
+    prefixes = first['kind'].astype(object).map(ID_PREFIXES)
+    counts['ID'] = (prefixes + first['value'].astype(str)).reindex(counts.index)
+    counts['ambiguous'] = (counts['n_uid'] > 1) | (counts['n_nickname'] > 1)
+    return counts
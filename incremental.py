@@ -0,0 +1,456 @@
+"""Модуль инкрементального обновления хранилища по дописанным исходным файлам
+
+Источники, которые только растут (BoardingData.csv - новые строки, YourBoardingPassDotAero.zip - новые файлы,
+SkyTeam-Exchange.yaml - новые даты), хранят отметку (watermark) последнего извлечения: смещение в байтах,
+список файлов архива, последнюю дату. При обновлении извлекаются только новые записи; они дописываются
+частями к таблицам хранилища (storage.appendTable), новые FF ключи - к таблице mergeLoyalityIdNickPasports,
+новые полёты - к таблице flights, новые связи паспорт - билет и FF ключи - к кластерам identity.
+Повторы полётов отсекаются индексами хэшей строк (HashIndex), а не drop_duplicates по всей таблице,
+поэтому время обновления зависит только от объёма новых данных (кластеры identity - от размера их таблицы).
+
+Влияние новых записей на уже обработанные (билет, ставший повторяющимся; новая пара загранпаспорт - паспорт
+для прежних строк Sirena; маршрут рейса, которого не было в Sirena; результаты mergeDataPasports и mergeLoyality)
+не учитывается, поэтому таблица flights после обновления может отличаться от полного запуска; она
+пересчитывается полностью при следующем запуске без обновления.
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import data_extracting
+import identity
+import merging
+import storage
+
+# Источники storage.SOURCES, файлы которых только дописываются
+DELTA_SOURCES = ['BoardingData', 'BoardingPass', 'SkyTeamExchange']
+# Этапы pipeline, к результатам которых дописываются новые записи
+UPDATED_STAGES = DELTA_SOURCES + ['mergeLoyalityIdNickPasports', 'flights', 'identity']
+# Этапы pipeline, которые при обновлении не пересчитываются (до следующего полного запуска)
+DEFERRED_STAGES = ['mergeDataPasports', 'mergeLoyality']
+# Ключи повторов полётов, как drop_duplicates в mergeDataPasports (после passportsStage) и mergeLoyality
+PASPORTS_KEY = ['PassengerDocument', 'FlightNumber', 'Date', 'FlightTime', 'From', 'To', 'TicketNumber']
+LOYALITY_KEY = ['uid', 'FFKey', 'Date', 'Flight', 'From', 'To', 'Fare']
+# Сколько байт в начале файла и перед отметкой сверяется, чтобы убедиться, что файл только дописывался
+_CHECK_BYTES = 1 << 16
+
+def rowHashes(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """64-битные хэши значений columns каждой строки"""
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+class HashIndex:
+    """
+    Множество 64-битных хэшей на диске: отсортированные сегменты .npy, читаемые через отображение в память
+
+    Новые хэши записываются отдельным сегментом; последние сегменты сливаются, пока последний не меньше половины
+    предыдущего. Поэтому каждый хэш переписывается O(log n) раз, а сегментов остаётся O(log n).
+
+    С staged=True добавленные хэши только накапливаются в pending (и учитываются contains) - их записывает
+    журнал обновления вместе с остальными изменениями.
+    """
+    def __init__(self, directory: str, staged: bool = False):
+        self.directory = directory
+        self.staged = staged
+        self.pending = []
+        os.makedirs(directory, exist_ok=True)
+        self.segments = sorted(name for name in os.listdir(directory) if name.endswith('.npy'))
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.directory, name), mmap_mode='r')
+
+    def _write(self, name: str, hashes: np.ndarray):
+        path = os.path.join(self.directory, name)
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, hashes)
+        os.replace(path + '.tmp', path)
+
+    def __len__(self):
+        return sum(len(self._load(name)) for name in self.segments)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """Маска хэшей, которые уже есть в индексе"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        found = np.zeros(len(hashes), dtype=bool)
+        for name in self.segments:
+            segment = self._load(name)
+            if len(segment):
+                positions = np.minimum(np.searchsorted(segment, hashes), len(segment) - 1)
+                found |= segment[positions] == hashes
+        for added in self.pending:
+            found |= np.isin(hashes, added)
+        return found
+
+    def add(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Добавление хэшей
+
+        Returns:
+            np.ndarray: Маска новых хэшей (не было в индексе и не встречались раньше в hashes)
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        new = np.zeros(len(hashes), dtype=bool)
+        new[np.unique(hashes, return_index=True)[1]] = True
+        new &= ~self.contains(hashes)
+        if new.any() and self.staged:
+            self.pending.append(np.sort(hashes[new]))
+        elif new.any():
+            number = int(self.segments[-1][:-4]) + 1 if self.segments else 0
+            self.segments.append(f'{number:06}.npy')
+            self._write(self.segments[-1], np.sort(hashes[new]))
+            self._compact()
+        return new
+
+    def _compact(self):
+        while len(self.segments) > 1:
+            last, previous = self._load(self.segments[-1]), self._load(self.segments[-2])
+            if 2 * len(last) < len(previous):
+                return
+            merged = np.union1d(previous, last)
+            del last, previous
+            self._write(self.segments[-2], merged)
+            os.remove(os.path.join(self.directory, self.segments.pop()))
+
+def _boundaryDigest(path: str, offset: int) -> str:
+    """
+    SHA-256 первых и последних _CHECK_BYTES байт файла до offset
+
+    Полная проверка прежнего содержимого стоила бы чтения всего файла; правка в середине файла не обнаруживается.
+    """
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read(min(offset, _CHECK_BYTES)))
+        start = max(0, offset - _CHECK_BYTES)
+        f.seek(start)
+        digest.update(f.read(offset - start))
+    return digest.hexdigest()
+
+def _fileWatermark(path: str) -> dict:
+    size = os.path.getsize(path)
+    return {'offset': size, 'digest': _boundaryDigest(path, size)}
+
+def _appendedFrom(path: str, watermark: dict) -> int | None:
+    """Смещение начала новых данных; None - файл изменён не только дописыванием"""
+    offset = watermark['offset']
+    if os.path.getsize(path) < offset or _boundaryDigest(path, offset) != watermark['digest']:
+        return None
+    return offset
+
+def sourceWatermark(source: str, path: str, store_dir: str) -> dict:
+    """
+    Отметка источника для текущего содержимого файла (таблица в хранилище должна быть извлечена из него же)
+
+    - BoardingData: смещение конца файла
+    - BoardingPass: список файлов архива
+    - SkyTeamExchange: смещение конца файла и последняя дата
+    """
+    if source == 'BoardingPass':
+        return {'members': data_extracting.boardingPassMembers(path)}
+    watermark = _fileWatermark(path)
+    if source == 'SkyTeamExchange':
+        watermark['last_date'] = storage.loadTable(store_dir, 'SkyTeam-Exchange', columns=['Date'])['Date'].max()
+    return watermark
+
+def _firstExchangeDate(path: str, offset: int) -> str | None:
+    """Дата в первой непустой строке после offset; None - строка не является строкой даты"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if line.strip():
+                if data_extracting._EXCHANGE_DATE.fullmatch(line) is None:
+                    return None
+                return line.strip().strip(b':').strip(b"'").decode()
+    return None
+
+def extractDelta(source: str, path: str, watermark: dict) -> tuple | None:
+    """
+    Извлечение записей, дописанных в файл источника после отметки
+
+    Returns:
+        tuple | None: (pd.DataFrame новых записей в формате функции извлечения, новая отметка);
+            None - файл изменён не только дописыванием, нужно полное извлечение
+    """
+    if source == 'BoardingPass':
+        names = data_extracting.boardingPassMembers(path)
+        known = set(watermark['members'])
+        if not known.issubset(names):
+            return None
+        new = [name for name in names if name not in known]
+        return pd.DataFrame(data_extracting._extractBoardingPassMembers(path, new)), {'members': names}
+
+    offset = _appendedFrom(path, watermark)
+    if offset is None:
+        return None
+    new_watermark = _fileWatermark(path)
+
+    if source == 'BoardingData':
+        with open(path, 'rb') as f:
+            header = f.readline()
+            # Прежний конец файла должен быть концом строки
+            f.seek(max(offset - 1, 0))
+            if offset > len(header) and f.read(1) != b'\n':
+                return None
+            f.seek(max(offset, len(header)))
+            data = f.read(new_watermark['offset'] - max(offset, len(header)))
+        return data_extracting.extractBoardingData(io.BytesIO(header + data)), new_watermark
+
+    # SkyTeamExchange: новые данные - новые даты, каждая позже последней извлечённой
+    new_watermark['last_date'] = watermark['last_date']
+    if offset == new_watermark['offset']:
+        return data_extracting._parseSkyTeamExchangeRange(path, offset, offset), new_watermark
+    first_date = _firstExchangeDate(path, offset)
+    if first_date is None or (watermark['last_date'] is not None and first_date <= watermark['last_date']):
+        return None
+    df = data_extracting._parseSkyTeamExchangeRange(path, offset, new_watermark['offset'])
+    if len(df):
+        new_watermark['last_date'] = df['Date'].max()
+    return df, new_watermark
+
+def _writeJournal(state_dir: str, parts: list, indexes: dict, state: dict):
+    """
+    Фиксация изменений обновления одной точкой: переименованием journal/commit.json
+
+    Части таблиц (уже записанные storage.appendTable(..., pending=True)), новые хэши индексов и state.json
+    сначала пишутся во временные файлы; затем commit.json со списком изменений атомарно появляется на месте
+    и только после этого изменения переносятся (_applyJournal). Сбой до commit.json не меняет ничего
+    (следующее обновление повторяется с прежней отметки), сбой после - доводится при следующем loadState.
+
+    Args:
+        parts (list): Пути частей с суффиксом '.pending'
+        indexes (dict): Имя индекса в state_dir -> HashIndex(..., staged=True)
+        state (dict): Новое состояние
+    """
+    journal = os.path.join(state_dir, 'journal')
+    os.makedirs(journal, exist_ok=True)
+    hashes = {}
+    for name, index in indexes.items():
+        if index.pending:
+            np.save(os.path.join(journal, f'{name}.npy'), np.concatenate(index.pending))
+            hashes[name] = f'{name}.npy'
+    with open(os.path.join(journal, 'state.json'), 'w') as f:
+        json.dump(state, f)
+    commit_path = os.path.join(journal, 'commit.json')
+    with open(commit_path + '.tmp', 'w') as f:
+        json.dump({'parts': parts, 'hashes': hashes}, f)
+    os.replace(commit_path + '.tmp', commit_path)
+    _applyJournal(state_dir)
+
+def _applyJournal(state_dir: str):
+    """
+    Перенос зафиксированных изменений журнала на место; без commit.json журнал отбрасывается
+
+    Каждый шаг можно повторить после сбоя: перенесённая часть пропускается, повторно добавленные хэши
+    уже есть в индексе, state.json заменяется последним.
+    """
+    journal = os.path.join(state_dir, 'journal')
+    commit_path = os.path.join(journal, 'commit.json')
+    if not os.path.exists(commit_path):
+        shutil.rmtree(journal, ignore_errors=True)
+        return
+    with open(commit_path, 'r') as f:
+        commit = json.load(f)
+    for path in commit['parts']:
+        if os.path.exists(path):
+            os.replace(path, path[:-len('.pending')])
+    for name, filename in commit['hashes'].items():
+        HashIndex(os.path.join(state_dir, name)).add(np.load(os.path.join(journal, filename)))
+    if os.path.exists(os.path.join(journal, 'state.json')):
+        os.replace(os.path.join(journal, 'state.json'), os.path.join(state_dir, 'state.json'))
+    shutil.rmtree(journal)
+
+def loadState(state_dir: str) -> dict | None:
+    """Состояние инкрементального обновления (None - не создано); прерванная фиксация обновления доводится"""
+    if os.path.isdir(os.path.join(state_dir, 'journal')):
+        _applyJournal(state_dir)
+    path = os.path.join(state_dir, 'state.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _saveState(state_dir: str, state: dict):
+    path = os.path.join(state_dir, 'state.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+def deltaKey(name: str, key: str) -> str:
+    """
+    Ключ этапа в манифесте pipeline после обновления
+
+    Таблицы источников после дописывания совпадают с полным извлечением и сохраняют свой ключ;
+    дополненные результаты слияний помечаются, чтобы следующий обычный запуск пересчитал их полностью.
+    """
+    return key if name in DELTA_SOURCES else f'{key}-delta'
+
+def canUpdate(state: dict | None, manifest: dict, keys: dict, codes: dict) -> bool:
+    """
+    Можно ли обновить результаты инкрементально
+
+    Нужно, чтобы код этапов и файлы остальных источников не менялись с момента создания состояния,
+    а обновляемые этапы с тех пор не пересчитывались полностью.
+
+    Args:
+        state (dict | None): Результат loadState
+        manifest (dict): Манифест pipeline (ключи выполненных этапов)
+        keys (dict): Текущие ключи этапов pipeline, которые использует обновление
+        codes (dict): Хэши кода тех же этапов
+    """
+    if state is None or state['codes'] != codes or set(state['keys']) != set(keys):
+        return False
+    stable = [name for name in storage.SOURCES if name in keys and name not in DELTA_SOURCES]
+    current = all(manifest['stages'].get(name, {}).get('key') in (state['keys'][name], deltaKey(name, state['keys'][name]))
+                  for name in UPDATED_STAGES)
+    return current and all(keys[name] == state['keys'][name] for name in stable)
+
+def initState(state_dir: str, data_dir: str, store_dir: str, passports: tuple, loyality: tuple, keys: dict,
+              codes: dict):
+    """
+    Создание состояния по результатам полного запуска: отметки источников, индексы хэшей полётов и билетов,
+    маршруты рейсов Sirena и FF ключи паспортов Sirena
+
+    Args:
+        state_dir (str): Директория состояния
+        data_dir (str): Директория с исходными файлами
+        store_dir (str): Директория хранилища
+        passports (tuple): Результат этапа mergeDataPasports
+        loyality (tuple): Результат этапа mergeLoyality
+        keys (dict): Ключи этапов pipeline, которые использует обновление
+        codes (dict): Хэши кода тех же этапов
+    """
+    shutil.rmtree(state_dir, ignore_errors=True)
+    os.makedirs(state_dir)
+    watermarks = {source: sourceWatermark(source, os.path.join(data_dir, storage.SOURCES[source][1]), store_dir)
+                  for source in DELTA_SOURCES}
+
+    sirena = storage.loadTable(store_dir, 'Sirena-export-fixed', columns=merging.SIRENA_PASPORTS_COLUMNS + ['FFKey'])
+    # Маршруты рейсов, к которым mergeDataPasports привязывает строки BoardingData
+    flight_routes = merging.filterSuspicious(merging._sirenaPasports(sirena))
+    flight_routes[merging.FLIGHT_KEY + ['From', 'Dest']].drop_duplicates().to_parquet(
+        os.path.join(state_dir, 'flight_routes.parquet'), index=False)
+    sirena[['TravelDoc', 'FFKey']].dropna().drop_duplicates().to_parquet(
+        os.path.join(state_dir, 'sirena_ffkeys.parquet'), index=False)
+    del sirena
+
+    boarding = merging._boardingPasports(storage.loadTable(store_dir, 'BoardingData',
+                                                           columns=merging.BOARDING_PASPORTS_COLUMNS))
+    tickets = boarding[['TicketNumber']].dropna()
+    HashIndex(os.path.join(state_dir, 'tickets')).add(rowHashes(tickets, ['TicketNumber']))
+    HashIndex(os.path.join(state_dir, 'passports')).add(rowHashes(_passportRows(passports[0]), PASPORTS_KEY))
+    HashIndex(os.path.join(state_dir, 'loyality')).add(rowHashes(loyality[0], LOYALITY_KEY))
+    HashIndex(os.path.join(state_dir, 'ffkeys')).add(rowHashes(loyality[2][['FFKey']].dropna(), ['FFKey']))
+    _saveState(state_dir, {'watermarks': watermarks, 'keys': keys, 'codes': codes})
+
+def _passportRows(df: pd.DataFrame) -> pd.DataFrame:
+    """Строки mergeDataPasports в именах результата passportsStage"""
+    return df.rename(columns={'Dest': 'To', 'FlightDate': 'Date'})
+
+def _passportFlights(state_dir: str, indexes: dict, boarding: pd.DataFrame) -> pd.DataFrame:
+    """Новые полёты по паспортам из новых строк BoardingData (как mergeDataPasports и passportsStage)"""
+    df = merging._boardingPasports(boarding)
+    flight_routes = pd.read_parquet(os.path.join(state_dir, 'flight_routes.parquet'))
+    df = pd.merge(df, flight_routes, on=merging.FLIGHT_KEY, how='left')
+
+    # Повторяющиеся билеты отбрасываются, как frequent_values в mergeDataPasports
+    present = np.flatnonzero(df['TicketNumber'].notna().to_numpy())
+    hashes = rowHashes(df.iloc[present], ['TicketNumber'])
+    tickets = indexes['tickets']
+    repeated = tickets.contains(hashes) | pd.Series(hashes).duplicated(keep=False).to_numpy()
+    tickets.add(hashes)
+    keep = np.ones(len(df), dtype=bool)
+    keep[present[repeated]] = False
+
+    df = _passportRows(df[keep][merging.PASPORTS_COLUMNS].dropna())
+    df = df[indexes['passports'].add(rowHashes(df, PASPORTS_KEY))]
+    flights = df.rename(columns={'FlightNumber': 'Flight'})[['Date', 'From', 'To', 'Flight']]
+    flights.insert(0, 'ID', 'pass_' + df['PassengerDocument'])
+    return flights.assign(Source='passports')
+
+def _newOwners(indexes: dict, store_dir: str, exchange: pd.DataFrame, loyality: tuple) -> pd.DataFrame:
+    """Строки uid, FFKey, NickName (как таблица 3 mergeLoyality) для FF ключей, которых ещё не было"""
+    keys = exchange[['FFKey']].dropna()
+    keys = keys[indexes['ffkeys'].add(rowHashes(keys, ['FFKey']))]
+    forum = storage.loadTable(store_dir, 'FrequentFlyerForum-Profiles_LoyalityProgram',
+                              columns=['NickName', 'programm', 'Number'])
+    forum = pd.DataFrame({'NickName': forum['NickName'], 'FFKey': data_extracting.forumFFKey(forum)})
+    owners = pd.merge(keys.assign(uid=np.nan)[['uid', 'FFKey']], forum, on='FFKey', how='left')
+    return owners[~owners['uid'].isin(loyality[1]['uid'])]
+
+def _loyalityFlights(indexes: dict, exchange: pd.DataFrame, owners: pd.DataFrame, ids: pd.DataFrame) -> pd.DataFrame:
+    """Новые полёты по FF ключам из новых дат SkyTeam-Exchange (как mergeLoyality и flightsStage)"""
+    rows = pd.merge(exchange, owners[['uid', 'FFKey']].drop_duplicates(), on='FFKey', how='left')
+    rows = rows.dropna(subset='Fare').rename(columns={'FlightNumber': 'Flight'})
+    rows = rows[indexes['loyality'].add(rowHashes(rows, LOYALITY_KEY))]
+    flights = pd.merge(rows, ids[['ID', 'FFKey']], on='FFKey', how='left')[['ID', 'Date', 'From', 'To', 'Flight']]
+    return flights.dropna(subset=['ID', 'Date', 'From', 'To']).assign(Source='loyality')
+
+def update(state_dir: str, data_dir: str, store_dir: str, state: dict, loyality: tuple, ids: pd.DataFrame,
+           identities: tuple, keys: dict) -> dict | None:
+    """
+    Инкрементальное обновление: новые записи источников дописываются к таблицам хранилища,
+    новые полёты - к таблице flights, новые связи идентификаторов - к кластерам identity
+
+    Если хотя бы один файл изменён не только дописыванием, ничего не меняется и возвращается None.
+    Части таблиц, индексы хэшей и отметки фиксируются вместе (_writeJournal): после сбоя те же строки
+    не дописываются второй раз.
+
+    Args:
+        state_dir (str): Директория состояния
+        data_dir (str): Директория с исходными файлами
+        store_dir (str): Директория хранилища
+        state (dict): Результат loadState
+        loyality (tuple): Результат этапа mergeLoyality (последнего полного запуска)
+        ids (pd.DataFrame): Текущий результат этапа mergeLoyalityIdNickPasports
+        identities (tuple): Текущий результат этапа identity (кластеры и сводка)
+        keys (dict): Текущие ключи этапов pipeline, которые использует обновление
+
+    Returns:
+        dict | None: 'rows' - количество новых строк по этапам UPDATED_STAGES, 'ids' - дополненная таблица
+            mergeLoyalityIdNickPasports, 'identity' - пересчитанный результат этапа identity
+    """
+    deltas = {}
+    for source in DELTA_SOURCES:
+        delta = extractDelta(source, os.path.join(data_dir, storage.SOURCES[source][1]), state['watermarks'][source])
+        if delta is None:
+            return None
+        deltas[source] = delta
+
+    indexes = {name: HashIndex(os.path.join(state_dir, name), staged=True)
+               for name in ('tickets', 'passports', 'loyality', 'ffkeys')}
+    parts = []
+    rows = {}
+    for source, (df, watermark) in deltas.items():
+        table = storage.SOURCES[source][2][0]
+        if len(df):
+            parts.append(storage.appendTable(df, store_dir, table, pending=True))
+        # Значения в том же виде, что и в хранилище
+        deltas[source] = (storage.applySchema(df, table), watermark)
+        rows[source] = len(df)
+        state['watermarks'][source] = watermark
+
+    exchange = deltas['SkyTeamExchange'][0]
+    owners = _newOwners(indexes, store_dir, exchange, loyality)
+    sirena_ffkeys = pd.read_parquet(os.path.join(state_dir, 'sirena_ffkeys.parquet'))
+    sirena_ffkeys = sirena_ffkeys[sirena_ffkeys['FFKey'].isin(owners['FFKey'])].copy()
+    new_ids = merging.mergeLoyalityIdNickPasports(sirena_ffkeys, owners)
+    ids = pd.concat([ids, new_ids], ignore_index=True)
+    rows['mergeLoyalityIdNickPasports'] = len(new_ids)
+
+    known_owners = pd.concat([loyality[2][['uid', 'FFKey']], owners[['uid', 'FFKey']]])
+    flights = pd.concat([_loyalityFlights(indexes, exchange, known_owners, ids),
+                         _passportFlights(state_dir, indexes, deltas['BoardingData'][0])], ignore_index=True)
+    if len(flights):
+        parts.append(storage.appendTable(flights, store_dir, 'flights', pending=True))
+    rows['flights'] = len(flights)
+
+    # Связи из новых строк BoardingData и новые FF ключи SkyTeam-Exchange
+    clusters = identity.extendIdentities(identities[0], identity.identityEdges(
+        df_boarding=deltas['BoardingData'][0], df_exchange=exchange))
+    rows['identity'] = len(clusters) - len(identities[0])
+
+    state['keys'] = keys
+    _writeJournal(state_dir, parts, indexes, state)
+    return {'rows': rows, 'ids': ids, 'identity': (clusters, identity.clusterSummary(clusters))}
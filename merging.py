@@ -1,7 +1,24 @@
 '''Модуль функций, для слияния данных'''
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
 import pandas as pd
-import re
 
+from data_extracting import extractFFKey, forumFFKey
+from profiling import profiled
+
+# Столбцы Sirena-export-fixed.tab, которые использует mergeDataPasports
+SIRENA_PASPORTS_COLUMNS = ['TravelDoc', 'e-Ticket', 'Flight', 'DepartDate', 'DepartTime', 'From', 'Dest', 'PaxName']
+# Столбцы BoardingData.csv, которые использует mergeDataPasports
+BOARDING_PASPORTS_COLUMNS = ['PassengerDocument', 'FlightNumber', 'FlightDate', 'FlightTime', 'TicketNumber']
+# Ключ рейса, по которому mergeDataPasports сопоставляет полёты
+FLIGHT_KEY = ['FlightDate', 'FlightTime', 'FlightNumber']
+# Столбцы результата mergeDataPasports
+PASPORTS_COLUMNS = ['PassengerDocument', 'FlightNumber', 'FlightDate', 'FlightTime', 'From', 'Dest', 'TicketNumber']
+
+@profiled
 def mergeLoyality(df_exchange :pd.DataFrame, df_forum:tuple, df_airlines:pd.DataFrame):
     """
     Returns: 
@@ -16,8 +33,10 @@ def mergeLoyality(df_exchange :pd.DataFrame, df_forum:tuple, df_airlines:pd.Data
     #ищем людей владеющих одной и той же бонусной программой
     bad = idFKey_df[idFKey_df.duplicated(subset='FFKey')]
     idFKey_df.drop_duplicates(subset='FFKey', inplace=True)
-    user_id = df_forum[2][['NickName', 'programm', 'Number']]
-    user_id['programm'] = user_id['programm']+' '+user_id['Number'].apply(str)
+    user_id = df_forum[2][['NickName']].assign(programm=forumFFKey(df_forum[2]))
+    if isinstance(idFKey_df['FFKey'].dtype, pd.CategoricalDtype):
+        # Закодированные FF ключи (encoding.encodeTables): ключи форума переводятся в те же категории
+        user_id['programm'] = pd.Categorical(user_id['programm'], categories=idFKey_df['FFKey'].cat.categories)
     user_id = user_id[['NickName', 'programm']]
     idFKeyNick_df = pd.merge(idFKey_df, user_id, left_on='FFKey', right_on='programm', how = 'outer')
     idFKeyNick_df['FFKey']= idFKeyNick_df['FFKey'].fillna(idFKeyNick_df['programm'])
@@ -47,6 +66,102 @@ def mergeLoyality(df_exchange :pd.DataFrame, df_forum:tuple, df_airlines:pd.Data
     res.drop_duplicates(subset=['uid','FFKey', 'Date',	'Flight',	'From',	'To',	'Fare'], inplace= True)
     return (res, bad, idFKeyNick_df)
 
+def _groupMode(group_ids: np.ndarray, values: pd.Series, ngroups: int) -> np.ndarray:
+    """
+    Мода значений в каждой группе, как Series.mode()[0]: при равенстве частот - наименьшее значение
+
+    Returns:
+        np.ndarray: Мода для каждой группы (NaN, если в группе нет значений)
+    """
+    pairs = pd.DataFrame({'group': group_ids, 'value': values.to_numpy()}).dropna()
+    counts = pairs.groupby(['group', 'value'], sort=True, observed=True).size().reset_index(name='count')
+    # Устойчивая сортировка сохраняет порядок значений среди равных частот
+    counts = counts.sort_values(['group', 'count'], ascending=[True, False], kind='stable').drop_duplicates('group')
+    mode = np.full(ngroups, np.nan, dtype=object)
+    mode[counts['group'].to_numpy()] = counts['value'].to_numpy()
+    return mode
+
+@profiled
+def filterSuspicious(df: pd.DataFrame, keys: tuple = ('FlightDate', 'FlightTime', 'FlightNumber')) -> pd.DataFrame:
+    """
+    Удаление подозрительных полётов: в каждом рейсе (группе keys) находится самое частое направление (From, Dest);
+    если "частых" записей не меньше, чем остальных, остальные записи рейса удаляются.
+
+    Результат совпадает с groupby(keys).apply(...) с двумя mode()[0]: строки с пропусками в keys отбрасываются,
+    рейсы идут в порядке сортировки ключей, строки внутри рейса - в исходном порядке.
+    """
+    grouped = df.groupby(list(keys), sort=True, dropna=True, observed=True)
+    group_ids = grouped.ngroup()
+    ngroups = grouped.ngroups
+    # Номер группы строк с пропусками в keys - NaN
+    valid = group_ids.notna().to_numpy()
+    group_ids = group_ids[valid].to_numpy().astype(np.intp)
+    df = df[valid]
+
+    most_common_from = _groupMode(group_ids, df['From'], ngroups)
+    most_common_dest = _groupMode(group_ids, df['Dest'], ngroups)
+
+    # Находим "частые" записи; сравнение с NaN (нет моды) даёт False
+    frequent = ((df['From'].to_numpy() == most_common_from[group_ids])
+                & (df['Dest'].to_numpy() == most_common_dest[group_ids]))
+    frequent_count = np.bincount(group_ids, weights=frequent, minlength=ngroups)
+    total_count = np.bincount(group_ids, minlength=ngroups)
+
+    # Условие: частых записей должно быть не меньше, чем подозрительных, иначе рейс остаётся целиком
+    drop_suspicious = frequent_count >= total_count - frequent_count
+    keep = frequent | ~drop_suspicious[group_ids]
+
+    order = np.argsort(group_ids[keep], kind='stable')
+    return df[keep].iloc[order].reset_index(drop=True)
+
+def _keyStrings(values: pd.Series) -> pd.Series:
+    """
+    Номера документов или билетов строками, одинаковыми для любого способа чтения источника
+
+    read_fwf и read_csv дают int64 (float64, если есть пропуски), extractSirenaExportFixed и
+    extractBoardingData(typed=True) - строки; без приведения документы разных источников никогда не равны.
+    Окончание '.0' чисел float64 отбрасывается, пропуск остаётся пропуском; у категорий приводятся категории.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = _keyStrings(pd.Series(values.cat.categories))
+        if categories.is_unique:
+            return values.cat.rename_categories(categories.to_numpy())
+    strings = values.astype(str)
+    if not pd.api.types.is_integer_dtype(values):
+        strings = strings.str.replace(r'\.0$', '', regex=True)
+    return strings.where(values.notna())
+
+def _sirenaPasports(df_sirena: pd.DataFrame) -> pd.DataFrame:
+    """Столбцы Sirena для mergeDataPasports в именах BoardingData"""
+    df_sirena_d = df_sirena[SIRENA_PASPORTS_COLUMNS].rename(columns={
+        'TravelDoc':'PassengerDocument', 'e-Ticket':'TicketNumber', 'Flight' : 'FlightNumber', 'DepartDate':'FlightDate',
+        'DepartTime':'FlightTime'})
+    df_sirena_d['PassengerDocument'] = _keyStrings(df_sirena_d['PassengerDocument'])
+    tickets = _keyStrings(df_sirena_d['TicketNumber'])
+    # Пропуск становится 'nan', как после apply(str); у категорий коды сохраняются
+    if isinstance(tickets.dtype, pd.CategoricalDtype) and 'nan' not in tickets.cat.categories:
+        tickets = tickets.cat.add_categories('nan')
+    df_sirena_d['TicketNumber'] = tickets.fillna('nan')
+    return df_sirena_d
+
+def _boardingPasports(df_boarding: pd.DataFrame) -> pd.DataFrame:
+    """
+    Столбцы BoardingData для mergeDataPasports; 'Not presented' вместо номера билета - пропуск
+
+    Дата и время рейса из extractBoardingData(typed=True) переводятся в строки, как в Sirena;
+    документ и билет - строки _keyStrings.
+    """
+    df_boarding_d = df_boarding[BOARDING_PASPORTS_COLUMNS].copy()
+    tickets = df_boarding_d['TicketNumber']
+    df_boarding_d['TicketNumber'] = _keyStrings(tickets.where(tickets != 'Not presented'))
+    df_boarding_d['PassengerDocument'] = _keyStrings(df_boarding_d['PassengerDocument'])
+    if pd.api.types.is_datetime64_dtype(df_boarding_d['FlightDate']):
+        df_boarding_d['FlightDate'] = df_boarding_d['FlightDate'].dt.strftime('%Y-%m-%d')
+    if pd.api.types.is_timedelta64_dtype(df_boarding_d['FlightTime']):
+        df_boarding_d['FlightTime'] = (df_boarding_d['FlightTime'] + pd.Timestamp(0)).dt.strftime('%H:%M')
+    return df_boarding_d
+
+@profiled
 def mergeDataPasports(df_sirena :pd.DataFrame , df_boarding: pd.DataFrame):
     """
     Объединение базовых данных по паспорту, дате, номеру рейса
@@ -58,35 +173,13 @@ def mergeDataPasports(df_sirena :pd.DataFrame , df_boarding: pd.DataFrame):
         (pd.DataFrame, pd.DataFrame): Данные: ['PassengerDocument, 'FlightNumber', 'FlightDate','FlightTime','From','Dest', 'TicketNumber'] и таблица соответствий загранников и обычных паспортов
     """
     # Выделяем нужные данные
-    df_sirena_d = df_sirena[['TravelDoc', 'e-Ticket','Flight','DepartDate', 'DepartTime', 'From', 'Dest', 'PaxName']]
-    df_sirena_d.rename(columns={'TravelDoc':'PassengerDocument', 'e-Ticket':'TicketNumber', 'Flight' : 'FlightNumber', 'DepartDate':'FlightDate',  'DepartTime':'FlightTime'}, inplace=True)
-    df_sirena_d['TicketNumber'] = df_sirena_d['TicketNumber'].apply(str)
+    df_sirena_d = _sirenaPasports(df_sirena)
     
     # Удаление подозрительных полётов
-    def filter_suspicious(group):
-        most_common_from = group['From'].mode()[0]
-        most_common_dest = group['Dest'].mode()[0]
-        
-        # Находим "частые" и "подозрительные" записи
-        frequent_records = group[(group['From'] == most_common_from) & (group['Dest'] == most_common_dest)]
-        suspicious_records = group[(group['From'] != most_common_from) | (group['Dest'] != most_common_dest)]
-        
-        # Условие: частых записей должно быть как минимум в 5 раз больше, чем подозрительных
-        if len(frequent_records) >= 1 * len(suspicious_records):
-            # Возвращаем только частые записи, подозрительные удаляем
-            return frequent_records
-        else:
-            # Возвращаем всю группу, если условие не выполнено (не удаляем ничего)
-            return group
-
-    # Группируем данные по DepartDate, DepartTime и Flight и применяем фильтрацию
-    filtered_df = df_sirena_d.groupby(['FlightDate', 'FlightTime', 'FlightNumber']).apply(filter_suspicious)
-    # Убираем лишние индексы после группировки
-    filtered_df = filtered_df.reset_index(drop=True)
+    filtered_df = filterSuspicious(df_sirena_d)
     df_sirena_d = filtered_df
 
-    df_boarding_d = df_boarding[['PassengerDocument','FlightNumber', 'FlightDate', 'FlightTime', 'TicketNumber']]
-    df_boarding_d['TicketNumber'] = df_boarding_d['TicketNumber'].apply(lambda col: None if col == 'Not presented' else col)
+    df_boarding_d = _boardingPasports(df_boarding)
 
     # находим все случаи "двойных" документов
     double_docs = pd.merge(df_sirena_d[['TicketNumber','PassengerDocument']], df_boarding_d[['TicketNumber','PassengerDocument']], on=['TicketNumber'], how = 'outer')
@@ -114,21 +207,163 @@ def mergeDataPasports(df_sirena :pd.DataFrame , df_boarding: pd.DataFrame):
     # объединение полётов и чистка дубликатов
     df = pd.concat([df_sirena_d[['PassengerDocument','FlightNumber', 'FlightDate', 'FlightTime', 'From', 'Dest','TicketNumber']], df_boarding_d[['PassengerDocument','FlightNumber', 'FlightDate', 'FlightTime','From', 'Dest', 'TicketNumber']]]).dropna().drop_duplicates()
     
-    df_sirena = pd.merge(df_sirena, double_docs, left_on='TravelDoc', right_on='pass', how='left')
+    df_sirena = pd.merge(df_sirena.assign(TravelDoc=_keyStrings(df_sirena['TravelDoc'])), double_docs,
+                         left_on='TravelDoc', right_on='pass', how='left')
     df_sirena['TravelDoc'] = df_sirena['PassengerDocument'].fillna(df_sirena['TravelDoc'])
     df_sirena = df_sirena.drop('PassengerDocument',axis=1)
     return df, double_docs
 
+def _shardOf(df: pd.DataFrame, columns: list, n_shards: int) -> np.ndarray:
+    """
+    Номер шарда строки по хэшу значений columns (одинаков в любом процессе)
+
+    Значения хэшируются строками _keyStrings: у числа и строки с тем же номером разные хэши,
+    и одна и та же строка из частей с разными типами столбцов попала бы в разные шарды.
+    """
+    keys = pd.DataFrame({column: _keyStrings(df[column]).astype(object) for column in columns})
+    return (pd.util.hash_pandas_object(keys, index=False).to_numpy() % n_shards).astype(np.intp)
+
+def _writeShards(df: pd.DataFrame, shards: np.ndarray, directory: str, part: str):
+    """Запись строк df в файлы directory/<шард>/<part>.parquet (по файлу на каждый непустой шард)"""
+    order = np.argsort(shards, kind='stable')
+    bounds = np.searchsorted(shards[order], np.arange(shards.max(initial=-1) + 2))
+    for shard in np.flatnonzero(np.diff(bounds)):
+        os.makedirs(os.path.join(directory, str(shard)), exist_ok=True)
+        df.iloc[order[bounds[shard]:bounds[shard + 1]]].to_parquet(
+            os.path.join(directory, str(shard), f'{part}.parquet'), index=False)
+
+def _readShard(directory: str, shard: int, prefix: str = '', columns: list | None = None) -> pd.DataFrame:
+    """Все части шарда (файлы, имена которых начинаются с prefix) одним DataFrame"""
+    path = os.path.join(directory, str(shard))
+    names = sorted(name for name in os.listdir(path) if name.startswith(prefix)) if os.path.isdir(path) else []
+    parts = [pd.read_parquet(os.path.join(path, name)) for name in names]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts, ignore_index=True)
+
+def _flightShard(work_dir: str, shard: int, n_ticket_shards: int):
+    """
+    Проход по шарду рейсов: фильтрация подозрительных полётов Sirena, маршруты для BoardingData
+    и раскладка пар (билет, документ) и счётчиков билетов по шардам билетов
+    """
+    sirena = _readShard(os.path.join(work_dir, 'sirena'), shard, columns=SIRENA_PASPORTS_COLUMNS)
+    boarding = _readShard(os.path.join(work_dir, 'boarding'), shard, columns=BOARDING_PASPORTS_COLUMNS)
+    filtered = filterSuspicious(_sirenaPasports(sirena))
+    boarding = _boardingPasports(boarding)
+
+    tickets_dir = os.path.join(work_dir, 'tickets')
+    pairs = {
+        'sirena': filtered[['TicketNumber', 'PassengerDocument']].drop_duplicates(),
+        'boarding': boarding[['TicketNumber', 'PassengerDocument']].dropna().drop_duplicates(),
+    }
+    boarding = pd.merge(boarding, filtered[FLIGHT_KEY + ['From', 'Dest']].drop_duplicates(), on=FLIGHT_KEY, how='left')
+    pairs['counts'] = boarding['TicketNumber'].value_counts().rename_axis('TicketNumber').reset_index()
+    for name, df in pairs.items():
+        _writeShards(df, _shardOf(df, ['TicketNumber'], n_ticket_shards), tickets_dir, f'{name}-{shard}')
+
+    for name, df in (('filtered', filtered), ('boarding', boarding)):
+        os.makedirs(os.path.join(work_dir, name + '_merged', str(shard)), exist_ok=True)
+        df.to_parquet(os.path.join(work_dir, name + '_merged', str(shard), 'part.parquet'), index=False)
+
+def _ticketShard(work_dir: str, shard: int) -> tuple:
+    """
+    Проход по шарду билетов: пары (загранпаспорт, паспорт) с общим билетом и билеты,
+    встречающиеся в BoardingData больше одного раза
+
+    Returns:
+        (pd.DataFrame, np.ndarray): Пары pass, PassengerDocument и повторяющиеся билеты
+    """
+    directory = os.path.join(work_dir, 'tickets')
+    sirena = _readShard(directory, shard, 'sirena-', ['TicketNumber', 'PassengerDocument']).drop_duplicates()
+    boarding = _readShard(directory, shard, 'boarding-', ['TicketNumber', 'PassengerDocument']).drop_duplicates()
+    counts = _readShard(directory, shard, 'counts-', ['TicketNumber', 'count'])
+
+    double_docs = pd.merge(sirena, boarding, on='TicketNumber')
+    double_docs = double_docs.loc[~(double_docs['PassengerDocument_x'] == double_docs['PassengerDocument_y'])].dropna()
+    double_docs = double_docs[['PassengerDocument_x', 'PassengerDocument_y']].drop_duplicates()
+    double_docs.columns = ['pass', 'PassengerDocument']
+
+    totals = counts.groupby('TicketNumber', sort=False)['count'].sum()
+    return double_docs, totals.index[totals > 1].to_numpy()
+
+def _finalShard(work_dir: str, shard: int, output_dir: str, domestic: pd.Series, frequent: np.ndarray) -> int:
+    """Замена загранпаспортов, удаление повторяющихся билетов и запись итоговой части шарда рейсов"""
+    sirena = _readShard(os.path.join(work_dir, 'filtered_merged'), shard, columns=PASPORTS_COLUMNS)
+    boarding = _readShard(os.path.join(work_dir, 'boarding_merged'), shard, columns=PASPORTS_COLUMNS)
+    sirena['PassengerDocument'] = sirena['PassengerDocument'].map(domestic).fillna(sirena['PassengerDocument'])
+    boarding = boarding[~boarding['TicketNumber'].isin(frequent)]
+    df = pd.concat([sirena[PASPORTS_COLUMNS], boarding[PASPORTS_COLUMNS]]).dropna().drop_duplicates()
+    df.to_parquet(os.path.join(output_dir, f'part-{shard:05d}.parquet'), index=False)
+    return len(df)
+
+@profiled
+def mergeDataPasportsChunked(sirena_chunks, boarding_chunks, work_dir: str, output_dir: str | None = None,
+                             n_shards: int = 16, workers: int = 1):
+    """
+    mergeDataPasports без загрузки всех данных в память
+
+    1. Части обоих источников раскладываются на диск по шардам хэша ключа рейса (FlightDate, FlightTime, FlightNumber).
+    2. Каждый шард рейсов обрабатывается отдельно: filterSuspicious и сопоставление маршрутов BoardingData;
+       пары (билет, документ) и счётчики билетов раскладываются по шардам хэша билета.
+    3. По шардам билетов находятся пары загранпаспорт - паспорт и повторяющиеся билеты (малые таблицы).
+    4. Каждый шард рейсов дочищается и записывается частью результата в output_dir.
+
+    Пиковая память определяется размером части и шарда, а не всего набора данных.
+    Отличия от mergeDataPasports: порядок строк результата другой; если загранпаспорту соответствует
+    несколько паспортов, берётся первый из double_docs (mergeDataPasports в этом случае сдвигает строки).
+
+    Args:
+        sirena_chunks: Итерируемые части Sirena-export-fixed.tab (например, iterFixedWidth)
+        boarding_chunks: Итерируемые части BoardingData.csv (например, extractBoardingData(..., chunksize=...),
+            в том числе с typed=True); типы столбцов частей могут различаться
+        work_dir (str): Директория промежуточных шардов (должна быть пустой или отсутствовать)
+        output_dir (str | None): Директория частей результата; None - work_dir/result
+        n_shards (int): Количество шардов
+        workers (int): Количество процессов для обработки шардов
+
+    Returns:
+        (str, pd.DataFrame): Директория частей результата (читается pd.read_parquet) и таблица соответствий
+            загранников и обычных паспортов
+    """
+    output_dir = output_dir or os.path.join(work_dir, 'result')
+    os.makedirs(output_dir, exist_ok=True)
+    for i, chunk in enumerate(sirena_chunks):
+        chunk = chunk[SIRENA_PASPORTS_COLUMNS]
+        sirena_key = chunk[['DepartDate', 'DepartTime', 'Flight']].set_axis(FLIGHT_KEY, axis=1)
+        _writeShards(chunk, _shardOf(sirena_key, FLIGHT_KEY, n_shards), os.path.join(work_dir, 'sirena'), f'part-{i}')
+    for i, chunk in enumerate(boarding_chunks):
+        # Дата и время extractBoardingData(typed=True) - строки, как в Sirena, до хэширования ключа рейса
+        chunk = _boardingPasports(chunk)
+        _writeShards(chunk, _shardOf(chunk, FLIGHT_KEY, n_shards), os.path.join(work_dir, 'boarding'), f'part-{i}')
+
+    shards = range(n_shards)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    mapper = executor.map if executor is not None else map
+    try:
+        list(mapper(_flightShard, repeat(work_dir), shards, repeat(n_shards)))
+        ticket_results = list(mapper(_ticketShard, repeat(work_dir), shards))
+
+        double_docs = pd.concat([result[0] for result in ticket_results], ignore_index=True).drop_duplicates()
+        frequent = np.concatenate([result[1] for result in ticket_results])
+        domestic = double_docs.drop_duplicates('pass').set_index('pass')['PassengerDocument']
+        list(mapper(_finalShard, repeat(work_dir), shards, repeat(output_dir), repeat(domestic), repeat(frequent)))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return output_dir, double_docs
+
+@profiled
 def mergeLoyalityIdNickPasports(df_sirena, df_loyality_merged):
-    def f(col):
-        m =re.search('FF#\w\w\s\d+', str(col))
-        if m:
-            return m.group().replace('FF#','')
-        return None
-    df_sirena['FFKey'] = df_sirena['PaxAdditionalInfo'].apply(f)
+    """
+    Соответствие паспортов, FF ключей, uid и ников
+
+    Если в df_sirena уже есть столбец FFKey (extractSirenaExportFixed(..., ff_key=True)), он используется без пересчёта.
+    """
+    if 'FFKey' not in df_sirena.columns:
+        df_sirena['FFKey'] = extractFFKey(df_sirena['PaxAdditionalInfo'])
     df_sirena_lp = df_sirena[['TravelDoc', 'FFKey']].dropna().drop_duplicates()
     b = pd.merge(df_loyality_merged, df_sirena_lp, on='FFKey', how='outer')
-    b['ID'] = "pass_"+b['TravelDoc']
-    b['ID'] = b['ID'].fillna('id_'+b['uid'])
-    b['ID'] = b['ID'].fillna("nick_"+b['NickName'])
+    b['ID'] = "pass_"+b['TravelDoc'].astype(object)
+    b['ID'] = b['ID'].fillna('id_'+b['uid'].astype(object))
+    b['ID'] = b['ID'].fillna("nick_"+b['NickName'].astype(object))
     return b
\ No newline at end of file
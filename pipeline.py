@@ -0,0 +1,491 @@
+"""Модуль инкрементального запуска всей обработки (извлечение, слияние, подготовка к визуализации) без ноутбука
+
+Пример запуска:
+    python pipeline.py --data-dir Airlines --store data --airports data/Airports.csv --workers 4
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+import anomaly
+import data_extracting
+import encoding
+import identity
+import incremental
+import merging
+import profiling
+import reconciliation
+import routes
+import storage
+import timetable
+import visualization
+
+@dataclass
+class Stage:
+    """
+    Этап обработки
+
+    Функция этапа вызывается как func(*пути к sources, *результаты этапов inputs, **kwargs).
+    """
+    name: str
+    func: callable
+    sources: list = field(default_factory=list)
+    inputs: list = field(default_factory=list)
+    modules: list = field(default_factory=list)
+    kwargs: dict = field(default_factory=dict)
+    # Имена таблиц хранилища storage для результата; None - результат сохраняется в pickle
+    tables: list | None = None
+    # Без исходных файлов этап (и зависящие от него) пропускается, если нужные этапы не указаны явно
+    optional: bool = False
+
+# Извлечения, без исходных файлов которых остальные этапы выполнимы
+OPTIONAL_SOURCES = ['SkyteamTimetable']
+# Модули, которые используют функции слияния (extractFFKey, profiled, encodeTables)
+MERGING_MODULES = [merging, data_extracting, profiling, encoding]
+
+def passportsStage(df_sirena: pd.DataFrame, df_boarding: pd.DataFrame):
+    """
+    Полёты по паспортам и соответствие загранпаспортов, как в разделе 1 ноутбука
+
+    Документы, билеты, рейсы и аэропорты сливаются закодированными (encoding.encodeTables);
+    строки восстанавливаются при сохранении результата.
+    """
+    tables = encoding.encodeTables({'Sirena-export-fixed': df_sirena, 'BoardingData': df_boarding})
+    data1, docs = merging.mergeDataPasports(tables['Sirena-export-fixed'], tables['BoardingData'])
+    data1['ID'] = "pass_" + data1['PassengerDocument'].astype(object)
+    data1.rename(columns={'Dest':'To','FlightDate':'Date'}, inplace=True)
+    return data1, docs
+
+def loyalityStage(df_exchange: pd.DataFrame, df_forum: tuple, df_airlines: pd.DataFrame):
+    """Полёты по программам лояльности, как в разделе 2 ноутбука (над закодированными идентификаторами)"""
+    names = storage.SOURCES['ForumProfiles'][2]
+    tables = encoding.encodeTables({'SkyTeam-Exchange': df_exchange, 'PointzAggregator-AirlinesData': df_airlines,
+                                    **dict(zip(names, df_forum))})
+    return merging.mergeLoyality(tables['SkyTeam-Exchange'], tuple(tables[name] for name in names),
+                                 tables['PointzAggregator-AirlinesData'])
+
+def identityStage(df_sirena: pd.DataFrame, loyality: tuple):
+    """Соответствие ников, uid и паспортов (FF ключи Sirena и mergeLoyality кодируются общими категориями)"""
+    tables = encoding.encodeTables({'Sirena-export-fixed': df_sirena, 'mergeLoyality': loyality[2]})
+    return merging.mergeLoyalityIdNickPasports(tables['Sirena-export-fixed'], tables['mergeLoyality'])
+
+def flightsStage(loyality: tuple, ids: pd.DataFrame, passports: tuple):
+    """
+    Объединение всех данных о полётах, как в разделе 3 ноутбука
+
+    Дополнительно сохраняются номер рейса (Flight) и источник полёта (Source) для правил anomaly.
+    """
+    data = pd.merge(loyality[0], ids[['ID','FFKey']], on='FFKey', how='left')[['ID', 'Date','From','To','Flight']]
+    data = data.dropna(subset=['ID', 'Date','From','To'])
+    data['Source'] = 'loyality'
+    passports = passports[0].rename(columns={'FlightNumber': 'Flight'})[['ID','Date','From','To','Flight']]
+    return pd.concat([data, passports.assign(Source='passports')])
+
+def visualizationStage(airports_path: str, flights: pd.DataFrame):
+    """Подготовка данных о полётах для отрисовки"""
+    return visualization.get_dataframe_for_work(flights, pd.read_csv(airports_path))
+
+def routesStage(prepared: pd.DataFrame):
+    """Рейтинг пассажиров по расстоянию, разрывы маршрутов и матрица перелётов между аэропортами"""
+    legs = routes.sortLegs(prepared)
+    distances = routes.legDistances(legs)
+    return (routes.distanceRanking(legs, distances), routes.itineraryBreaks(legs, distances),
+            *routes.originDestinationCounts(prepared))
+
+def anomalyStage(flights: pd.DataFrame, ids: pd.DataFrame, loyality: tuple, passports: tuple,
+                 df_sirena: pd.DataFrame, df_boarding: pd.DataFrame):
+    """Оценка подозрительности ID по правилам anomaly (маршруты - по самым частым для рейса)"""
+    documents = anomaly.namedDocuments(df_sirena, df_boarding, passports[1])
+    return anomaly.scoreTravellers(flights, ids, documents=documents, bad=loyality[1])
+
+def reconciliationStage(df_sirena: pd.DataFrame, df_boarding: pd.DataFrame, df_pass: pd.DataFrame):
+    """
+    Сверка полётов Sirena, BoardingData и посадочных талонов
+
+    Соответствие загранпаспортов из mergeDataPasports не передаётся: оно само построено по билетам с разными
+    документами и скрыло бы эти расхождения.
+    """
+    return reconciliation.reconcile(df_sirena, df_boarding, df_pass)
+
+def scheduleStage(df_timetable: pd.DataFrame, flights: pd.DataFrame):
+    """Отметка полётов, совпадающих с расписанием Skyteam_Timetable (столбец Scheduled)"""
+    return flights.assign(Scheduled=timetable.flagFlights(timetable.buildTimetable(df_timetable), flights))
+
+def identityGraphStage(df_sirena: pd.DataFrame, df_boarding: pd.DataFrame, df_airlines: pd.DataFrame,
+                       df_forum: tuple, df_exchange: pd.DataFrame):
+    """Кластеры идентификаторов по всем источникам и сводка по кластерам"""
+    identities = identity.resolveIdentities(identity.identityEdges(df_sirena, df_boarding, df_airlines, df_forum, df_exchange))
+    return identities, identity.clusterSummary(identities)
+
+def buildStages(airports_path: str | None = None) -> dict:
+    """
+    Этапы обработки в порядке ноутбука
+
+    Args:
+        airports_path (str | None): Путь к Airports.csv; None - без этапов visualization и routes
+
+    Returns:
+        dict: имя -> Stage
+    """
+    stages = {}
+    for name, (func, filename, tables, kwargs) in storage.SOURCES.items():
+        stages[name] = Stage(name, func, sources=[filename], modules=[data_extracting, storage, profiling],
+                             kwargs=kwargs, tables=tables, optional=name in OPTIONAL_SOURCES)
+
+    stages['mergeDataPasports'] = Stage('mergeDataPasports', passportsStage,
+                                        inputs=['SirenaExport', 'BoardingData'], modules=MERGING_MODULES)
+    stages['mergeLoyality'] = Stage('mergeLoyality', loyalityStage,
+                                    inputs=['SkyTeamExchange', 'ForumProfiles', 'AirlinesData'], modules=MERGING_MODULES)
+    stages['mergeLoyalityIdNickPasports'] = Stage('mergeLoyalityIdNickPasports', identityStage,
+                                                  inputs=['SirenaExport', 'mergeLoyality'], modules=MERGING_MODULES)
+    stages['identity'] = Stage('identity', identityGraphStage,
+                               inputs=['SirenaExport', 'BoardingData', 'AirlinesData', 'ForumProfiles', 'SkyTeamExchange'],
+                               modules=[identity, data_extracting])
+    stages['flights'] = Stage('flights', flightsStage,
+                              inputs=['mergeLoyality', 'mergeLoyalityIdNickPasports', 'mergeDataPasports'],
+                              tables=['flights'])
+    stages['anomaly'] = Stage('anomaly', anomalyStage,
+                              inputs=['flights', 'mergeLoyalityIdNickPasports', 'mergeLoyality', 'mergeDataPasports',
+                                      'SirenaExport', 'BoardingData'],
+                              modules=[anomaly])
+    stages['reconciliation'] = Stage('reconciliation', reconciliationStage,
+                                     inputs=['SirenaExport', 'BoardingData', 'BoardingPass'],
+                                     modules=[reconciliation])
+    stages['schedule'] = Stage('schedule', scheduleStage, inputs=['SkyteamTimetable', 'flights'], modules=[timetable])
+    if airports_path is not None:
+        stages['visualization'] = Stage('visualization', visualizationStage, sources=[airports_path],
+                                        inputs=['flights'], modules=[visualization, profiling])
+        stages['routes'] = Stage('routes', routesStage, inputs=['visualization'], modules=[routes])
+    return stages
+
+def _codeDigest(stage: Stage) -> str:
+    """Хэш кода этапа: функция этапа, её параметры и модули, от которых он зависит"""
+    digest = hashlib.sha256(inspect.getsource(stage.func).encode())
+    digest.update(repr(sorted(stage.kwargs.items())).encode())
+    for module in stage.modules:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def _sourcePath(data_dir: str, source: str) -> str:
+    return source if os.path.isabs(source) or os.path.dirname(source) else os.path.join(data_dir, source)
+
+def missingStages(stages: dict, data_dir: str) -> list:
+    """Необязательные этапы без исходных файлов и этапы, которые от них зависят (в порядке stages)"""
+    missing = []
+    for name, stage in stages.items():
+        absent = stage.optional and not all(os.path.exists(_sourcePath(data_dir, source)) for source in stage.sources)
+        if absent or any(upstream in missing for upstream in stage.inputs):
+            missing.append(name)
+    return missing
+
+def stageKeys(stages: dict, data_dir: str, known_sources: dict | None = None):
+    """
+    Ключи этапов: хэш кода, отпечатков исходных файлов и ключей входных этапов
+
+    Returns:
+        (dict, dict): имя этапа -> ключ, путь к исходному файлу -> отпечаток
+    """
+    known_sources = known_sources or {}
+    fingerprints = {}
+    keys = {}
+
+    def key(name):
+        if name not in keys:
+            stage = stages[name]
+            digest = hashlib.sha256(_codeDigest(stage).encode())
+            for source in stage.sources:
+                path = _sourcePath(data_dir, source)
+                if path not in fingerprints:
+                    fingerprints[path] = storage.sourceFingerprint(path, known_sources.get(path))
+                digest.update(fingerprints[path]['sha256'].encode())
+            for upstream in stage.inputs:
+                digest.update(key(upstream).encode())
+            keys[name] = digest.hexdigest()
+        return keys[name]
+
+    for name in stages:
+        key(name)
+    return keys, fingerprints
+
+def _outputPaths(stage: Stage, cache_dir: str, store_dir: str) -> list:
+    if stage.tables is not None:
+        return [os.path.join(store_dir, f'{table}.parquet') for table in stage.tables]
+    return [os.path.join(cache_dir, f'{stage.name}.pkl')]
+
+def loadOutput(stage: Stage, cache_dir: str, store_dir: str):
+    """Сохранённый результат этапа"""
+    if stage.tables is not None:
+        tables = tuple(storage.loadTable(store_dir, table) for table in stage.tables)
+        return tables if len(tables) > 1 else tables[0]
+    with open(_outputPaths(stage, cache_dir, store_dir)[0], 'rb') as f:
+        return pickle.load(f)
+
+def _decoded(result):
+    """Результат этапа со строками вместо закодированных идентификаторов (encoding.decodeFrame)"""
+    if isinstance(result, tuple):
+        return tuple(_decoded(part) for part in result)
+    return encoding.decodeFrame(result) if isinstance(result, pd.DataFrame) else result
+
+def _saveOutput(stage: Stage, result, cache_dir: str, store_dir: str):
+    result = _decoded(result)
+    if stage.tables is not None:
+        for table, df in zip(stage.tables, result if isinstance(result, tuple) else (result,)):
+            storage.saveTable(df, store_dir, table)
+    else:
+        with open(_outputPaths(stage, cache_dir, store_dir)[0], 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def _rows(result) -> int:
+    if isinstance(result, tuple):
+        return sum(_rows(part) for part in result)
+    return len(result) if isinstance(result, pd.DataFrame) else 0
+
+def runStage(name: str, data_dir: str, cache_dir: str, store_dir: str, airports_path: str | None,
+             profile: bool = False) -> dict:
+    """
+    Выполнение одного этапа (в отдельном процессе): загрузка входов, вызов функции, сохранение результата
+
+    Args:
+        profile (bool): Включить profiling в процессе этапа; записи возвращаются в 'profile'
+
+    Returns:
+        dict: Время выполнения (с), пиковый RSS процесса (МБ) и количество строк результата
+    """
+    stages = buildStages(airports_path)
+    stage = stages[name]
+    if profile:
+        profiling.enable()
+    with profiling.stage(name) as record:
+        arguments = [_sourcePath(data_dir, source) for source in stage.sources]
+        arguments += [loadOutput(stages[upstream], cache_dir, store_dir) for upstream in stage.inputs]
+
+        start = time.perf_counter()
+        result = stage.func(*arguments, **stage.kwargs)
+        wall_time = time.perf_counter() - start
+        record['output'] = result
+
+        _saveOutput(stage, result, cache_dir, store_dir)
+    metrics = {
+        'wall_time': wall_time,
+        'peak_rss_mb': profiling.peakRssMb(),
+        'rows': _rows(result),
+    }
+    if profile:
+        metrics['profile'] = profiling.records()
+    return metrics
+
+def _deltaStages(airports_path: str | None) -> dict:
+    """Этапы, результаты которых обновляет или использует incremental (вместе со всеми их входами)"""
+    stages = buildStages(airports_path)
+    needed = set()
+    pending = incremental.UPDATED_STAGES + incremental.DEFERRED_STAGES
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(stages[name].inputs)
+    return {name: stage for name, stage in stages.items() if name in needed}
+
+def _applyDelta(data_dir: str, store_dir: str, cache_dir: str, airports_path: str | None, manifest: dict) -> dict | None:
+    """
+    Инкрементальное обновление (incremental.update), если оно возможно
+
+    Ключи обновлённых этапов записываются в манифест; этапы incremental.DEFERRED_STAGES не пересчитываются.
+
+    Returns:
+        dict | None: Отчёт по обновлённым и отложенным этапам; None - нужен обычный запуск
+    """
+    stages = _deltaStages(airports_path)
+    keys, fingerprints = stageKeys(stages, data_dir, manifest['sources'])
+    codes = {name: _codeDigest(stage) for name, stage in stages.items()}
+    state_dir = os.path.join(cache_dir, 'incremental')
+    if not incremental.canUpdate(incremental.loadState(state_dir), manifest, keys, codes):
+        return None
+
+    start = time.perf_counter()
+    ids_stage = stages['mergeLoyalityIdNickPasports']
+    result = incremental.update(state_dir, data_dir, store_dir, incremental.loadState(state_dir),
+                                loadOutput(stages['mergeLoyality'], cache_dir, store_dir),
+                                loadOutput(ids_stage, cache_dir, store_dir),
+                                loadOutput(stages['identity'], cache_dir, store_dir), keys)
+    if result is None:
+        return None
+    _saveOutput(ids_stage, result['ids'], cache_dir, store_dir)
+    _saveOutput(stages['identity'], result['identity'], cache_dir, store_dir)
+    wall_time = time.perf_counter() - start
+
+    for source in incremental.DELTA_SOURCES:
+        stage = stages[source]
+        path = _sourcePath(data_dir, stage.sources[0])
+        storage.recordSource(path, store_dir, stage.tables, fingerprints[path])
+    report = {}
+    for name in incremental.UPDATED_STAGES:
+        manifest['stages'][name] = {**manifest['stages'].get(name, {}), 'key': incremental.deltaKey(name, keys[name])}
+        report[name] = {'status': 'delta', 'wall_time': wall_time, 'peak_rss_mb': None, 'rows': result['rows'][name]}
+    for name in incremental.DEFERRED_STAGES:
+        report[name] = {'status': 'deferred', 'wall_time': 0.0, 'peak_rss_mb': None,
+                        'rows': manifest['stages'].get(name, {}).get('rows')}
+    return report
+
+def _initDelta(data_dir: str, store_dir: str, cache_dir: str, airports_path: str | None, manifest: dict):
+    """Создание состояния инкрементального обновления, если все нужные ему этапы выполнены с текущими входами"""
+    stages = _deltaStages(airports_path)
+    keys, _ = stageKeys(stages, data_dir, manifest['sources'])
+    required = incremental.UPDATED_STAGES + incremental.DEFERRED_STAGES
+    if any(manifest['stages'].get(name, {}).get('key') != keys[name] for name in required):
+        return
+    incremental.initState(os.path.join(cache_dir, 'incremental'), data_dir, store_dir,
+                          loadOutput(stages['mergeDataPasports'], cache_dir, store_dir),
+                          loadOutput(stages['mergeLoyality'], cache_dir, store_dir),
+                          keys, {name: _codeDigest(stage) for name, stage in stages.items()})
+
+def runPipeline(data_dir: str, store_dir: str, airports_path: str | None = None, cache_dir: str | None = None,
+                workers: int | None = None, targets: list | None = None, force: bool = False,
+                delta: bool = False, profile_dir: str | None = None) -> pd.DataFrame:
+    """
+    Запуск этапов, входы или код которых изменились с прошлого запуска
+
+    Независимые этапы (например, все извлечения) выполняются параллельно, каждый в новом процессе,
+    поэтому пиковая память этапа не зависит от других этапов.
+
+    Args:
+        data_dir (str): Директория с исходными файлами (DATA_DIR)
+        store_dir (str): Директория хранилища извлечённых таблиц (DATA_EXPORTED)
+        airports_path (str | None): Путь к Airports.csv; None - без этапов visualization и routes
+        cache_dir (str | None): Директория результатов этапов слияния; None - store_dir/pipeline
+        workers (int | None): Количество одновременно выполняемых этапов; None - по числу ядер
+        targets (list | None): Нужные этапы (с их зависимостями); None - все, кроме этапов без необязательных
+            исходных файлов (OPTIONAL_SOURCES) - они пропускаются со статусом 'missing'
+        force (bool): Выполнить этапы заново, даже если входы не изменились
+        delta (bool): Дописать к результатам только новые записи дописываемых источников (модуль incremental);
+            если это невозможно - обычный запуск, после которого сохраняется состояние для следующего обновления
+        profile_dir (str | None): Директория для профиля выполненных этапов (модуль profiling):
+            profile.json и profile.folded для flame-графа; None - без профилирования
+
+    Returns:
+        pd.DataFrame: Отчёт по этапам: статус, время, пиковая память, строки
+    """
+    cache_dir = cache_dir or os.path.join(store_dir, 'pipeline')
+    os.makedirs(cache_dir, exist_ok=True)
+    os.makedirs(store_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    manifest = {'stages': {}, 'sources': {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+
+    stages = buildStages(airports_path)
+    if targets is not None:
+        needed = set()
+        pending = list(targets)
+        if delta:
+            # Состояние обновления строится по результатам всех этапов, которые оно дописывает или использует
+            pending += incremental.UPDATED_STAGES + incremental.DEFERRED_STAGES
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(stages[name].inputs)
+        stages = {name: stage for name, stage in stages.items() if name in needed}
+        skipped = []
+    else:
+        skipped = missingStages(stages, data_dir)
+        stages = {name: stage for name, stage in stages.items() if name not in skipped}
+
+    keys, fingerprints = stageKeys(stages, data_dir, manifest['sources'])
+    manifest['sources'].update(fingerprints)
+
+    report = {}
+    profile = []
+    if delta and not force:
+        if profile_dir is not None:
+            profiling.enable()
+        with profiling.stage('delta'):
+            applied = _applyDelta(data_dir, store_dir, cache_dir, airports_path, manifest)
+        if profile_dir is not None:
+            profile += profiling.records()
+            profiling.reset()
+            profiling.disable()
+        report = {name: metrics for name, metrics in (applied or {}).items() if name in stages}
+    stale = set()
+    for name, stage in stages.items():
+        if name in report:
+            continue
+        previous = manifest['stages'].get(name, {})
+        outputs_exist = all(os.path.exists(path) for path in _outputPaths(stage, cache_dir, store_dir))
+        if force or previous.get('key') != keys[name] or not outputs_exist:
+            stale.add(name)
+        else:
+            report[name] = {'status': 'cached', 'wall_time': 0.0, 'peak_rss_mb': None, 'rows': previous.get('rows')}
+
+    done = set(stages) - stale
+    running = {}
+    # Новый процесс на каждый этап: пиковая память считается для этапа, а не для пула
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context('spawn'),
+                             max_tasks_per_child=1) as executor:
+        while stale or running:
+            for name in sorted(stale):
+                if all(upstream in done for upstream in stages[name].inputs):
+                    stale.discard(name)
+                    running[executor.submit(runStage, name, data_dir, cache_dir, store_dir, airports_path,
+                                                   profile_dir is not None)] = name
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                metrics = future.result()
+                profile += metrics.pop('profile', [])
+                report[name] = {'status': 'run', **metrics}
+                manifest['stages'][name] = {'key': keys[name], **metrics}
+                done.add(name)
+                with open(manifest_path, 'w') as f:
+                    json.dump(manifest, f, indent=1)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+    if delta and not any(metrics['status'] == 'delta' for metrics in report.values()):
+        _initDelta(data_dir, store_dir, cache_dir, airports_path, manifest)
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+        profiling.exportJSON(os.path.join(profile_dir, 'profile.json'), profile, data_dir=data_dir,
+                             targets=targets, delta=delta)
+        profiling.exportCollapsed(os.path.join(profile_dir, 'profile.folded'), profile)
+    for name in skipped:
+        report[name] = {'status': 'missing', 'wall_time': 0.0, 'peak_rss_mb': None, 'rows': None}
+    return pd.DataFrame.from_dict(report, orient='index').loc[list(stages) + skipped]
+
+def main(argv: list | None = None):
+    parser = argparse.ArgumentParser(description='Инкрементальный запуск обработки данных SpyLab')
+    parser.add_argument('--data-dir', required=True, help='директория с исходными данными (DATA_DIR)')
+    parser.add_argument('--store', required=True, help='директория хранилища извлечённых таблиц (DATA_EXPORTED)')
+    parser.add_argument('--airports', help='путь к Airports.csv; без него этап visualization не выполняется')
+    parser.add_argument('--cache-dir', help='директория результатов этапов слияния')
+    parser.add_argument('--workers', type=int, help='количество одновременно выполняемых этапов')
+    parser.add_argument('--target', action='append', dest='targets', help='нужный этап (можно указать несколько раз)')
+    parser.add_argument('--force', action='store_true', help='выполнить все этапы заново')
+    parser.add_argument('--delta', action='store_true',
+                        help='дописать только новые записи BoardingData, YourBoardingPassDotAero и SkyTeam-Exchange')
+    parser.add_argument('--report', help='путь для сохранения отчёта в json')
+    parser.add_argument('--profile', dest='profile_dir',
+                        help='директория для профиля выполненных этапов (profile.json, profile.folded)')
+    args = parser.parse_args(argv)
+
+    report = runPipeline(args.data_dir, args.store, airports_path=args.airports, cache_dir=args.cache_dir,
+                         workers=args.workers, targets=args.targets, force=args.force, delta=args.delta,
+                         profile_dir=args.profile_dir)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(report)
+    if args.report:
+        report.to_json(args.report, orient='index', indent=1)
+
+if __name__ == '__main__':
+    main()
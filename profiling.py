@@ -0,0 +1,279 @@
+"""Модуль профилирования этапов обработки (включается явно)
+
+Основные функции data_extracting, merging и visualization обёрнуты декоратором profiled. Пока профилирование
+не включено (enable() или переменная окружения SPYLAB_PROFILE=1), обёртка только вызывает функцию.
+Для каждого вызова записываются время, процессорное время, прирост пикового RSS, строки и память таблиц
+на входе и выходе, а также предупреждения, показанные внутри вызова. Предупреждения считаются обёрткой
+warnings.showwarning и проходят дальше как обычно: фильтры процесса не меняются (под -W error предупреждение
+остаётся исключением), а отключённые через warnings.simplefilter('ignore') не считаются.
+
+Пример:
+    profiling.enable()
+    with profiling.stage('notebook'):
+        df, docs = merging.mergeDataPasports(df_sirena, df_boarding)
+    profiling.exportJSON('profile.json')
+    profiling.exportCollapsed('profile.folded')
+"""
+import contextvars
+import functools
+import json
+import os
+import resource
+import time
+import warnings
+from contextlib import contextmanager
+
+import pandas as pd
+
+_enabled = os.environ.get('SPYLAB_PROFILE') == '1'
+_deep_memory = False
+_reset_peak = False
+# Завершённые записи; записи выполняющихся этапов (от внешнего к внутреннему) - свои в каждом потоке и задаче
+_records = []
+_stack = contextvars.ContextVar('profiling_stack', default=())
+# Наибольший VmHWM перед сбросами в начале этапов
+_peak_before_reset = 0.0
+# warnings.showwarning, которому передаются посчитанные предупреждения
+_show_warning = None
+
+def _statusMb(field: str) -> float | None:
+    """Поле /proc/self/status в МБ (None, если недоступно)"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _highWaterMb() -> float:
+    """VmHWM (МБ) с последнего сброса _resetPeak"""
+    peak = _statusMb('VmHWM')
+    if peak is not None:
+        return peak
+    # ru_maxrss в Linux измеряется в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def peakRssMb() -> float:
+    """
+    Пиковый RSS текущего процесса (МБ)
+
+    В Linux берётся VmHWM из /proc: в отличие от ru_maxrss, он не наследуется от родителя при запуске нового процесса.
+    Сбросы VmHWM в начале этапов stage учитываются.
+    """
+    return max(_highWaterMb(), _peak_before_reset)
+
+def _resetPeak() -> bool:
+    """Сброс VmHWM до текущего RSS (Linux); False - сброс недоступен"""
+    global _peak_before_reset
+    peak = _highWaterMb()
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    _peak_before_reset = max(_peak_before_reset, peak)
+    return True
+
+def enable(deep_memory: bool = False, reset_peak: bool = False):
+    """
+    Включение профилирования в текущем процессе
+
+    Args:
+        deep_memory (bool): Считать память таблиц с учётом содержимого строк (memory_usage(deep=True));
+            точнее, но требует прохода по всем значениям object столбцов
+        reset_peak (bool): Сбрасывать VmHWM в начале каждого этапа (запись в /proc/self/clear_refs, Linux),
+            чтобы прирост пика считался от начала этапа. Сброс действует на весь процесс (в том числе
+            на пик и soft-dirty биты, которые читает другой код), поэтому по умолчанию выключен; без него
+            прирост виден только у этапов, превысивших прежний пик процесса
+    """
+    global _enabled, _deep_memory, _reset_peak
+    _enabled = True
+    _deep_memory = deep_memory
+    _reset_peak = reset_peak
+
+def disable():
+    """Выключение профилирования (записанные результаты сохраняются)"""
+    global _enabled
+    _enabled = False
+
+def isEnabled() -> bool:
+    return _enabled
+
+def reset():
+    """Удаление записанных результатов"""
+    _records.clear()
+
+def records() -> list:
+    """Записи завершённых этапов в порядке завершения"""
+    return list(_records)
+
+def _rows(value) -> int | None:
+    """Строки таблиц в значении: DataFrame, Series или кортеж/список (в том числе вложенный); None - таблиц нет"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        counts = [count for count in map(_rows, value) if count is not None]
+        return sum(counts) if counts else None
+    return None
+
+def _memoryMb(value) -> float | None:
+    """Память таблиц в значении (МБ); None - таблиц нет"""
+    if isinstance(value, pd.DataFrame):
+        return value.memory_usage(index=True, deep=_deep_memory).sum() / 2**20
+    if isinstance(value, pd.Series):
+        return value.memory_usage(index=True, deep=_deep_memory) / 2**20
+    if isinstance(value, (tuple, list)):
+        sizes = [size for size in map(_memoryMb, value) if size is not None]
+        return sum(sizes) if sizes else None
+    return None
+
+def _countWarning(message, category, filename, lineno, file=None, line=None):
+    """warnings.showwarning: предупреждение записывается во все выполняющиеся этапы и показывается дальше"""
+    for frame in _stack.get():
+        found = frame['warnings'].setdefault(category.__name__, {'count': 0, 'first': f'{filename}:{lineno}: {message}'})
+        found['count'] += 1
+    _show_warning(message, category, filename, lineno, file, line)
+
+def _hookWarnings():
+    """Установка _countWarning поверх текущего warnings.showwarning (например, после catch_warnings)"""
+    global _show_warning
+    if warnings.showwarning is not _countWarning:
+        _show_warning = warnings.showwarning
+        warnings.showwarning = _countWarning
+
+@contextmanager
+def stage(name: str, inputs=None):
+    """
+    Замер этапа
+
+    Вложенные этапы записываются с путём через ';' (например, 'flights;mergeLoyality'). Пик вложенного этапа
+    учитывается и во всех объемлющих; с enable(reset_peak=True) пиковый RSS сбрасывается в начале этапа.
+    Предупреждения, показанные внутри этапа, записываются в него и во все объемлющие этапы.
+
+    Args:
+        name (str): Имя этапа
+        inputs: Входные таблицы (DataFrame, Series или кортеж) для строк и памяти на входе
+
+    Yields:
+        dict: Запись этапа; результат этапа можно передать как record['output'] для строк и памяти на выходе
+    """
+    if not _enabled:
+        yield {}
+        return
+
+    # Пик, достигнутый до начала этапа, относится к объемлющим этапам
+    stack = _stack.get()
+    peak = _highWaterMb()
+    for frame in stack:
+        frame['_peak'] = max(frame['_peak'], peak)
+    rss = _statusMb('VmRSS') if _reset_peak and _resetPeak() else None
+    record = {
+        'name': name,
+        'path': ';'.join([frame['name'] for frame in stack] + [name]),
+        'pid': os.getpid(),
+        'start': time.time(),
+        'rss_start_mb': rss if rss is not None else peak,
+        'rows_in': _rows(inputs),
+        'memory_in_mb': _memoryMb(inputs),
+        'warnings': {},
+        '_peak': rss if rss is not None else peak,
+    }
+    token = _stack.set(stack + (record,))
+    _hookWarnings()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    except BaseException as error:
+        record['error'] = f'{type(error).__name__}: {error}'
+        raise
+    finally:
+        record['wall_time'] = time.perf_counter() - start_wall
+        record['cpu_time'] = time.process_time() - start_cpu
+        _stack.reset(token)
+        peak = max(record.pop('_peak'), _highWaterMb())
+        for frame in stack:
+            frame['_peak'] = max(frame['_peak'], peak)
+        record['peak_rss_delta_mb'] = peak - record['rss_start_mb']
+        output = record.pop('output', None)
+        record['rows_out'] = _rows(output)
+        record['memory_out_mb'] = _memoryMb(output)
+        _records.append(record)
+
+def profiled(func=None, *, name: str | None = None):
+    """
+    Декоратор: вызов функции замеряется как этап stage (входы - аргументы, выход - результат)
+
+    Args:
+        name (str | None): Имя этапа; по умолчанию 'модуль.функция'
+    """
+    if func is None:
+        return functools.partial(profiled, name=name)
+    label = name or f'{func.__module__}.{func.__qualname__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        with stage(label, inputs=(*args, *kwargs.values())) as record:
+            result = func(*args, **kwargs)
+            record['output'] = result
+        return result
+    return wrapper
+
+def summary(data: list | None = None) -> pd.DataFrame:
+    """
+    Сводка по этапам: количество вызовов и суммы показателей по каждому пути
+
+    Args:
+        data (list | None): Записи (например, из json, сохранённого exportJSON); None - records()
+    """
+    df = pd.DataFrame(records() if data is None else data)
+    if df.empty:
+        return df
+    df['warnings'] = df['warnings'].map(lambda found: sum(item['count'] for item in found.values()))
+    grouped = df.groupby('path', sort=False)
+    table = grouped[['wall_time', 'cpu_time', 'rows_in', 'rows_out', 'warnings']].sum(min_count=1)
+    table.insert(0, 'calls', grouped.size())
+    table['peak_rss_delta_mb'] = grouped['peak_rss_delta_mb'].max()
+    table['memory_out_mb'] = grouped['memory_out_mb'].max()
+    return table.sort_values('wall_time', ascending=False)
+
+def collapsedStacks(data: list | None = None, metric: str = 'wall_time') -> str:
+    """
+    Сводка в формате свёрнутых стеков ('путь;к;этапу значение' - собственное значение этапа без вложенных)
+
+    Формат читают flamegraph.pl, speedscope и другие средства построения flame-графиков.
+
+    Args:
+        data (list | None): Записи; None - records()
+        metric (str): 'wall_time' или 'cpu_time' (в миллисекундах) либо другой числовой показатель записей
+    """
+    totals = {}
+    for record in records() if data is None else data:
+        totals[record['path']] = totals.get(record['path'], 0) + (record.get(metric) or 0)
+    own = dict(totals)
+    for path, value in totals.items():
+        parent = path.rpartition(';')[0]
+        if parent in own:
+            own[parent] -= value
+    scale = 1000 if metric in ('wall_time', 'cpu_time') else 1
+    return ''.join(f'{path} {max(round(value * scale), 0)}\n' for path, value in own.items())
+
+def exportJSON(path: str, data: list | None = None, **metadata):
+    """
+    Сохранение записей в json: {'metadata': ..., 'records': [...]}
+
+    Args:
+        path (str): Путь к файлу
+        data (list | None): Записи; None - records()
+        **metadata: Дополнительные сведения о запуске (например, версия или размер данных)
+    """
+    with open(path, 'w') as f:
+        json.dump({'metadata': metadata, 'records': records() if data is None else data}, f, indent=1, default=str)
+
+def exportCollapsed(path: str, data: list | None = None, metric: str = 'wall_time'):
+    """Сохранение collapsedStacks в файл"""
+    with open(path, 'w') as f:
+        f.write(collapsedStacks(data, metric))
@@ -0,0 +1,242 @@
+"""Модуль индексов для запросов к итоговым таблицам полётов и идентификаторов
+
+Индекс строится один раз по таблице полётов (flightsStage / data ноутбука или результат mergeDataPasports)
+и таблице идентификаторов mergeLoyalityIdNickPasports и сохраняется в директорию .npy файлов, которые
+открываются через отображение в память, поэтому загрузка индекса не зависит от его размера.
+
+Каждый столбец хранится как отсортированный словарь значений (байтовые строки фиксированной длины)
+и коды строк. Индекс столбца - номера строк, упорядоченные по коду, и смещения начала каждого кода:
+поиск ключа - двоичный поиск в словаре, выбор его строк - срез. Составной индекс (Flight, Date)
+упорядочен по рейсу, затем по дате, поэтому строки рейса за диапазон дат - один непрерывный срез.
+Все запросы принимают пачку ключей и выполняются без цикла по ключам.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Таблица -> индексируемые столбцы
+INDEXED_COLUMNS = {
+    'flights': ['ID', 'Date'],
+    'ids': ['ID', 'uid', 'FFKey', 'NickName', 'TravelDoc'],
+}
+# Составной индекс таблицы полётов: рейс, затем дата
+FLIGHT_DATE = ('Flight', 'Date')
+
+def _asStrings(series: pd.Series) -> pd.Series:
+    """Значения как строки (пропуски сохраняются); даты - в формате YYYY-MM-DD"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime('%Y-%m-%d')
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    if pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return series
+    return series.map(str, na_action='ignore')
+
+def _encodeKeys(keys) -> np.ndarray:
+    """Ключи запроса как байтовые строки utf-8 (в кодировке словарей)"""
+    keys = _asStrings(pd.Series(list(keys), dtype=object)).fillna('')
+    return np.asarray(keys.str.encode('utf-8').to_numpy(), dtype=bytes)
+
+def _flightsTable(flights: pd.DataFrame) -> pd.DataFrame:
+    """
+    Таблица полётов в именах flightsStage: результат mergeDataPasports (FlightNumber, FlightDate, Dest)
+    и passportsStage тоже подходят; ID без столбца ID - 'pass_' + номер документа
+    """
+    flights = flights.rename(columns={'FlightNumber': 'Flight', 'FlightDate': 'Date', 'Dest': 'To'})
+    if 'ID' not in flights.columns:
+        flights = flights.assign(ID='pass_' + _asStrings(flights['PassengerDocument']))
+    return flights
+
+def _save(path: str, values: np.ndarray):
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, values)
+    os.replace(path + '.tmp', path)
+
+def _offsets(sorted_codes: np.ndarray, n_codes: int) -> np.ndarray:
+    """Начало строк каждого кода 0..n_codes-1 (и конец последнего) в отсортированных кодах"""
+    return np.searchsorted(sorted_codes, np.arange(n_codes + 1)).astype(np.int64)
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> tuple:
+    """Номера запросов и позиции для срезов [starts[i], ends[i]) без цикла по запросам"""
+    lengths = np.maximum(ends - starts, 0)
+    query = np.repeat(np.arange(len(lengths)), lengths)
+    positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+    return query, positions
+
+def buildIndex(directory: str, flights: pd.DataFrame, ids: pd.DataFrame) -> 'QueryIndex':
+    """
+    Построение и сохранение индекса
+
+    Args:
+        directory (str): Директория индекса (создаётся; прежний индекс перезаписывается)
+        flights (pd.DataFrame): Полёты: ID, Date, Flight и любые другие столбцы (From, To, Source и т. д.)
+        ids (pd.DataFrame): Результат mergeLoyalityIdNickPasports (uid, FFKey, NickName, TravelDoc, ID)
+
+    Returns:
+        QueryIndex: Открытый индекс
+    """
+    os.makedirs(directory, exist_ok=True)
+    meta = {'tables': {}, 'composite': None}
+    codes = {}
+    for table, df in (('flights', _flightsTable(flights)), ('ids', ids)):
+        meta['tables'][table] = {'rows': len(df), 'columns': list(df.columns),
+                                 'indexes': [column for column in INDEXED_COLUMNS[table] if column in df.columns]}
+        for column in df.columns:
+            column_codes, uniques = pd.factorize(_asStrings(df[column]), sort=True)
+            vocabulary = np.asarray(pd.Series(uniques, dtype=object).str.encode('utf-8').to_numpy(), dtype=bytes)
+            column_codes = column_codes.astype(np.int32)
+            _save(os.path.join(directory, f'{table}.{column}.vocabulary.npy'), vocabulary)
+            _save(os.path.join(directory, f'{table}.{column}.codes.npy'), column_codes)
+            codes[table, column] = (column_codes, len(vocabulary))
+        for column in meta['tables'][table]['indexes']:
+            column_codes, n_codes = codes[table, column]
+            order = np.argsort(column_codes, kind='stable')
+            _save(os.path.join(directory, f'{table}.{column}.rows.npy'), order)
+            _save(os.path.join(directory, f'{table}.{column}.offsets.npy'), _offsets(column_codes[order], n_codes))
+
+    if all(('flights', column) in codes for column in FLIGHT_DATE):
+        (flight, _), (date, n_dates) = codes['flights', FLIGHT_DATE[0]], codes['flights', FLIGHT_DATE[1]]
+        keys = np.where((flight >= 0) & (date >= 0), flight.astype(np.int64) * n_dates + date, -1)
+        order = np.argsort(keys, kind='stable')
+        _save(os.path.join(directory, 'flights.Flight+Date.keys.npy'), keys[order])
+        _save(os.path.join(directory, 'flights.Flight+Date.rows.npy'), order)
+        meta['composite'] = list(FLIGHT_DATE)
+
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    return QueryIndex(directory)
+
+class QueryIndex:
+    """
+    Индекс, сохранённый buildIndex; массивы открываются через отображение в память при первом обращении
+
+    Результаты запросов - таблицы со столбцом query (номер ключа в запросе) и столбцами исходной таблицы.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        self._arrays = {}
+
+    def _array(self, name: str) -> np.ndarray:
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.directory, f'{name}.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+    def _codes(self, table: str, column: str, keys) -> np.ndarray:
+        """Коды ключей в словаре столбца (-1 - ключа нет)"""
+        vocabulary = self._array(f'{table}.{column}.vocabulary')
+        keys = _encodeKeys(keys)
+        if not len(vocabulary):
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.searchsorted(vocabulary, keys)
+        found = vocabulary[np.minimum(positions, len(vocabulary) - 1)] == keys
+        return np.where(found & (positions < len(vocabulary)), positions, -1)
+
+    def _rows(self, table: str, rows: np.ndarray, query: np.ndarray) -> pd.DataFrame:
+        """Строки таблицы с номерами rows (в исходных значениях) и номер запроса каждой строки"""
+        df = {'query': query}
+        for column in self.meta['tables'][table]['columns']:
+            vocabulary = self._array(f'{table}.{column}.vocabulary')
+            codes = self._array(f'{table}.{column}.codes')[rows]
+            values = np.full(len(rows), np.nan, dtype=object)
+            present = codes >= 0
+            values[present] = pd.Series(vocabulary[codes[present]], dtype=object).str.decode('utf-8').to_numpy()
+            df[column] = values
+        return pd.DataFrame(df)
+
+    def _select(self, table: str, column: str, low: np.ndarray, high: np.ndarray) -> tuple:
+        """Номера запросов и строк таблицы для диапазонов кодов [low, high) индекса столбца"""
+        offsets = self._array(f'{table}.{column}.offsets')
+        query, positions = _ranges(offsets[low], offsets[high])
+        return query, self._array(f'{table}.{column}.rows')[positions]
+
+    def lookup(self, table: str, column: str, keys) -> pd.DataFrame:
+        """
+        Строки таблицы, у которых значение индексируемого столбца равно одному из ключей
+
+        Args:
+            table (str): 'flights' или 'ids'
+            column (str): Столбец из INDEXED_COLUMNS[table]
+            keys: Ключи (список, массив или Series)
+        """
+        codes = self._codes(table, column, keys)
+        found = codes >= 0
+        low = np.where(found, codes, 0)
+        query, rows = self._select(table, column, low, np.where(found, codes + 1, 0))
+        return self._rows(table, rows, query)
+
+    def range(self, table: str, column: str, low: str, high: str) -> pd.DataFrame:
+        """Строки таблицы со значением столбца от low до high включительно (строковое сравнение, даты - ISO)"""
+        vocabulary = self._array(f'{table}.{column}.vocabulary')
+        bounds = _encodeKeys([low, high])
+        start = np.searchsorted(vocabulary, bounds[:1], side='left')
+        end = np.searchsorted(vocabulary, bounds[1:], side='right')
+        query, rows = self._select(table, column, start, np.maximum(end, start))
+        return self._rows(table, rows, query)
+
+    def flightsOf(self, column: str, keys) -> pd.DataFrame:
+        """
+        Все полёты людей по их идентификаторам
+
+        Ключи переводятся в ID через таблицу ids; для TravelDoc также берётся ID 'pass_' + документ,
+        которым mergeDataPasports обозначает людей без программ лояльности.
+
+        Args:
+            column (str): 'ID', 'uid', 'FFKey', 'NickName' или 'TravelDoc'
+            keys: Значения идентификатора
+        """
+        keys = list(keys)
+        if column == 'ID':
+            pairs = pd.DataFrame({'query': np.arange(len(keys)), 'ID': keys})
+        else:
+            found = self.lookup('ids', column, keys)[['query', 'ID']]
+            if column == 'TravelDoc':
+                documents = pd.DataFrame({'query': np.arange(len(keys)),
+                                          'ID': 'pass_' + _asStrings(pd.Series(keys, dtype=object))})
+                found = pd.concat([found, documents], ignore_index=True)
+            pairs = found.dropna().drop_duplicates()
+        flights = self.lookup('flights', 'ID', pairs['ID'].to_numpy())
+        flights['query'] = pairs['query'].to_numpy()[flights['query'].to_numpy()]
+        return flights.sort_values('query', kind='stable').reset_index(drop=True)
+
+    def passengers(self, flights, date_from, date_to=None) -> pd.DataFrame:
+        """
+        Все полёты рейсов за даты: запрос i - рейс flights[i] с date_from[i] по date_to[i] включительно
+
+        Args:
+            flights: Номер рейса или список номеров
+            date_from: Дата (YYYY-MM-DD) или список дат
+            date_to: Конец диапазона (одна дата или список); None - только date_from
+        """
+        if self.meta['composite'] is None:
+            raise ValueError('В таблице полётов индекса нет столбцов Flight и Date')
+        flights = [flights] if isinstance(flights, str) else list(flights)
+        date_from = np.broadcast_to(np.asarray(date_from, dtype=object), len(flights))
+        date_to = date_from if date_to is None else np.broadcast_to(np.asarray(date_to, dtype=object), len(flights))
+
+        flight = self._codes('flights', 'Flight', flights)
+        dates = self._array('flights.Date.vocabulary')
+        low = np.searchsorted(dates, _encodeKeys(date_from), side='left')
+        high = np.maximum(np.searchsorted(dates, _encodeKeys(date_to), side='right'), low)
+        keys = self._array('flights.Flight+Date.keys')
+        base = np.where(flight >= 0, flight, 0).astype(np.int64) * len(dates)
+        start = np.searchsorted(keys, base + low, side='left')
+        end = np.where(flight >= 0, np.searchsorted(keys, base + high, side='left'), start)
+        query, positions = _ranges(start, end)
+        return self._rows('flights', self._array('flights.Flight+Date.rows')[positions], query)
+
+    def linkedIds(self, column: str, keys) -> pd.DataFrame:
+        """
+        Все идентификаторы людей: строки ids с тем же ID, что и у ключа
+
+        Args:
+            column (str): 'ID', 'uid', 'FFKey', 'NickName' или 'TravelDoc'
+            keys: Значения идентификатора
+        """
+        found = self.lookup('ids', column, keys)[['query', 'ID']].dropna().drop_duplicates()
+        linked = self.lookup('ids', 'ID', found['ID'].to_numpy())
+        linked['query'] = found['query'].to_numpy()[linked['query'].to_numpy()]
+        return linked.sort_values('query', kind='stable').reset_index(drop=True)
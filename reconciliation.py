@@ -0,0 +1,207 @@
+"""Модуль сверки полётов между Sirena-export-fixed, BoardingData и посадочными талонами YourBoardingPassDotAero
+
+Строки источников приводятся к общим столбцам (рейс, дата, билет, бронь, документ, время, аэропорты, место,
+класс, имя) и получают целочисленный ключ (рейс, день, билет); строка без номера билета берёт билет
+по брони (PNR) того же рейса, если он однозначен, иначе ключом становится сама бронь. Ключи каждого
+источника сортируются отдельно и сливаются одной устойчивой сортировкой уже упорядоченных частей,
+после чего наличие в источниках, повторы и расхождения значений считаются по группам равных ключей
+без попарных слияний таблиц.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Источник -> общий столбец -> столбец извлечённой таблицы (имена как в storage.SCHEMAS)
+SOURCE_COLUMNS = {
+    'sirena': {
+        'Flight': 'Flight', 'Date': 'DepartDate', 'Ticket': 'e-Ticket', 'PNR': 'Code', 'Document': 'TravelDoc',
+        'Time': 'DepartTime', 'From': 'From', 'To': 'Dest', 'Seat': 'Seat', 'Class': 'TrvCls', 'Name': 'PaxName',
+    },
+    'boarding': {
+        'Flight': 'FlightNumber', 'Date': 'FlightDate', 'Ticket': 'TicketNumber', 'PNR': 'BookingCode',
+        'Document': 'PassengerDocument', 'Time': 'FlightTime', 'To': 'Destination',
+    },
+    'pass': {
+        'Flight': 'flight_number', 'Date': 'flight_date', 'Ticket': 'ticket_number', 'PNR': 'pnr',
+        'Time': 'departure_time', 'From': 'aeroport1', 'To': 'aeroport2', 'Seat': 'seat', 'Class': 'trvCls',
+        'Name': 'passenger_name',
+    },
+}
+# Сравниваемые столбцы: разные значения в группе одного ключа - расхождение
+COMPARED_COLUMNS = ['Document', 'PNR', 'Time', 'From', 'To', 'Seat', 'Class', 'Name']
+# Значения-заглушки, которые считаются пропусками (после перевода в верхний регистр)
+MISSING_VALUES = ['', 'NAN', 'NONE', 'NOT PRESENTED', 'UNKNOWN']
+
+def _asStrings(series: pd.Series) -> pd.Series:
+    """Значения как строки (пропуски сохраняются)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    if pd.api.types.is_timedelta64_dtype(series):
+        return (series + pd.Timestamp(0)).dt.strftime('%H:%M')
+    if pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return series
+    return series.map(str, na_action='ignore')
+
+def _normalized(series: pd.Series) -> pa.Array:
+    """Строки без крайних пробелов в верхнем регистре; заглушки MISSING_VALUES - пропуски"""
+    values = pa.array(_asStrings(series).to_numpy(dtype=object), type=pa.string(), from_pandas=True)
+    values = pc.utf8_upper(pc.utf8_trim_whitespace(values))
+    return pc.if_else(pc.is_in(values, value_set=pa.array(MISSING_VALUES)), pa.scalar(None, pa.string()), values)
+
+def _days(series: pd.Series) -> np.ndarray:
+    """Номер дня от 1970-01-01 (int64, -1 - дата не распознана)"""
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(_asStrings(series), errors='coerce', format='ISO8601')
+    days = series.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    return np.where(series.isna().to_numpy(), -1, days)
+
+def _dates(days: np.ndarray) -> np.ndarray:
+    """Даты YYYY-MM-DD по номерам дней (пропуск для -1); форматируется каждый день один раз"""
+    unique, inverse = np.unique(days, return_inverse=True)
+    dates = pd.to_datetime(pd.Series(unique).where(unique >= 0), unit='D').dt.strftime('%Y-%m-%d')
+    return dates.to_numpy(dtype=object)[inverse]
+
+def _legs(source: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Строки источника в общих столбцах (строки нормализуются в pyarrow); Day - номер дня, Row - номер строки в df
+    """
+    columns = SOURCE_COLUMNS[source]
+    values = {name: _normalized(df[column]) for name, column in columns.items()
+              if column in df.columns and name != 'Date'}
+    if source == 'boarding':
+        values['Name'] = pc.binary_join_element_wise(_normalized(df['PassengerLastName']),
+                                                     _normalized(df['PassengerFirstName']), ' ')
+    if 'Name' in values:
+        # Фамилия и имя, как PassangerName в ноутбуке (в PaxName Sirena бывает отчество)
+        values['Name'] = pc.binary_join(pc.list_slice(pc.utf8_split_whitespace(values['Name']), 0, 2), ' ')
+    values['Flight'] = pc.replace_substring(values['Flight'], ' ', '')
+    for name in ['Ticket', *COMPARED_COLUMNS]:
+        values.setdefault(name, pa.nulls(len(df), pa.string()))
+    legs = pd.DataFrame({name: pd.arrays.ArrowExtensionArray(values[name])
+                         for name in ['Flight', 'Ticket', *COMPARED_COLUMNS]})
+    legs['Day'] = _days(df[columns['Date']])
+    legs['Row'] = np.arange(len(df))
+    return legs
+
+def _objects(df: pd.DataFrame) -> pd.DataFrame:
+    """Строковые столбцы pyarrow как object (пропуски - NaN)"""
+    return df.assign(**{column: df[column].to_numpy(dtype=object, na_value=np.nan) for column in df.columns
+                        if isinstance(df[column].dtype, pd.ArrowDtype)})
+
+def _fillTickets(ticket: np.ndarray, pnr: np.ndarray, flight_day: np.ndarray) -> np.ndarray:
+    """Коды пропущенных билетов по брони того же рейса и дня, если броне соответствует ровно один билет"""
+    known = (flight_day >= 0) & (pnr >= 0)
+    booking = flight_day * (pnr.max(initial=0) + 1) + pnr
+    pairs = pd.DataFrame({'booking': booking, 'ticket': ticket})[known & (ticket >= 0)].drop_duplicates()
+    unique = pairs.drop_duplicates('booking', keep=False)
+    missing = known & (ticket < 0)
+    found = pd.Index(unique['booking']).get_indexer(booking[missing])
+    ticket = ticket.copy()
+    # Броне без единственного билета (found = -1) соответствует последний элемент -1
+    ticket[missing] = np.append(unique['ticket'].to_numpy(), -1)[found]
+    return ticket
+
+def _keys(legs: pd.DataFrame) -> np.ndarray:
+    """
+    Целочисленные ключи (рейс, день, билет или бронь); строки без ключа получают уникальные отрицательные ключи
+
+    Билеты, найденные по брони, записываются в legs['Ticket'].
+    """
+    flight = pd.factorize(legs['Flight'])[0]
+    day = legs['Day'].to_numpy()
+    valid = (flight >= 0) & (day >= 0)
+    flight_day = np.where(valid, pd.factorize(np.where(valid, flight * (day.max(initial=0) + 2) + day, -1))[0], -1)
+
+    ticket, tickets = pd.factorize(legs['Ticket'])
+    pnr, pnrs = pd.factorize(legs['PNR'])
+    filled = _fillTickets(ticket, pnr, flight_day)
+    legs.loc[filled != ticket, 'Ticket'] = tickets.take(filled[filled != ticket])
+    ident = np.where(filled >= 0, filled, np.where(pnr >= 0, len(tickets) + pnr, -1))
+    keyed = valid & (ident >= 0)
+    # Номера пар (рейс, день) не больше числа строк, поэтому ключ помещается в int64
+    return np.where(keyed, flight_day * (len(tickets) + len(pnrs)) + ident, -1 - np.arange(len(legs)))
+
+def _mergeSorted(keys: np.ndarray, sources: np.ndarray, n_sources: int) -> np.ndarray:
+    """
+    Порядок строк по ключу: ключи каждого источника сортируются отдельно, затем упорядоченные части
+    сливаются устойчивой сортировкой (timsort находит готовые отрезки и только сливает их)
+    """
+    parts = [np.flatnonzero(sources == source) for source in range(n_sources)]
+    runs = np.concatenate([part[np.argsort(keys[part], kind='stable')] for part in parts])
+    return runs[np.argsort(keys[runs], kind='stable')]
+
+def reconcile(df_sirena: pd.DataFrame | None = None, df_boarding: pd.DataFrame | None = None,
+              df_pass: pd.DataFrame | None = None, double_docs: pd.DataFrame | None = None) -> tuple:
+    """
+    Сверка полётов пассажиров между источниками
+
+    Args:
+        df_sirena (pd.DataFrame | None): Таблица Sirena-export-fixed
+        df_boarding (pd.DataFrame | None): Таблица BoardingData (в том числе extractBoardingData(typed=True))
+        df_pass (pd.DataFrame | None): Таблица посадочных талонов extractBoardingPass
+        double_docs (pd.DataFrame | None): Соответствие загранпаспортов и паспортов (второй результат
+            mergeDataPasports); загранпаспорта заменяются на паспорта, чтобы не считаться расхождением
+
+    Returns:
+        (pd.DataFrame, pd.DataFrame): Группы ключей - Flight, Date, Ticket, PNR, in_<источник>,
+            row_<источник> (номер строки в таблице источника, последней при повторах, -1 - нет), rows,
+            duplicate (несколько строк одного источника), conflicts (столбцы с разными значениями через запятую),
+            status ('matched', 'conflict', '<источник>_only' или 'no_key' - нет рейса, даты или билета и брони);
+            строки источников в группах с расхождениями (group - номер группы, source) в общих столбцах
+    """
+    frames = {'sirena': df_sirena, 'boarding': df_boarding, 'pass': df_pass}
+    names = [name for name, df in frames.items() if df is not None]
+    legs = pd.concat([_legs(name, frames[name]) for name in names], ignore_index=True)
+    sources = np.repeat(np.arange(len(names)), [len(frames[name]) for name in names])
+    if double_docs is not None:
+        docs = double_docs.drop_duplicates('pass')
+        domestic = pd.Series(_normalized(docs['PassengerDocument']).to_numpy(zero_copy_only=False),
+                             index=_normalized(docs['pass']).to_numpy(zero_copy_only=False))
+        legs['Document'] = legs['Document'].map(domestic).fillna(legs['Document'])
+
+    keys = _keys(legs)
+    order = _mergeSorted(keys, sources, len(names))
+    sorted_keys = keys[order]
+    boundary = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]][:len(order)]
+    starts = np.flatnonzero(boundary)
+    group = np.empty(len(order), dtype=np.int64)
+    group[order] = np.cumsum(boundary) - 1
+    sorted_sources = sources[order]
+
+    first = order[starts]
+    summary = _objects(legs.loc[first, ['Flight', 'Ticket', 'PNR']].reset_index(drop=True))
+    summary.insert(1, 'Date', _dates(legs['Day'].to_numpy()[first]))
+    presence = np.bitwise_or.reduceat(1 << sorted_sources, starts)
+    rows = np.diff(np.r_[starts, len(order)])
+    present = np.zeros(len(starts), dtype=np.int64)
+    for position, name in enumerate(names):
+        summary[f'in_{name}'] = (presence >> position & 1).astype(bool)
+        present += summary[f'in_{name}']
+        row = np.where(sorted_sources == position, legs['Row'].to_numpy()[order], -1)
+        summary[f'row_{name}'] = np.maximum.reduceat(row, starts)
+    summary['rows'] = rows
+    summary['duplicate'] = rows > present
+
+    conflicts = np.full(len(starts), '', dtype=object)
+    conflicting = np.zeros(len(starts), dtype=bool)
+    for column in COMPARED_COLUMNS:
+        codes = pd.factorize(legs[column])[0][order]
+        low = np.minimum.reduceat(np.where(codes >= 0, codes, np.iinfo(codes.dtype).max), starts)
+        high = np.maximum.reduceat(codes, starts)
+        differs = (high >= 0) & (low < high)
+        conflicts[differs] = conflicts[differs] + column + ','
+        conflicting |= differs
+    conflicts[conflicting] = [found[:-1] for found in conflicts[conflicting]]
+    summary['conflicts'] = conflicts
+
+    no_key = sorted_keys[starts] < 0
+    only = np.array([f'{name}_only' for name in names], dtype=object)[np.log2(np.maximum(presence, 1)).astype(int)]
+    summary['status'] = np.select([no_key, conflicting, present > 1], ['no_key', 'conflict', 'matched'], only)
+
+    details = _objects(legs[conflicting[group]].rename(columns={'Row': 'row'}))
+    details.insert(1, 'Date', _dates(details.pop('Day').to_numpy()))
+    details.insert(0, 'source', np.asarray(names, dtype=object)[sources[conflicting[group]]])
+    details.insert(0, 'group', group[conflicting[group]])
+    details = details.sort_values(['group', 'source'], kind='stable').reset_index(drop=True)
+    return summary, details
@@ -0,0 +1,187 @@
+"""Модуль анализа маршрутов по таблице полётов из visualization.get_dataframe_for_work
+
+Расстояния по дуге большого круга, разрывы маршрутов пассажиров и матрицы перелётов между аэропортами.
+Все вычисления векторизованы; временные массивы расстояний создаются кусками по chunksize строк.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0
+
+@dataclass
+class Legs:
+    """
+    Перелёты, отсортированные по пассажиру и дате
+
+    Перелёты пассажира passengers[i] - срез offsets[i]:offsets[i+1] всех массивов.
+    """
+    passengers: pd.Index
+    offsets: np.ndarray
+    dates: np.ndarray
+    from_lat: np.ndarray
+    from_lon: np.ndarray
+    to_lat: np.ndarray
+    to_lon: np.ndarray
+    # Позиции строк в исходной таблице
+    order: np.ndarray
+
+    def __len__(self):
+        return len(self.dates)
+
+    def passengerCodes(self) -> np.ndarray:
+        """Номер пассажира для каждого перелёта"""
+        return np.repeat(np.arange(len(self.passengers), dtype=np.int32), np.diff(self.offsets))
+
+def haversine(lat1, lon1, lat2, lon2, chunksize: int = 4_000_000) -> np.ndarray:
+    """
+    Расстояние по дуге большого круга между точками (градусы), км
+
+    Считается в float64 кусками по chunksize элементов, чтобы временные массивы не росли с размером входа.
+
+    Returns:
+        np.ndarray: Расстояния (float32)
+    """
+    lat1, lon1, lat2, lon2 = (np.asarray(values) for values in (lat1, lon1, lat2, lon2))
+    result = np.empty(len(lat1), dtype=np.float32)
+    for start in range(0, len(result), chunksize):
+        part = slice(start, start + chunksize)
+        phi1, phi2 = np.radians(lat1[part], dtype=np.float64), np.radians(lat2[part], dtype=np.float64)
+        dphi = phi2 - phi1
+        dlambda = np.radians(lon2[part], dtype=np.float64) - np.radians(lon1[part], dtype=np.float64)
+        a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+        result[part] = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return result
+
+def sortLegs(df: pd.DataFrame) -> Legs:
+    """
+    Перелёты из get_dataframe_for_work, сгруппированные по пассажирам и отсортированные по дате
+
+    При равных датах сохраняется порядок строк в df.
+    """
+    codes, passengers = pd.factorize(df['passenger_id'])
+    dates = df['flight_date'].to_numpy(dtype='datetime64[ns]')
+    # Две устойчивые сортировки (по дате, затем по пассажиру) быстрее np.lexsort на больших таблицах
+    order = np.argsort(dates, kind='stable')
+    order = order[np.argsort(codes[order], kind='stable')]
+    # Перелёты без пассажира (код -1) оказываются в начале и отбрасываются
+    order = order[np.searchsorted(codes[order], 0):]
+    return Legs(
+        passengers=pd.Index(passengers),
+        offsets=np.searchsorted(codes[order], np.arange(len(passengers) + 1)),
+        dates=dates[order],
+        from_lat=df['from_lat'].to_numpy()[order],
+        from_lon=df['from_lon'].to_numpy()[order],
+        to_lat=df['to_lat'].to_numpy()[order],
+        to_lon=df['to_lon'].to_numpy()[order],
+        order=order,
+    )
+
+def legDistances(legs: Legs) -> np.ndarray:
+    """Длина каждого перелёта, км"""
+    return haversine(legs.from_lat, legs.from_lon, legs.to_lat, legs.to_lon)
+
+def itineraryBreaks(legs: Legs, distances: np.ndarray | None = None, max_speed_kmh: float = 1000.0,
+                    date_slack: pd.Timedelta = pd.Timedelta(days=1)) -> pd.DataFrame:
+    """
+    Разрывы маршрутов: перелёт начинается не там, где закончился предыдущий перелёт пассажира,
+    или не успевает по времени
+
+    Время считается невозможным, если путь от точки вылета предыдущего перелёта через его точку прилёта
+    до точки прилёта текущего (с переездом между аэропортами) нельзя пройти со скоростью max_speed_kmh
+    за время между датами полётов плюс date_slack (даты в таблице без времени).
+
+    Args:
+        legs (Legs): Результат sortLegs
+        distances (np.ndarray | None): Результат legDistances; None - вычисляется
+        max_speed_kmh (float): Максимальная скорость перемещения
+        date_slack (pd.Timedelta): Запас к промежутку между датами
+
+    Returns:
+        pd.DataFrame: Для каждого перелёта (в порядке legs): passenger_id, flight_date, distance_km,
+            transfer_km - расстояние от точки прилёта предыдущего перелёта (NaN у первого),
+            continuity_break, timing_break. Позиции строк в исходной таблице - legs.order
+    """
+    if distances is None:
+        distances = legDistances(legs)
+    n = len(legs)
+    # Перелёт i имеет предыдущий перелёт того же пассажира, если он не первый в своей группе
+    has_previous = np.ones(n, dtype=bool)
+    has_previous[legs.offsets[:-1][np.diff(legs.offsets) > 0]] = False
+    current = np.flatnonzero(has_previous)
+    previous = current - 1
+
+    transfer = np.full(n, np.nan, dtype=np.float32)
+    transfer[current] = haversine(legs.to_lat[previous], legs.to_lon[previous],
+                                  legs.from_lat[current], legs.from_lon[current])
+
+    continuity_break = np.zeros(n, dtype=bool)
+    continuity_break[current] = ((legs.to_lat[previous] != legs.from_lat[current])
+                                 | (legs.to_lon[previous] != legs.from_lon[current]))
+
+    elapsed_hours = ((legs.dates[current] - legs.dates[previous]) + date_slack.to_timedelta64()) / np.timedelta64(1, 'h')
+    path_km = distances[previous].astype(np.float64) + transfer[current] + distances[current]
+    timing_break = np.zeros(n, dtype=bool)
+    timing_break[current] = path_km > max_speed_kmh * elapsed_hours
+
+    return pd.DataFrame({
+        'passenger_id': legs.passengers[legs.passengerCodes()],
+        'flight_date': legs.dates,
+        'distance_km': distances,
+        'transfer_km': transfer,
+        'continuity_break': continuity_break,
+        'timing_break': timing_break,
+    })
+
+def distanceRanking(legs: Legs, distances: np.ndarray | None = None) -> pd.DataFrame:
+    """
+    Рейтинг пассажиров по суммарному расстоянию перелётов
+
+    Returns:
+        pd.DataFrame: Индекс passenger_id; столбцы legs, distance_km; по убыванию расстояния
+    """
+    if distances is None:
+        distances = legDistances(legs)
+    total = np.bincount(legs.passengerCodes(), weights=distances, minlength=len(legs.passengers))
+    ranking = pd.DataFrame({'legs': np.diff(legs.offsets), 'distance_km': total},
+                           index=legs.passengers.rename('passenger_id'))
+    return ranking.sort_values('distance_km', ascending=False, kind='stable')
+
+def airportIndex(df: pd.DataFrame) -> tuple:
+    """
+    Нумерация аэропортов по координатам из get_dataframe_for_work
+
+    Returns:
+        tuple: (номера аэропортов вылета, номера аэропортов прилёта, pd.DataFrame координат lat, lon аэропортов)
+    """
+    # Пара float32 (широта, долгота) однозначно упаковывается в uint64
+    def pack(lat, lon):
+        pair = np.empty((len(lat), 2), dtype=np.float32)
+        pair[:, 0], pair[:, 1] = lat, lon
+        return pair.view(np.uint64).ravel()
+
+    keys = np.concatenate([pack(df['from_lat'].to_numpy(), df['from_lon'].to_numpy()),
+                           pack(df['to_lat'].to_numpy(), df['to_lon'].to_numpy())])
+    codes, unique = pd.factorize(keys)
+    coords = np.asarray(unique, dtype=np.uint64).view(np.float32).reshape(-1, 2)
+    airports = pd.DataFrame({'lat': coords[:, 0], 'lon': coords[:, 1]})
+    codes = codes.astype(np.int32)
+    return codes[:len(df)], codes[len(df):], airports
+
+def originDestinationCounts(df: pd.DataFrame) -> tuple:
+    """
+    Разреженная матрица количества перелётов между аэропортами в формате COO
+
+    Returns:
+        tuple: (pd.DataFrame origin, destination, count - ненулевые элементы матрицы по убыванию count,
+            pd.DataFrame координат аэропортов - строки и столбцы матрицы)
+    """
+    origin, destination, airports = airportIndex(df)
+    pair, counts = np.unique(origin.astype(np.int64) * len(airports) + destination, return_counts=True)
+    matrix = pd.DataFrame({
+        'origin': (pair // len(airports)).astype(np.int32),
+        'destination': (pair % len(airports)).astype(np.int32),
+        'count': counts,
+    })
+    return matrix.sort_values('count', ascending=False, kind='stable', ignore_index=True), airports
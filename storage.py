@@ -0,0 +1,284 @@
+"""Модуль хранения извлечённых таблиц в формате Parquet с явными схемами"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import data_extracting
+
+# Схемы таблиц: столбец -> тип. Даты, не участвующие в слияниях, хранятся как datetime64 (нераспознанные - NaT),
+# числа и признаки - как Int64 и boolean с пропусками. Идентификаторы, коды и даты полётов остаются строками,
+# так как слияния в merging.py и reconciliation.py сопоставляют их между источниками как текст
+_STR = 'str'
+_DATE = 'datetime64[ns]'
+_INT = 'Int64'
+_BOOL = 'boolean'
+SCHEMAS = {
+    'BoardingData': {
+        **dict.fromkeys([
+            'PassengerFirstName', 'PassengerSecondName', 'PassengerLastName', 'PassengerSex', 'PassengerDocument',
+            'BookingCode', 'TicketNumber', 'Baggage', 'FlightDate', 'FlightTime', 'FlightNumber', 'CodeShare',
+            'Destination'], _STR),
+        'PassengerBirthDate': _DATE,
+    },
+    'PointzAggregator-AirlinesData': dict.fromkeys([
+        'uid', 'first_name', 'last_name', 'card_number', 'bonus_program', 'activity_type', 'code', 'date',
+        'departure', 'arrival', 'fare'], _STR),
+    'YourBoardingPassDotAero': {**dict.fromkeys(data_extracting.BOARDING_PASS_CELLS, _STR), 'sequence': _INT},
+    'FrequentFlyerForum-Profiles_Base': dict.fromkeys(['NickName'], _STR),
+    'FrequentFlyerForum-Profiles_Flight': {
+        **dict.fromkeys([
+            'Date', 'Flight', 'Arrival.City', 'Arrival.Airport', 'Arrival.Country', 'Departure.City',
+            'Departure.Airport', 'Departure.Country', 'NickName'], _STR),
+        'Codeshare': _BOOL,
+    },
+    # FF ключи из программы и номера строит data_extracting.forumFFKey
+    'FrequentFlyerForum-Profiles_LoyalityProgram': {**dict.fromkeys(['programm', 'Status', 'NickName'], _STR),
+                                                    'Number': _INT},
+    'Sirena-export-fixed': {
+        **dict.fromkeys([
+            'PaxName', 'DepartDate', 'DepartTime', 'ArrivalTime', 'Flight', 'CodeSh', 'From', 'Dest', 'Code',
+            'e-Ticket', 'TravelDoc', 'Seat', 'Meal', 'TrvCls', 'Fare', 'Baggage', 'PaxAdditionalInfo', 'AgentInfo',
+            'FFKey'], _STR),
+        'PaxBirthDate': _DATE,
+        'ArrivalDate': _DATE,
+    },
+    # Fare - код тарифа (FPRIME, YSAVER), а не сумма
+    'SkyTeam-Exchange': dict.fromkeys(['Date', 'FlightNumber', 'FFKey', 'Class', 'Fare', 'From', 'Status', 'To'], _STR),
+    # Validity и Days - текст периода и дней недели, их разбирает timetable.buildTimetable
+    'Skyteam_Timetable': dict.fromkeys([
+        'From', 'From_Code', 'To', 'To_Code', 'Validity', 'Days', 'Dep_Time', 'Arr_Time', 'Flight', 'Aircraft',
+        'Travel_Time'], _STR),
+}
+
+# Источники: имя -> (функция извлечения, файл в DATA_DIR, имена получаемых таблиц, параметры извлечения)
+SOURCES = {
+    'BoardingData': (data_extracting.extractBoardingData, 'BoardingData.csv', ['BoardingData'], {}),
+    'AirlinesData': (data_extracting.extractAirlinesData, 'PointzAggregator-AirlinesData.xml',
+                     ['PointzAggregator-AirlinesData'], {}),
+    'BoardingPass': (data_extracting.extractBoardingPass, 'YourBoardingPassDotAero.zip', ['YourBoardingPassDotAero'], {}),
+    'ForumProfiles': (data_extracting.extractFrequentFlyerForumProfiles, 'FrequentFlyerForum-Profiles.json',
+                      ['FrequentFlyerForum-Profiles_Base', 'FrequentFlyerForum-Profiles_Flight',
+                       'FrequentFlyerForum-Profiles_LoyalityProgram'], {}),
+    'SirenaExport': (data_extracting.extractSirenaExportFixed, 'Sirena-export-fixed.tab', ['Sirena-export-fixed'],
+                     {'ff_key': True}),
+    'SkyTeamExchange': (data_extracting.extractSkyTeamExchange, 'SkyTeam-Exchange.yaml', ['SkyTeam-Exchange'], {}),
+    'SkyteamTimetable': (data_extracting.extractSkyteamTimetable, 'Skyteam_Timetable.pdf', ['Skyteam_Timetable'], {}),
+}
+
+def _toString(series: pd.Series) -> pd.Series:
+    """Приведение столбца к строкам с сохранением пропусков; целые числа, прочитанные как float, пишутся без '.0'"""
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return series
+    def convert(value):
+        if isinstance(value, (float, np.floating)) and float(value).is_integer():
+            return str(int(value))
+        return str(value)
+    return series.map(convert, na_action='ignore').astype(object)
+
+def _toDates(series: pd.Series) -> pd.Series:
+    """Даты YYYY-MM-DD (и другие варианты ISO 8601) как datetime64; нераспознанные значения - NaT"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype(_DATE)
+    return pd.to_datetime(_toString(series), errors='coerce', format='ISO8601').astype(_DATE)
+
+def _toInt(series: pd.Series) -> pd.Series:
+    """Целые числа с пропусками (Int64); строки и float с целыми значениями переводятся, прочее - пропуск"""
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        series = pd.to_numeric(_toString(series), errors='coerce')
+    return series.astype(_INT)
+
+def _toBool(series: pd.Series) -> pd.Series:
+    """Признак с пропусками (boolean); строки 'True'/'False' (в любом регистре) переводятся, прочее - пропуск"""
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype(_BOOL)
+    values = _toString(series).str.lower().map({'true': True, 'false': False}) if series.dtype == object else series
+    return values.astype(_BOOL)
+
+_CONVERTERS = {_STR: _toString, _DATE: _toDates, _INT: _toInt, _BOOL: _toBool}
+
+def applySchema(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """
+    Приведение столбцов таблицы к её схеме из SCHEMAS
+
+    Столбцы, которых нет в схеме, но имеющие тип object, также приводятся к строкам,
+    чтобы типы не зависели от содержимого конкретного файла.
+    """
+    schema = SCHEMAS.get(name, {})
+    df = df.copy()
+    for column in df.columns:
+        dtype = schema.get(column, _STR if df[column].dtype == object else None)
+        if dtype in _CONVERTERS:
+            df[column] = _CONVERTERS[dtype](df[column])
+        elif dtype is not None:
+            df[column] = df[column].astype(dtype)
+    return df
+
+def saveTable(df: pd.DataFrame, directory: str, name: str) -> str:
+    """
+    Сохранение таблицы в Parquet по схеме
+
+    Returns:
+        str: Путь к файлу
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{name}.parquet')
+    # Индекс сохраняется, так как у некоторых таблиц он не является RangeIndex
+    applySchema(df, name).to_parquet(path, index=True)
+    # Дописанные части относились к прежнему содержимому таблицы
+    shutil.rmtree(_partsDir(directory, name), ignore_errors=True)
+    return path
+
+def _partsDir(directory: str, name: str) -> str:
+    return os.path.join(directory, f'{name}.parts')
+
+def _partPaths(directory: str, name: str) -> list:
+    parts_dir = _partsDir(directory, name)
+    if not os.path.isdir(parts_dir):
+        return []
+    return [os.path.join(parts_dir, part) for part in sorted(os.listdir(parts_dir)) if part.endswith('.parquet')]
+
+def appendTable(df: pd.DataFrame, directory: str, name: str, pending: bool = False) -> str:
+    """
+    Дописывание строк к таблице хранилища отдельной частью (основной файл не переписывается)
+
+    Части читаются loadTable после основного файла в порядке добавления и удаляются при saveTable.
+    Строки с индексом 0..n-1 (результат извлечения) нумеруются дальше после строк таблицы, поэтому
+    таблица с частями совпадает с извлечением всего файла; прочие метки индекса сохраняются.
+
+    Args:
+        pending (bool): Если True - часть пишется с суффиксом '.pending' и не читается loadTable,
+            пока её не переименуют (так incremental фиксирует несколько частей и своё состояние одновременно)
+
+    Returns:
+        str: Путь к файлу части
+    """
+    parts_dir = _partsDir(directory, name)
+    os.makedirs(parts_dir, exist_ok=True)
+    paths = _partPaths(directory, name)
+    if isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1:
+        rows = sum(pq.read_metadata(path).num_rows for path in [os.path.join(directory, f'{name}.parquet'), *paths])
+        df = df.set_axis(pd.RangeIndex(rows, rows + len(df)))
+    path = os.path.join(parts_dir, f'{len(paths):06}.parquet')
+    applySchema(df, name).to_parquet(path + '.pending' if pending else path, index=True)
+    return path + '.pending' if pending else path
+
+def loadTable(directory: str, name: str, columns: list | None = None) -> pd.DataFrame:
+    """
+    Загрузка таблицы из Parquet (вместе с частями, дописанными appendTable)
+
+    Args:
+        directory (str): Директория хранилища
+        name (str): Имя таблицы
+        columns (list | None): Загружаемые столбцы; None - все
+    """
+    df = pd.read_parquet(os.path.join(directory, f'{name}.parquet'), columns=columns)
+    parts = [pd.read_parquet(path, columns=columns) for path in _partPaths(directory, name)]
+    return pd.concat([df, *parts]) if parts else df
+
+def sourceFingerprint(path: str, known: dict | None = None) -> dict:
+    """
+    Отпечаток исходного файла: размер, время изменения и SHA-256
+
+    Если размер и время изменения совпадают с known, хэш не пересчитывается.
+    """
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if known is not None and all(known.get(key) == value for key, value in fingerprint.items()):
+        fingerprint['sha256'] = known['sha256']
+        return fingerprint
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 24), b''):
+            digest.update(block)
+    fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+def _codeDigest(func) -> str:
+    """Хэш кода модуля функции извлечения и этого модуля (схемы и приведение типов)"""
+    digest = hashlib.sha256()
+    for module in [sys.modules[func.__module__], sys.modules[__name__]]:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def cachedExtract(func, source: str, directory: str, names: list, columns=None, **kwargs):
+    """
+    Извлечение таблиц из файла с сохранением в хранилище и повторным использованием
+
+    Таблицы извлекаются заново, только если изменились содержимое исходного файла, параметры извлечения,
+    код модуля функции извлечения или схемы таблиц.
+
+    Args:
+        func: Функция извлечения из data_extracting
+        source (str): Путь к исходному файлу
+        directory (str): Директория хранилища
+        names (list): Имена таблиц, которые возвращает функция (по порядку)
+        columns (list | dict | None): Загружаемые столбцы; для нескольких таблиц - словарь имя -> столбцы
+        **kwargs: Параметры функции извлечения
+
+    Returns:
+        pd.DataFrame | tuple: Таблица или кортеж таблиц, как у func
+    """
+    meta_path = os.path.join(directory, f'{names[0]}.meta.json')
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+
+    fingerprint = sourceFingerprint(source, meta['source'] if meta else None)
+    parameters = {'function': func.__name__, 'kwargs': {key: repr(value) for key, value in sorted(kwargs.items())},
+                  'code': _codeDigest(func)}
+    fresh = (meta is not None
+             and meta['source']['sha256'] == fingerprint['sha256']
+             and meta['parameters'] == parameters
+             and all(os.path.exists(os.path.join(directory, f'{name}.parquet')) for name in names))
+
+    if not fresh:
+        result = func(source, **kwargs)
+        tables = result if isinstance(result, tuple) else (result,)
+        for name, table in zip(names, tables):
+            saveTable(table, directory, name)
+    if not fresh or meta['source'] != fingerprint:
+        os.makedirs(directory, exist_ok=True)
+        with open(meta_path, 'w') as f:
+            json.dump({'source': fingerprint, 'parameters': parameters, 'tables': names}, f)
+
+    if not isinstance(columns, dict):
+        columns = {names[0]: columns}
+    loaded = tuple(loadTable(directory, name, columns.get(name)) for name in names)
+    return loaded if len(names) > 1 else loaded[0]
+
+def recordSource(source: str, directory: str, names: list, fingerprint: dict):
+    """
+    Отметка, что таблицы names соответствуют текущему содержимому source (после дописывания новых записей),
+    чтобы cachedExtract не извлекал их заново
+    """
+    meta_path = os.path.join(directory, f'{names[0]}.meta.json')
+    if not os.path.exists(meta_path):
+        return
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    meta['source'] = fingerprint
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+
+def loadSource(data_dir: str, directory: str, source: str, columns=None, **kwargs):
+    """
+    Таблицы источника из SOURCES (например, 'SirenaExport') через cachedExtract
+
+    Args:
+        data_dir (str): Директория с исходными файлами (DATA_DIR)
+        directory (str): Директория хранилища (DATA_EXPORTED)
+        source (str): Имя источника
+        columns (list | dict | None): Загружаемые столбцы
+        **kwargs: Параметры функции извлечения
+    """
+    func, filename, names, defaults = SOURCES[source]
+    return cachedExtract(func, os.path.join(data_dir, filename), directory, names, columns=columns,
+                         **{**defaults, **kwargs})
@@ -0,0 +1,818 @@
+"""Модуль генерации синтетических данных в форматах исходных файлов"""
+import io
+import json
+import os
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+AIRPORTS = ['SVO', 'DME', 'VKO', 'LED', 'AER', 'KZN', 'OVB', 'SVX', 'KRR', 'ROV',
+            'CDG', 'AMS', 'FRA', 'MUC', 'JFK', 'ATL', 'PEK', 'PVG', 'ICN', 'NRT']
+AIRLINES = ['SU', 'AF', 'KL', 'DL', 'AZ', 'KE', 'MU', 'OK']
+PROGRAMS = ['SU', 'AF', 'DL', 'KE']
+# Тарифы (шесть символов, как в SkyTeam-Exchange.yaml)
+FARES = ['YBASIC', 'YSAVER', 'JPRIME', 'FPRIME']
+FIRST_NAMES = ['IVAN', 'PETR', 'ANNA', 'OLGA', 'SERGEY', 'MARIA', 'DMITRY', 'ELENA']
+LAST_NAMES = ['IVANOV', 'PETROV', 'SMIRNOV', 'KUZNETSOV', 'POPOV', 'SOKOLOV', 'LEBEDEV']
+
+def randomDates(rng: np.random.Generator, n: int, start='2017-01-01', days=365) -> np.ndarray:
+    """Случайные даты в формате YYYY-MM-DD"""
+    base = np.datetime64(start)
+    return np.datetime_as_string(base + rng.integers(0, days, n), unit='D')
+
+def randomFlights(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Случайные номера рейсов вида SU1234"""
+    carriers = np.array(AIRLINES)[rng.integers(0, len(AIRLINES), n)]
+    numbers = np.char.zfill(rng.integers(1, 9999, n).astype(str), 4)
+    return np.char.add(carriers, numbers)
+
+# Столбцы таблицы extractAirlinesData
+AIRLINES_COLUMNS = ['uid', 'first_name', 'last_name', 'card_number', 'bonus_program', 'activity_type', 'code', 'date',
+                    'departure', 'arrival', 'fare']
+
+def _writeAirlinesUsers(f, df: pd.DataFrame):
+    """Элементы <user> для активностей df (строки одного пользователя и одной карты идут подряд)"""
+    user = card = None
+    for row in zip(*(df[column] for column in AIRLINES_COLUMNS)):
+        uid, first, last, number, program, kind, code, date, departure, arrival, fare = row
+        if uid != user:
+            if user is not None:
+                f.write('        </activities>\n      </card>\n    </cards>\n  </user>\n')
+            f.write(f'  <user uid={quoteattr(str(uid))}>\n    <name first={quoteattr(first)} last={quoteattr(last)}/>\n'
+                    f'    <cards>\n')
+            user, card = uid, None
+        if number != card:
+            if card is not None:
+                f.write('        </activities>\n      </card>\n')
+            f.write(f'      <card number={quoteattr(number)}>\n        <bonusprogramm>{program}</bonusprogramm>\n'
+                    f'        <activities>\n')
+            card = number
+        f.write(f'          <activity type={quoteattr(kind)}><Code>{code}</Code><Date>{date}</Date>'
+                f'<Departure>{departure}</Departure><Arrival>{arrival}</Arrival><Fare>{fare}</Fare></activity>\n')
+    if user is not None:
+        f.write('        </activities>\n      </card>\n    </cards>\n  </user>\n')
+
+def writeAirlinesData(path: str, frames):
+    """
+    Запись файла в формате PointzAggregator-AirlinesData.xml
+
+    Args:
+        path (str): Путь к создаваемому файлу
+        frames: DataFrame со столбцами AIRLINES_COLUMNS или итератор таких таблиц; активности одного пользователя
+            и одной карты идут подряд и не делятся между таблицами
+    """
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<users>\n')
+        for df in [frames] if isinstance(frames, pd.DataFrame) else frames:
+            _writeAirlinesUsers(f, df)
+        f.write('</users>\n')
+
+def generateAirlinesData(path: str, n_users: int, cards_per_user: int = 2, activities_per_card: int = 5, seed: int = 0,
+                         block: int = 10_000):
+    """
+    Генерация файла в формате PointzAggregator-AirlinesData.xml
+
+    Args:
+        path (str): Путь к создаваемому файлу
+        n_users (int): Количество пользователей
+        cards_per_user (int): Количество карт у пользователя
+        activities_per_card (int): Количество активностей по карте
+        seed (int): Зерно генератора случайных чисел
+        block (int): Количество пользователей, активности которых создаются за один раз
+
+    Returns:
+        int: Количество записанных активностей
+    """
+    rng = np.random.default_rng(seed)
+    per_user = cards_per_user * activities_per_card
+
+    def frames():
+        for first_uid in range(0, n_users, block):
+            uid = np.repeat(np.arange(first_uid, min(first_uid + block, n_users)), per_user)
+            card = np.tile(np.repeat(np.arange(cards_per_user), activities_per_card), len(uid) // max(per_user, 1))
+            program = np.array(PROGRAMS)[(uid + card) % len(PROGRAMS)]
+            route = rng.integers(0, len(AIRPORTS), (len(uid), 2))
+            yield pd.DataFrame({
+                'uid': uid,
+                'first_name': np.array(FIRST_NAMES)[uid % len(FIRST_NAMES)],
+                'last_name': np.array(LAST_NAMES)[uid % len(LAST_NAMES)],
+                'card_number': np.char.add(np.char.add(program, ' '),
+                                           (100000000 + uid * cards_per_user + card).astype(str)),
+                'bonus_program': program,
+                'activity_type': 'Flight',
+                'code': randomFlights(rng, len(uid)),
+                'date': randomDates(rng, len(uid)),
+                'departure': np.array(AIRPORTS)[route[:, 0]],
+                'arrival': np.array(AIRPORTS)[route[:, 1]],
+                'fare': np.array(list('ABCDE'))[rng.integers(0, 5, len(uid))],
+            })
+
+    writeAirlinesData(path, frames())
+    return n_users * per_user
+
+def _boardingPassXlsx(values: dict) -> bytes:
+    """Содержимое xlsx файла посадочного талона; values - имя из data_extracting.BOARDING_PASS_CELLS -> значение"""
+    from data_extracting import BOARDING_PASS_CELLS
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for name, (row, column) in BOARDING_PASS_CELLS.items():
+        value = values.get(name)
+        sheet.cell(row=row + 1, column=column + 1, value=None if pd.isna(value) else value)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def writeBoardingPasses(path: str, df: pd.DataFrame):
+    """
+    Запись архива в формате YourBoardingPassDotAero.zip (по одному xlsx на строку df)
+
+    Args:
+        path (str): Путь к создаваемому zip файлу
+        df (pd.DataFrame): Столбцы - имена data_extracting.BOARDING_PASS_CELLS; пропуск - пустая ячейка
+    """
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for i, values in enumerate(df.to_dict('records')):
+            zip_ref.writestr(f'{i:08}.xlsx', _boardingPassXlsx(values))
+
+def generateBoardingPasses(path: str, n_passes: int, seed: int = 0):
+    """
+    Генерация архива в формате YourBoardingPassDotAero.zip (по одному xlsx на посадочный талон)
+
+    Args:
+        path (str): Путь к создаваемому zip файлу
+        n_passes (int): Количество посадочных талонов
+        seed (int): Зерно генератора случайных чисел
+    """
+    rng = np.random.default_rng(seed)
+    i = np.arange(n_passes)
+    route = rng.integers(0, len(AIRPORTS), (n_passes, 2))
+    names = np.char.add(np.char.add(np.array(LAST_NAMES)[i % len(LAST_NAMES)], ' '),
+                        np.array(FIRST_NAMES)[i % len(FIRST_NAMES)]).astype(object)
+    names[i % 50 == 0] = None
+    df = pd.DataFrame({
+        'sequence': rng.integers(1, 300, n_passes),
+        'gender': np.where(i % 2, 'MR', 'MRS'),
+        'passenger_name': names,
+        'trvCls': 'Y',
+        'flight_number': randomFlights(rng, n_passes),
+        'departure_city': np.array(AIRPORTS)[route[:, 0]],
+        'arrival_city': np.array(AIRPORTS)[route[:, 1]],
+        'gate': np.char.add(np.array(list('ABCD'))[i % 4], (i % 30).astype(str)),
+        'aeroport1': np.array(AIRPORTS)[route[:, 0]],
+        'aeroport2': np.array(AIRPORTS)[route[:, 1]],
+        'flight_date': randomDates(rng, n_passes),
+        'departure_time': [f'{k % 24:02}:{k % 60:02}' for k in i],
+        'seat': np.char.add((i % 40 + 1).astype(str), np.array(list('ABCDEF'))[i % 6]),
+        'pnr': [''.join(letters) for letters in np.array(list('ABCDEFGHJKLMNPQRSTUVWXYZ'))[rng.integers(0, 24, (n_passes, 6))]],
+        'ticket_number': rng.integers(10**12, 10**13, n_passes).astype(str),
+    })
+    writeBoardingPasses(path, df)
+
+# Столбцы таблицы extractSkyTeamExchange
+EXCHANGE_COLUMNS = ['Date', 'FlightNumber', 'FFKey', 'Class', 'Fare', 'From', 'Status', 'To']
+
+def _exchangeLines(df: pd.DataFrame) -> list:
+    """Строки SkyTeam-Exchange.yaml для df (строки одной даты и одного рейса идут подряд)"""
+    lines = []
+    date = flight = None
+    rows = list(zip(*(df[column] for column in EXCHANGE_COLUMNS)))
+    for i, (row_date, row_flight, key, travel_class, fare, departure, status, arrival) in enumerate(rows):
+        if row_date != date:
+            lines.append(f"'{row_date}':")
+            date, flight = row_date, None
+        if row_flight != flight:
+            lines.append(f'  {row_flight}:')
+            lines.append('    FF:')
+            flight = row_flight
+        lines.append(f'      {key}: {{CLASS: {travel_class}, FARE: {fare}}}')
+        if i + 1 == len(rows) or rows[i + 1][:2] != (row_date, row_flight):
+            lines.append(f'    FROM: {departure}')
+            lines.append(f'    STATUS: {status}')
+            lines.append(f'    TO: {arrival}')
+    return lines
+
+def writeSkyTeamExchange(path: str, frames):
+    """
+    Запись файла в формате SkyTeam-Exchange.yaml
+
+    Args:
+        path (str): Путь к создаваемому файлу
+        frames: DataFrame со столбцами EXCHANGE_COLUMNS или итератор таких таблиц; строки одной даты
+            идут подряд и не делятся между таблицами
+    """
+    with open(path, 'w') as f:
+        for df in [frames] if isinstance(frames, pd.DataFrame) else frames:
+            if len(df):
+                f.write('\n'.join(_exchangeLines(df)) + '\n')
+
+def generateSkyTeamExchange(path: str, n_days: int, flights_per_day: int = 100, keys_per_flight: int = 3, seed: int = 0):
+    """
+    Генерация файла в формате SkyTeam-Exchange.yaml
+
+    Args:
+        path (str): Путь к создаваемому файлу
+        n_days (int): Количество дат
+        flights_per_day (int): Количество рейсов за дату
+        keys_per_flight (int): Количество FF ключей на рейс
+        seed (int): Зерно генератора случайных чисел
+
+    Returns:
+        int: Количество строк таблицы, которую должен вернуть extractSkyTeamExchange
+    """
+    rng = np.random.default_rng(seed)
+    dates = np.datetime_as_string(np.datetime64('2017-01-01') + np.arange(n_days), unit='D')
+    i = np.repeat(np.arange(flights_per_day), keys_per_flight)
+    j = np.tile(np.arange(keys_per_flight), flights_per_day)
+
+    def frames():
+        for date in dates:
+            flights = randomFlights(rng, flights_per_day)
+            route = rng.integers(0, len(AIRPORTS), (flights_per_day, 2))
+            numbers = rng.integers(10**6, 10**9, (flights_per_day, keys_per_flight))
+            yield pd.DataFrame({
+                'Date': date,
+                'FlightNumber': flights[i],
+                'FFKey': np.char.add(np.char.add(np.array(PROGRAMS)[(i + j) % len(PROGRAMS)], ' '),
+                                     numbers.ravel().astype(str)),
+                'Class': np.array(list('YJF'))[j % 3],
+                'Fare': np.char.add(np.array(list('YFLEX'))[j % 5], 'BASIC'),
+                'From': np.array(AIRPORTS)[route[i, 0]],
+                'Status': np.where(i % 7, 'LANDED', 'CANCELLED'),
+                'To': np.array(AIRPORTS)[route[i, 1]],
+            })
+
+    writeSkyTeamExchange(path, frames())
+    return n_days * flights_per_day * keys_per_flight
+
+def _forumProfile(nickname: str, sex: str, first_name: str, last_name: str, programs: list, flights: list) -> dict:
+    """Профиль FrequentFlyerForum-Profiles.json; programs и flights - списки словарей"""
+    return {
+        'NickName': nickname,
+        'Sex': sex,
+        'Real Name': {'First Name': first_name, 'Last Name': last_name},
+        'Travel Documents': [],
+        'Loyality Programm': programs,
+        'Registered Flights': flights,
+    }
+
+def _forumFlight(date: str, codeshare: bool, departure: str, arrival: str, flight: str) -> dict:
+    return {
+        'Date': date,
+        'Codeshare': bool(codeshare),
+        'Arrival': {'City': 'City', 'Airport': arrival, 'Country': 'Country'},
+        'Departure': {'City': 'City', 'Airport': departure, 'Country': 'Country'},
+        'Flight': flight,
+    }
+
+def writeForumProfiles(path: str, profiles):
+    """
+    Запись файла в формате FrequentFlyerForum-Profiles.json без построения всего документа в памяти
+
+    Args:
+        path (str): Путь к создаваемому файлу
+        profiles: Итератор профилей (словарей)
+    """
+    with open(path, 'w') as f:
+        f.write('{"Forum Profiles": [')
+        for i, profile in enumerate(profiles):
+            f.write((', ' if i else '') + json.dumps(profile))
+        f.write(']}\n')
+
+def generateForumProfiles(path: str, n_profiles: int, max_flights: int = 6, max_programs: int = 2, seed: int = 0):
+    """
+    Генерация файла в формате FrequentFlyerForum-Profiles.json
+
+    Args:
+        path (str): Путь к создаваемому файлу
+        n_profiles (int): Количество профилей
+        max_flights (int): Наибольшее количество полётов в профиле (от 0 до max_flights)
+        max_programs (int): Наибольшее количество программ лояльности в профиле (от 0 до max_programs)
+        seed (int): Зерно генератора случайных чисел
+
+    Returns:
+        int: Количество полётов
+    """
+    rng = np.random.default_rng(seed)
+    n_flights = rng.integers(0, max_flights + 1, n_profiles)
+    n_programs = rng.integers(0, max_programs + 1, n_profiles)
+    dates = randomDates(rng, n_flights.sum())
+    flights = randomFlights(rng, n_flights.sum())
+    route = rng.integers(0, len(AIRPORTS), (n_flights.sum(), 2))
+    codeshare = rng.random(n_flights.sum()) < 0.2
+    offsets = np.concatenate([[0], np.cumsum(n_flights)])
+
+    def profiles():
+        for i in range(n_profiles):
+            registered = [_forumFlight(dates[k], codeshare[k], AIRPORTS[route[k, 0]], AIRPORTS[route[k, 1]], flights[k])
+                          for k in range(offsets[i], offsets[i + 1])]
+            programs = [{'programm': PROGRAMS[(i + p) % len(PROGRAMS)], 'Status': 'Gold' if i % 3 else 'Silver',
+                         'Number': 100000000 + i * max_programs + p} for p in range(n_programs[i])]
+            yield _forumProfile(f'Nick{i}', 'M' if i % 2 else 'F', FIRST_NAMES[i % len(FIRST_NAMES)],
+                                LAST_NAMES[i % len(LAST_NAMES)], programs, registered)
+
+    writeForumProfiles(path, profiles())
+    return int(n_flights.sum())
+
+# Столбцы Sirena-export-fixed.tab (в порядке data_extracting.SIRENA_COLSPECS)
+SIRENA_COLUMNS = ['PaxName', 'PaxBirthDate', 'DepartDate', 'DepartTime', 'ArrivalDate', 'ArrivalTime', 'Flight',
+                  'CodeSh', 'From', 'Dest', 'Code', 'e-Ticket', 'TravelDoc', 'Seat', 'Meal', 'TrvCls', 'Fare',
+                  'Baggage', 'PaxAdditionalInfo', 'AgentInfo']
+
+def _fixedWidthColumn(values, width: int) -> np.ndarray:
+    """Значения столбца в виде матрицы байт фиксированной ширины, дополненной пробелами"""
+    column = np.strings.ljust(np.asarray(values).astype(f'S{width}'), width)
+    return np.frombuffer(column.tobytes(), dtype=np.uint8).reshape(len(column), width)
+
+def writeSirenaExportFixed(path: str, columns: dict):
+    """
+    Запись файла в формате Sirena-export-fixed.tab
+
+    Args:
+        path (str): Путь к создаваемому файлу
+        columns (dict): Столбец из SIRENA_COLUMNS -> значения (пустая строка - пустое поле)
+    """
+    from data_extracting import SIRENA_COLSPECS, SIRENA_ROW_LENGTH
+
+    n_rows = len(columns[SIRENA_COLUMNS[0]])
+    header = ''.join(name.ljust(end - start) for name, (start, end) in zip(SIRENA_COLUMNS, SIRENA_COLSPECS))
+    records = np.full((n_rows, SIRENA_ROW_LENGTH + 1), ord('\n'), dtype=np.uint8)
+    for name, (start, end) in zip(SIRENA_COLUMNS, SIRENA_COLSPECS):
+        records[:, start:end] = _fixedWidthColumn(columns[name], end - start)
+    with open(path, 'wb') as f:
+        f.write(header.encode() + b'\n')
+        f.write(records.tobytes())
+
+def generateSirenaExportFixed(path: str, n_rows: int, n_passengers: int | None = None, ff_share: float = 0.3, seed: int = 0):
+    """
+    Генерация файла в формате Sirena-export-fixed.tab (записи по 357 байт и строка заголовка)
+
+    Args:
+        path (str): Путь к создаваемому файлу
+        n_rows (int): Количество записей
+        n_passengers (int | None): Количество различных пассажиров; None - n_rows // 10
+        ff_share (float): Доля записей с FF ключом в PaxAdditionalInfo
+        seed (int): Зерно генератора случайных чисел
+    """
+    rng = np.random.default_rng(seed)
+    n_passengers = n_passengers or max(n_rows // 10, 1)
+    passenger = rng.integers(0, n_passengers, n_rows)
+    route = rng.integers(0, len(AIRPORTS), (n_rows, 2))
+    ff = np.char.add(np.char.add('FF#', np.array(PROGRAMS)[passenger % len(PROGRAMS)]),
+                     np.char.add(' ', (100000000 + passenger).astype(str)))
+    values = [
+        np.char.add(np.array(LAST_NAMES)[passenger % len(LAST_NAMES)],
+                    np.char.add(' ', np.array(FIRST_NAMES)[passenger % len(FIRST_NAMES)])),
+        randomDates(rng, n_rows, start='1960-01-01', days=15000),
+        randomDates(rng, n_rows),
+        np.char.add(np.char.zfill((passenger % 24).astype(str), 2), ':00'),
+        randomDates(rng, n_rows),
+        np.char.add(np.char.zfill((passenger % 24).astype(str), 2), ':30'),
+        randomFlights(rng, n_rows),
+        np.full(n_rows, ''),
+        np.array(AIRPORTS)[route[:, 0]],
+        np.array(AIRPORTS)[route[:, 1]],
+        np.array(['ABC123', 'XYZ789', 'QWE456'])[passenger % 3],
+        (2 * 10**12 + passenger * 13 + rng.integers(0, 13, n_rows)).astype(str),
+        (4500000000 + passenger).astype(str),
+        np.char.add((passenger % 40 + 1).astype(str), np.array(list('ABCDEF'))[passenger % 6]),
+        np.array(['', 'VGML'])[passenger % 2],
+        np.array(['Y', 'J', 'F'])[passenger % 3],
+        np.array(['YFLEX', 'BASIC'])[passenger % 2],
+        np.array(['1PC', '2PC', ''])[passenger % 3],
+        np.where(rng.random(n_rows) < ff_share, ff, ''),
+        np.full(n_rows, 'AGENT'),
+    ]
+    writeSirenaExportFixed(path, dict(zip(SIRENA_COLUMNS, values)))
+
+def generateFlightRecords(n_rows: int, n_flights: int, noise: float = 0.2, seed: int = 0) -> pd.DataFrame:
+    """
+    Таблица записей о полётах в формате mergeDataPasports (после переименования столбцов Sirena)
+
+    В каждом рейсе одно основное направление; доля noise записей получает случайное направление,
+    у 1% записей пропущен номер рейса.
+
+    Args:
+        n_rows (int): Количество записей
+        n_flights (int): Количество рейсов (групп FlightDate, FlightTime, FlightNumber)
+        noise (float): Доля записей со случайным направлением
+        seed (int): Зерно генератора случайных чисел
+    """
+    rng = np.random.default_rng(seed)
+    flight = rng.integers(0, n_flights, n_rows)
+    airports = np.array(AIRPORTS, dtype=object)
+    base = rng.integers(0, len(AIRPORTS), (n_flights, 2))
+    route = np.where(rng.random((n_rows, 1)) < noise, rng.integers(0, len(AIRPORTS), (n_rows, 2)), base[flight])
+    df = pd.DataFrame({
+        'PassengerDocument': (4500000000 + rng.integers(0, n_rows, n_rows)).astype(str).astype(object),
+        'TicketNumber': (2 * 10**12 + np.arange(n_rows)).astype(str).astype(object),
+        'FlightNumber': randomFlights(np.random.default_rng(seed + 1), n_flights).astype(object)[flight],
+        'FlightDate': randomDates(np.random.default_rng(seed + 2), n_flights).astype(object)[flight],
+        'FlightTime': np.char.add(np.char.zfill((flight % 24).astype(str), 2), ':00').astype(object),
+        'From': airports[route[:, 0]],
+        'Dest': airports[route[:, 1]],
+        'PaxName': np.array(LAST_NAMES, dtype=object)[flight % len(LAST_NAMES)],
+    })
+    df.loc[rng.random(n_rows) < 0.01, 'FlightNumber'] = np.nan
+    return df
+
+# Столбцы таблицы extractSkyteamTimetable
+TIMETABLE_COLUMNS = ['From', 'From_Code', 'To', 'To_Code', 'Validity', 'Days', 'Dep_Time', 'Arr_Time', 'Flight',
+                     'Aircraft', 'Travel_Time']
+
+def generateTimetable(n_flights: int, periods: int = 3, open_share: float = 0.2, seed: int = 0) -> pd.DataFrame:
+    """
+    Таблица расписания в формате extractSkyteamTimetable (без pdf)
+
+    2017 год каждого рейса делится на periods периодов Validity ('05 Jan - 17 Mar') со своими днями недели Days
+    ('1.3.5..' - понедельник, среда, пятница); у доли open_share рейсов последний период открыт ('From 18 Mar').
+    Номера рейсов могут повторяться с другим маршрутом.
+
+    Args:
+        n_flights (int): Количество рейсов (маршрутов)
+        periods (int): Количество периодов Validity каждого рейса
+        open_share (float): Доля рейсов с открытым последним периодом
+        seed (int): Зерно генератора случайных чисел
+    """
+    rng = np.random.default_rng(seed)
+    flights = randomFlights(rng, n_flights)
+    route = rng.integers(0, len(AIRPORTS), (n_flights, 2))
+    cuts = np.sort(rng.integers(1, 365, (n_flights, periods - 1)), axis=1)
+    starts = np.hstack([np.zeros((n_flights, 1), dtype=int), cuts]).ravel()
+    ends = np.hstack([cuts - 1, np.full((n_flights, 1), 364)]).ravel()
+    first_day = np.datetime64('2017-01-01')
+    start_text = pd.to_datetime(first_day + starts).strftime('%d %b').to_numpy(dtype=object)
+    end_text = pd.to_datetime(first_day + np.maximum(ends, starts)).strftime('%d %b').to_numpy(dtype=object)
+    validity = start_text + ' - ' + end_text
+    is_open = np.zeros((n_flights, periods), dtype=bool)
+    is_open[:, -1] = rng.random(n_flights) < open_share
+    validity = np.where(is_open.ravel(), 'From ' + start_text, validity)
+
+    masks = rng.integers(1, 128, n_flights * periods)
+    days = np.full(len(masks), '', dtype=object)
+    for day in range(7):
+        days = days + np.where(masks >> day & 1, str(day + 1), '.')
+    airports = np.array(AIRPORTS, dtype=object)
+    flight = np.repeat(np.arange(n_flights), periods)
+    dep = rng.integers(0, 24 * 12, n_flights)[flight] * 5
+    return pd.DataFrame({
+        'From': airports[route[flight, 0]],
+        'From_Code': airports[route[flight, 0]],
+        'To': airports[route[flight, 1]],
+        'To_Code': airports[route[flight, 1]],
+        'Validity': validity,
+        'Days': days,
+        'Dep_Time': [f'{minutes // 60:02d}:{minutes % 60:02d}' for minutes in dep],
+        'Arr_Time': [f'{(minutes + 150) // 60 % 24:02d}:{(minutes + 150) % 60:02d}' for minutes in dep],
+        'Flight': flights.astype(object)[flight],
+        'Aircraft': '320',
+        'Travel_Time': '2H30M',
+    }, columns=TIMETABLE_COLUMNS)
+
+def generatePaxAdditionalInfo(n_rows: int, ff_share: float = 0.3, seed: int = 0) -> pd.Series:
+    """
+    Столбец PaxAdditionalInfo: доля ff_share значений с FF ключом, часть прочих - пропуски
+
+    Args:
+        n_rows (int): Количество значений
+        ff_share (float): Доля значений с FF ключом
+        seed (int): Зерно генератора случайных чисел
+    """
+    rng = np.random.default_rng(seed)
+    number = rng.integers(10**6, 10**9, n_rows).astype(str)
+    program = np.array(PROGRAMS)[rng.integers(0, len(PROGRAMS), n_rows)]
+    ff = np.char.add(np.char.add('DOCS MEAL FF#', program), np.char.add(' ', number))
+    other = np.array(['DOCS', 'MEAL VGML', 'WCHR'])[rng.integers(0, 3, n_rows)]
+    values = pd.Series(np.where(rng.random(n_rows) < ff_share, ff, other), dtype=object)
+    values[rng.random(n_rows) < 0.2] = np.nan
+    return values
+
+# Координаты аэропортов AIRPORTS (широта, долгота) для Airports.csv
+AIRPORT_COORDINATES = {
+    'SVO': (55.97, 37.41), 'DME': (55.41, 37.90), 'VKO': (55.60, 37.27), 'LED': (59.80, 30.26),
+    'AER': (43.45, 39.96), 'KZN': (55.61, 49.28), 'OVB': (55.01, 82.65), 'SVX': (56.74, 60.80),
+    'KRR': (45.03, 39.17), 'ROV': (47.49, 39.92), 'CDG': (49.01, 2.55), 'AMS': (52.31, 4.76),
+    'FRA': (50.04, 8.56), 'MUC': (48.35, 11.79), 'JFK': (40.64, -73.78), 'ATL': (33.64, -84.43),
+    'PEK': (40.08, 116.58), 'PVG': (31.14, 121.81), 'ICN': (37.46, 126.44), 'NRT': (35.77, 140.39),
+}
+
+# Доля людей, которые есть в каждом источнике generateDataset (все их полёты попадают в источник)
+PRESENCE = {
+    'SirenaExport': 0.9,
+    'BoardingData': 0.7,
+    'AirlinesData': 0.5,
+    'SkyTeamExchange': 0.6,
+    'ForumProfiles': 0.2,
+    'BoardingPass': 0.02,
+}
+
+def _uniqueNumbers(rng: np.random.Generator, n: int, start: int) -> np.ndarray:
+    """n различных случайных чисел не меньше start"""
+    return start + rng.choice(10 * max(n, 1), n, replace=False)
+
+def generatePeople(n_people: int, max_cards: int = 2, card_share: float = 0.7, seed: int = 0) -> tuple:
+    """
+    Люди и их карты лояльности - общая основа источников generateDataset
+
+    Args:
+        n_people (int): Количество людей
+        max_cards (int): Наибольшее количество карт у человека
+        card_share (float): Доля людей, у которых есть карты
+        seed (int): Зерно генератора случайных чисел
+
+    Returns:
+        tuple: people (person, FirstName, LastName, Sex, BirthDate, Document, NickName, uid)
+            и cards (person, programm, Number, FFKey), карты одного человека идут подряд
+    """
+    rng = np.random.default_rng(seed)
+    person = np.arange(n_people)
+    people = pd.DataFrame({
+        'person': person,
+        'FirstName': np.array(FIRST_NAMES, dtype=object)[rng.integers(0, len(FIRST_NAMES), n_people)],
+        'LastName': np.array(LAST_NAMES, dtype=object)[rng.integers(0, len(LAST_NAMES), n_people)],
+        'Sex': np.array(['Male', 'Female'], dtype=object)[rng.integers(0, 2, n_people)],
+        'BirthDate': randomDates(rng, n_people, start='1950-01-01', days=20000).astype(object),
+        'Document': _uniqueNumbers(rng, n_people, 4500000000).astype(str).astype(object),
+        'NickName': np.char.add('Nick', person.astype(str)).astype(object),
+        'uid': person.astype(str).astype(object),
+    })
+    n_cards = np.where(rng.random(n_people) < card_share, rng.integers(1, max_cards + 1, n_people), 0)
+    program = np.array(PROGRAMS, dtype=object)[rng.integers(0, len(PROGRAMS), n_cards.sum())]
+    number = _uniqueNumbers(rng, int(n_cards.sum()), 100000000)
+    cards = pd.DataFrame({
+        'person': np.repeat(person, n_cards),
+        'programm': program,
+        'Number': number,
+        'FFKey': program + ' ' + number.astype(str).astype(object),
+    })
+    return people, cards
+
+def generateTrips(people: pd.DataFrame, cards: pd.DataFrame, trips_per_person: float = 5, passengers_per_flight: int = 50,
+                  ff_share: float = 0.6, seed: int = 0) -> pd.DataFrame:
+    """
+    Полёты людей: рейсы общие для всех источников, у каждого полёта свой билет
+
+    Args:
+        people (pd.DataFrame): Люди из generatePeople
+        cards (pd.DataFrame): Карты из generatePeople
+        trips_per_person (float): Среднее количество полётов человека (распределение Пуассона)
+        passengers_per_flight (int): Среднее количество пассажиров рейса
+        ff_share (float): Доля полётов с FF ключом среди полётов людей, у которых есть карты
+        seed (int): Зерно генератора случайных чисел
+
+    Returns:
+        pd.DataFrame: person, FlightNumber, FlightDate, FlightTime, From, Dest, TicketNumber, BookingCode, Seat,
+            Class, Fare, FFKey (пропуск - полёт без карты)
+    """
+    rng = np.random.default_rng(seed)
+    n_people = len(people)
+    n_trips = rng.poisson(trips_per_person, n_people)
+    person = np.repeat(people['person'].to_numpy(), n_trips)
+    total = len(person)
+
+    n_flights = max(total // passengers_per_flight, 1)
+    departure = rng.integers(0, len(AIRPORTS), n_flights)
+    destination = (departure + rng.integers(1, len(AIRPORTS), n_flights)) % len(AIRPORTS)
+    flight = rng.integers(0, n_flights, total)
+    airports = np.array(AIRPORTS, dtype=object)
+
+    # Карта полёта - случайная карта человека
+    card_count = np.bincount(cards['person'], minlength=n_people)
+    card_start = np.concatenate([[0], np.cumsum(card_count)[:-1]])
+    with_card = (card_count[person] > 0) & (rng.random(total) < ff_share)
+    card = card_start[person] + (rng.random(total) * card_count[person]).astype(np.int64)
+    ff_key = np.full(total, None, dtype=object)
+    ff_key[with_card] = cards['FFKey'].to_numpy(dtype=object)[card[with_card]]
+
+    hours = rng.integers(0, 24, n_flights)
+    minutes = rng.integers(0, 12, n_flights) * 5
+    letters = np.array(list('ABCDEFGHJKLMNPQRSTUVWXYZ'))[rng.integers(0, 24, (total, 6))]
+    return pd.DataFrame({
+        'person': person,
+        'FlightNumber': randomFlights(rng, n_flights).astype(object)[flight],
+        'FlightDate': randomDates(rng, n_flights).astype(object)[flight],
+        'FlightTime': np.array([f'{h:02}:{m:02}' for h, m in zip(hours, minutes)], dtype=object)[flight],
+        'From': airports[departure][flight],
+        'Dest': airports[destination][flight],
+        'TicketNumber': _uniqueNumbers(rng, total, 2 * 10**12).astype(str).astype(object),
+        'BookingCode': letters.view('<U6').ravel().astype(object),
+        'Seat': np.char.add((rng.integers(1, 41, total)).astype(str),
+                            np.array(list('ABCDEF'))[rng.integers(0, 6, total)]).astype(object),
+        'Class': np.array(['Y', 'J', 'F'], dtype=object)[rng.integers(0, 3, total)],
+        'Fare': np.array(FARES, dtype=object)[rng.integers(0, len(FARES), total)],
+        'FFKey': ff_key,
+    })
+
+def _sirenaColumns(trips: pd.DataFrame) -> dict:
+    """Столбцы Sirena-export-fixed.tab для полётов (с данными людей)"""
+    ff = trips['FFKey'].to_numpy(dtype=object)
+    return {
+        'PaxName': (trips['LastName'] + ' ' + trips['FirstName']).to_numpy(dtype=str),
+        'PaxBirthDate': trips['BirthDate'].to_numpy(dtype=str),
+        'DepartDate': trips['FlightDate'].to_numpy(dtype=str),
+        'DepartTime': trips['FlightTime'].to_numpy(dtype=str),
+        'ArrivalDate': trips['FlightDate'].to_numpy(dtype=str),
+        'ArrivalTime': trips['FlightTime'].to_numpy(dtype=str),
+        'Flight': trips['FlightNumber'].to_numpy(dtype=str),
+        'CodeSh': np.full(len(trips), ''),
+        'From': trips['From'].to_numpy(dtype=str),
+        'Dest': trips['Dest'].to_numpy(dtype=str),
+        'Code': trips['BookingCode'].to_numpy(dtype=str),
+        'e-Ticket': trips['TicketNumber'].to_numpy(dtype=str),
+        'TravelDoc': trips['Document'].to_numpy(dtype=str),
+        'Seat': trips['Seat'].to_numpy(dtype=str),
+        'Meal': np.full(len(trips), ''),
+        'TrvCls': trips['Class'].to_numpy(dtype=str),
+        'Fare': trips['Fare'].to_numpy(dtype=str),
+        'Baggage': np.full(len(trips), '1PC'),
+        'PaxAdditionalInfo': np.where(pd.isna(ff), '', 'FF#' + ff.astype(str)),
+        'AgentInfo': np.full(len(trips), 'AGENT'),
+    }
+
+def _boardingData(trips: pd.DataFrame, people: pd.DataFrame, conflicts: float, missing_tickets: float,
+                  rng: np.random.Generator) -> pd.DataFrame:
+    """Строки BoardingData.csv; у доли conflicts документ другого человека, у доли missing_tickets нет билета"""
+    documents = trips['Document'].to_numpy(dtype=object).copy()
+    conflict = rng.random(len(trips)) < conflicts
+    documents[conflict] = people['Document'].to_numpy(dtype=object)[rng.integers(0, len(people), conflict.sum())]
+    tickets = trips['TicketNumber'].to_numpy(dtype=object).copy()
+    tickets[rng.random(len(trips)) < missing_tickets] = 'Not presented'
+    return pd.DataFrame({
+        'PassengerFirstName': trips['FirstName'],
+        'PassengerSecondName': np.array(list('ABCDEFGHIKLMNOPRSTV'), dtype=object)[rng.integers(0, 19, len(trips))],
+        'PassengerLastName': trips['LastName'],
+        'PassengerSex': trips['Sex'],
+        'PassengerBirthDate': trips['BirthDate'],
+        'PassengerDocument': documents,
+        'BookingCode': trips['BookingCode'],
+        'TicketNumber': tickets,
+        'Baggage': np.array(['Transit', 'Registered'], dtype=object)[rng.integers(0, 2, len(trips))],
+        'FlightDate': trips['FlightDate'],
+        'FlightTime': trips['FlightTime'],
+        'FlightNumber': trips['FlightNumber'],
+        'CodeShare': np.array(['Own', 'Operator', 'Marketing'], dtype=object)[rng.integers(0, 3, len(trips))],
+        'Destination': trips['Dest'],
+    })
+
+def _airlinesActivities(trips: pd.DataFrame, people: pd.DataFrame, shared_cards: float,
+                        rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Активности PointzAggregator-AirlinesData.xml: полёты с картой, сгруппированные по пользователю и карте;
+    доля shared_cards карт встречается ещё и у другого пользователя (одна активность)
+    """
+    df = trips[trips['FFKey'].notna()]
+    keys = df['FFKey'].unique()
+    copies = df[df['FFKey'].isin(keys[rng.random(len(keys)) < shared_cards])].drop_duplicates('FFKey').copy()
+    other = rng.integers(0, len(people), len(copies))
+    for column in ['person', 'uid', 'FirstName', 'LastName']:
+        copies[column] = people[column].to_numpy()[other]
+    df = pd.concat([df, copies]).sort_values(['person', 'FFKey'], kind='stable')
+    return pd.DataFrame({
+        'uid': df['uid'],
+        'first_name': df['FirstName'],
+        'last_name': df['LastName'],
+        'card_number': df['FFKey'],
+        'bonus_program': df['FFKey'].str[:2],
+        'activity_type': 'Flight',
+        'code': df['FlightNumber'],
+        'date': df['FlightDate'],
+        'departure': df['From'],
+        'arrival': df['Dest'],
+        'fare': df['Fare'].str[0],
+    })
+
+def _exchangeRows(trips: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """Строки SkyTeam-Exchange.yaml: полёты с картой, сгруппированные по дате и рейсу"""
+    df = trips[trips['FFKey'].notna()]
+    # Один и тот же номер рейса в одну дату может встретиться с разным временем - это один блок рейса
+    df = df.sort_values(['FlightDate', 'FlightNumber', 'FlightTime'], kind='stable')
+    df = df.drop_duplicates(['FlightDate', 'FlightNumber', 'FFKey'])
+    first = ~df.duplicated(['FlightDate', 'FlightNumber'])
+    route = df[['From', 'Dest']].where(first).ffill()
+    status = np.where(rng.random(len(df)) < 0.05, 'CANCELLED', 'LANDED')
+    return pd.DataFrame({
+        'Date': df['FlightDate'],
+        'FlightNumber': df['FlightNumber'],
+        'FFKey': df['FFKey'],
+        'Class': df['Class'],
+        'Fare': df['Fare'],
+        'From': route['From'],
+        'Status': pd.Series(status, index=df.index).where(first).ffill(),
+        'To': route['Dest'],
+    })
+
+def _forumProfiles(people: pd.DataFrame, cards: pd.DataFrame, trips: pd.DataFrame, rng: np.random.Generator):
+    """Профили форума людей people с их картами и полётами"""
+    programs = {person: group for person, group in cards[cards['person'].isin(people['person'])].groupby('person')}
+    trips = trips.assign(Codeshare=rng.random(len(trips)) < 0.2)
+    flights = {person: group for person, group in trips.groupby('person')}
+    empty = trips.iloc[:0]
+    for person, nickname, sex, first, last in zip(people['person'], people['NickName'], people['Sex'],
+                                                  people['FirstName'], people['LastName']):
+        group = programs.get(person)
+        person_programs = [] if group is None else [
+            {'programm': program, 'Status': 'Gold' if number % 3 else 'Silver', 'Number': int(number)}
+            for program, number in zip(group['programm'], group['Number'])]
+        group = flights.get(person, empty)
+        person_flights = [_forumFlight(*values) for values in
+                          zip(group['FlightDate'], group['Codeshare'], group['From'], group['Dest'], group['FlightNumber'])]
+        yield _forumProfile(nickname, sex[0], first, last, person_programs, person_flights)
+
+def _boardingPassRows(trips: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """Посадочные талоны полётов; у 2% талонов нет имени пассажира"""
+    names = (trips['LastName'] + ' ' + trips['FirstName']).to_numpy(dtype=object)
+    names[rng.random(len(trips)) < 0.02] = None
+    return pd.DataFrame({
+        'sequence': rng.integers(1, 300, len(trips)),
+        'gender': np.where(trips['Sex'] == 'Male', 'MR', 'MRS'),
+        'passenger_name': names,
+        'trvCls': trips['Class'].to_numpy(),
+        'flight_number': trips['FlightNumber'].to_numpy(),
+        'departure_city': trips['From'].to_numpy(),
+        'arrival_city': trips['Dest'].to_numpy(),
+        'gate': np.char.add(np.array(list('ABCD'))[rng.integers(0, 4, len(trips))],
+                            rng.integers(1, 30, len(trips)).astype(str)),
+        'aeroport1': trips['From'].to_numpy(),
+        'aeroport2': trips['Dest'].to_numpy(),
+        'flight_date': trips['FlightDate'].to_numpy(),
+        'departure_time': trips['FlightTime'].to_numpy(),
+        'seat': trips['Seat'].to_numpy(),
+        'pnr': trips['BookingCode'].to_numpy(),
+        'ticket_number': trips['TicketNumber'].to_numpy(),
+    })
+
+def generateAirports(path: str):
+    """Генерация Airports.csv (iata_code, latitude, longitude) для аэропортов AIRPORTS"""
+    pd.DataFrame([(code, *AIRPORT_COORDINATES[code]) for code in AIRPORTS],
+                 columns=['iata_code', 'latitude', 'longitude']).to_csv(path, index=False)
+
+def generateDataset(data_dir: str, n_people: int = 1000, presence: dict | None = None, trips_per_person: float = 5,
+                    ff_share: float = 0.6, conflicts: float = 0.01, missing_tickets: float = 0.05,
+                    shared_cards: float = 0.01, seed: int = 0) -> dict:
+    """
+    Генерация всех исходных файлов (кроме Skyteam_Timetable.pdf) по одним и тем же людям и полётам
+
+    Каждый человек попадает в источник с вероятностью presence[источник] (независимо для источников)
+    вместе со всеми своими полётами, поэтому доля общих людей любых двух источников задаётся presence.
+    Документы, билеты, FF ключи, ники и рейсы одного человека совпадают во всех источниках, где он есть;
+    расхождения задаются conflicts (чужой документ в BoardingData), missing_tickets ('Not presented')
+    и shared_cards (карта у двух пользователей PointzAggregator).
+
+    Args:
+        data_dir (str): Директория для файлов (имена как в storage.SOURCES) и Airports.csv
+        n_people (int): Количество людей
+        presence (dict | None): Источник (имя storage.SOURCES) -> доля людей в нём; недостающие - из PRESENCE
+        trips_per_person (float): Среднее количество полётов человека
+        ff_share (float): Доля полётов с FF ключом среди полётов людей, у которых есть карты
+        conflicts (float): Доля строк BoardingData с документом другого человека
+        missing_tickets (float): Доля строк BoardingData без номера билета
+        shared_cards (float): Доля карт PointzAggregator, которые есть ещё у одного пользователя
+        seed (int): Зерно генератора случайных чисел
+
+    Returns:
+        dict: people - люди (с булевыми столбцами in_<источник>), cards - карты, trips - полёты,
+            rows - источник -> количество записанных записей
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    presence = {**PRESENCE, **(presence or {})}
+    rng = np.random.default_rng(seed)
+    people, cards = generatePeople(n_people, seed=seed)
+    trips = generateTrips(people, cards, trips_per_person=trips_per_person, ff_share=ff_share, seed=seed + 1)
+    trips = trips.join(people.set_index('person'), on='person')
+    for source, share in presence.items():
+        people[f'in_{source}'] = rng.random(n_people) < share
+
+    def present(source: str) -> pd.DataFrame:
+        return trips[people[f'in_{source}'].to_numpy()[trips['person'].to_numpy()]]
+
+    rows = {}
+    sirena = present('SirenaExport')
+    writeSirenaExportFixed(os.path.join(data_dir, 'Sirena-export-fixed.tab'), _sirenaColumns(sirena))
+    rows['SirenaExport'] = len(sirena)
+
+    boarding = _boardingData(present('BoardingData'), people, conflicts, missing_tickets, rng)
+    boarding.to_csv(os.path.join(data_dir, 'BoardingData.csv'), sep=';', index=False)
+    rows['BoardingData'] = len(boarding)
+
+    activities = _airlinesActivities(present('AirlinesData'), people, shared_cards, rng)
+    writeAirlinesData(os.path.join(data_dir, 'PointzAggregator-AirlinesData.xml'), activities)
+    rows['AirlinesData'] = len(activities)
+
+    exchange = _exchangeRows(present('SkyTeamExchange'), rng)
+    writeSkyTeamExchange(os.path.join(data_dir, 'SkyTeam-Exchange.yaml'), exchange)
+    rows['SkyTeamExchange'] = len(exchange)
+
+    forum = people[people['in_ForumProfiles']]
+    writeForumProfiles(os.path.join(data_dir, 'FrequentFlyerForum-Profiles.json'),
+                       _forumProfiles(forum, cards, present('ForumProfiles'), rng))
+    rows['ForumProfiles'] = len(forum)
+
+    passes = _boardingPassRows(present('BoardingPass'), rng)
+    writeBoardingPasses(os.path.join(data_dir, 'YourBoardingPassDotAero.zip'), passes)
+    rows['BoardingPass'] = len(passes)
+
+    generateAirports(os.path.join(data_dir, 'Airports.csv'))
+    return {'people': people, 'cards': cards, 'trips': trips, 'rows': rows}
@@ -0,0 +1,16 @@
+"""Общие данные тестов: модули проекта лежат в корне репозитория"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_data  # noqa: E402
+
+@pytest.fixture(scope='session')
+def dataset_dir(tmp_path_factory) -> str:
+    """Синтетические исходные файлы (synthetic_data.generateDataset) на 300 человек"""
+    data_dir = str(tmp_path_factory.mktemp('data'))
+    synthetic_data.generateDataset(data_dir, n_people=300)
+    return data_dir
@@ -0,0 +1,87 @@
+import json
+
+import pandas as pd
+import pytest
+
+import benchmarking
+import data_extracting
+import synthetic_data
+
+
+def _reference(path):
+    """Разбор как в исходной реализации: json_normalize каждого профиля и concat"""
+    with open(path) as f:
+        data = json.load(f)
+    tables = []
+    for name in data_extracting.FORUM_SUBTABLES:
+        parts = []
+        for profile in data['Forum Profiles']:
+            part = pd.json_normalize(profile[name])
+            part['NickName'] = profile['NickName']
+            parts.append(part)
+        tables.append(pd.concat(parts))
+    return tables
+
+
+def _profile(nick, flights, programs):
+    return {'NickName': nick, 'Sex': 'Male', 'Real Name': {'First Name': 'A', 'Last Name': nick},
+            'Travel Documents': [], 'Registered Flights': flights, 'Loyality Programm': programs}
+
+
+FLIGHT = {'Date': '2017-01-01', 'Codeshare': False, 'Flight': 'SU1',
+          'Arrival': {'City': 'Moscow', 'Airport': 'SVO', 'Country': 'RU'},
+          'Departure': {'City': 'Sochi', 'Airport': 'AER', 'Country': 'RU'}}
+
+
+@pytest.mark.parametrize('profiles', [
+    # У одного профиля нет полётов и программ: Number float64, Codeshare object
+    [_profile('a', [FLIGHT], [{'programm': 'SU', 'Status': 'Gold', 'Number': 123}]), _profile('b', [], [])],
+    # Все профили полные: типы по значениям
+    [_profile('a', [FLIGHT, dict(FLIGHT, Codeshare=True)], [{'programm': 'SU', 'Status': 'Gold', 'Number': 123}]),
+     _profile('b', [FLIGHT], [{'programm': 'DL', 'Status': 'Basic', 'Number': 7}])],
+    # Поле есть не у всех профилей
+    [_profile('a', [FLIGHT], [{'programm': 'SU', 'Number': 123}]),
+     _profile('b', [FLIGHT], [{'programm': 'DL', 'Status': 'Basic', 'Number': 7}])],
+])
+def test_forum_profiles_match_concat(tmp_path, profiles):
+    path = tmp_path / 'FrequentFlyerForum-Profiles.json'
+    path.write_text(json.dumps({'Forum Profiles': profiles}))
+    for table, expected in zip(data_extracting.extractFrequentFlyerForumProfiles(str(path)), _reference(path)):
+        pd.testing.assert_frame_equal(table, expected)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_boarding_pass_matches_read_excel(tmp_path, workers):
+    path = str(tmp_path / 'YourBoardingPassDotAero.zip')
+    synthetic_data.generateBoardingPasses(path, 40)
+    expected = benchmarking._sortedRows(benchmarking._baselineExtractBoardingPass(path))
+    result = benchmarking._sortedRows(data_extracting.extractBoardingPass(path, workers=workers))
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.fixture
+def exchange_path(tmp_path):
+    path = str(tmp_path / 'SkyTeam-Exchange.yaml')
+    synthetic_data.generateSkyTeamExchange(path, n_days=30, flights_per_day=20)
+    return path
+
+
+def test_skyteam_exchange_matches_baseline(exchange_path, dataset_dir):
+    for path in [exchange_path, f'{dataset_dir}/SkyTeam-Exchange.yaml']:
+        pd.testing.assert_frame_equal(data_extracting.extractSkyTeamExchange(path),
+                                      benchmarking._baselineExtractSkyTeamExchange(path))
+
+
+@pytest.mark.parametrize('workers', [2, 3, 7])
+def test_skyteam_exchange_workers_match_single_process(exchange_path, workers):
+    expected = data_extracting.extractSkyTeamExchange(exchange_path, workers=1)
+    pd.testing.assert_frame_equal(data_extracting.extractSkyTeamExchange(exchange_path, workers=workers), expected)
+
+
+def test_skyteam_exchange_typed(exchange_path):
+    expected = benchmarking._baselineExtractSkyTeamExchange(exchange_path)
+    result = data_extracting.extractSkyTeamExchange(exchange_path, workers=2, typed=True)
+    pd.testing.assert_series_equal(result['Date'], pd.to_datetime(expected['Date']))
+    for column in ['Class', 'Status']:
+        assert isinstance(result[column].dtype, pd.CategoricalDtype)
+        pd.testing.assert_series_equal(result[column].astype(object), expected[column])
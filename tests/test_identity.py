@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import data_extracting
+import identity
+import merging
+
+
+def _clusters(identities: pd.DataFrame) -> dict:
+    return {(kind, value): cluster for kind, value, cluster in identities.itertuples(index=False)}
+
+
+def _forum(programs: list, numbers: list, nicknames: list) -> tuple:
+    return None, None, pd.DataFrame({'programm': programs, 'Number': numbers, 'NickName': nicknames})
+
+
+def test_forum_key_joins_airline_card_when_number_is_float():
+    airlines = pd.DataFrame({'card_number': ['SU 123'], 'uid': ['u1']})
+    # Number - float64, так как у второго профиля номера нет
+    forum = _forum(['SU', 'DL'], [123.0, np.nan], ['nick', 'other'])
+    identities = identity.resolveIdentities(identity.identityEdges(df_airlines=airlines, df_forum=forum))
+    clusters = _clusters(identities)
+    assert clusters[('uid', 'u1')] == clusters[('nickname', 'nick')] == clusters[('ffkey', 'SU 123')]
+    assert not identities['value'].astype(str).str.contains('nan').any()
+    assert ('nickname', 'other') not in clusters
+
+
+def test_multi_hop_chain_resolves_to_one_cluster():
+    # Внутренний паспорт -> билет -> загранпаспорт (BoardingData) -> FF ключ -> uid -> ник
+    sirena = pd.DataFrame({'TravelDoc': ['1111 222333', 'AB1234567', '9999 000000'],
+                           'e-Ticket': ['T1', 'T2', 'T3'],
+                           'FFKey': [np.nan, 'SU 123', 'AF 7']})
+    boarding = pd.DataFrame({'PassengerDocument': ['AB1234567', '5555 666777'],
+                             'TicketNumber': ['T1', 'Not presented']})
+    airlines = pd.DataFrame({'card_number': ['SU 123', 'AF 8'], 'uid': ['u1', 'u2']})
+    forum = _forum(['SU', 'AF'], [123, 8], ['nick', 'nick2'])
+    exchange = pd.DataFrame({'FFKey': ['SU 123', 'KL 5']})
+    identities = identity.resolveIdentities(identity.identityEdges(sirena, boarding, airlines, forum, exchange))
+    clusters = _clusters(identities)
+
+    chain = [('passport', '1111 222333'), ('ticket', 'T1'), ('passport', 'AB1234567'), ('ticket', 'T2'),
+             ('ffkey', 'SU 123'), ('uid', 'u1'), ('nickname', 'nick')]
+    assert len({clusters[node] for node in chain}) == 1
+    assert clusters[('uid', 'u2')] == clusters[('nickname', 'nick2')] != clusters[('uid', 'u1')]
+    assert clusters[('passport', '9999 000000')] != clusters[('uid', 'u2')]
+    assert ('ticket', 'Not presented') not in clusters
+
+    summary = identity.clusterSummary(identities)
+    row = summary.loc[clusters[('uid', 'u1')]]
+    assert row['ID'] == 'pass_1111 222333'
+    assert (row['n_passport'], row['n_ticket'], row['n_ffkey'], row['n_uid'], row['n_nickname']) == (2, 2, 1, 1, 1)
+    assert not summary['ambiguous'].any()
+
+
+def test_ambiguous_clusters_match_bad_of_mergeLoyality(dataset_dir):
+    exchange = data_extracting.extractSkyTeamExchange(os.path.join(dataset_dir, 'SkyTeam-Exchange.yaml'))
+    forum = data_extracting.extractFrequentFlyerForumProfiles(os.path.join(dataset_dir, 'FrequentFlyerForum-Profiles.json'))
+    airlines = data_extracting.extractAirlinesData(os.path.join(dataset_dir, 'PointzAggregator-AirlinesData.xml'))
+    bad = merging.mergeLoyality(exchange, forum, airlines.copy())[1]
+    assert len(bad)
+
+    identities = identity.resolveIdentities(identity.identityEdges(df_airlines=airlines, df_forum=forum,
+                                                                   df_exchange=exchange))
+    summary = identity.clusterSummary(identities)
+    uids = identities[identities['kind'] == 'uid']
+    ambiguous = set(uids.loc[uids['cluster_id'].isin(summary.index[summary['ambiguous']]), 'value'])
+    # Владельцы FF ключей, которыми пользуются разные uid
+    owners = set(airlines.loc[airlines['card_number'].isin(bad['FFKey']), 'uid'])
+    assert ambiguous == owners
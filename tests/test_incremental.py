@@ -0,0 +1,99 @@
+import os
+import pickle
+import re
+import shutil
+import warnings
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+import incremental
+import pipeline
+import storage
+
+def _store(tmp_path) -> tuple:
+    store_dir, state_dir = str(tmp_path / 'store'), str(tmp_path / 'state')
+    storage.saveTable(pd.DataFrame({'TicketNumber': ['1', '2']}), store_dir, 'BoardingData')
+    os.makedirs(state_dir)
+    incremental._saveState(state_dir, {'version': 1})
+    return store_dir, state_dir
+
+def _stage(store_dir: str, state_dir: str) -> tuple:
+    """Изменения одного обновления до фиксации: часть таблицы и новые хэши"""
+    part = storage.appendTable(pd.DataFrame({'TicketNumber': ['3']}), store_dir, 'BoardingData', pending=True)
+    index = incremental.HashIndex(os.path.join(state_dir, 'tickets'), staged=True)
+    assert index.add(np.array([7, 7, 8], dtype=np.uint64)).tolist() == [True, False, True]
+    return part, {'tickets': index}
+
+def test_appendTable_continues_extraction_index(tmp_path):
+    store_dir, _ = _store(tmp_path)
+    storage.appendTable(pd.DataFrame({'TicketNumber': ['3']}), store_dir, 'BoardingData')
+    storage.appendTable(pd.DataFrame({'TicketNumber': ['4', '5']}), store_dir, 'BoardingData')
+    assert storage.loadTable(store_dir, 'BoardingData').index.tolist() == [0, 1, 2, 3, 4]
+
+def test_journal_replayed_after_crash_past_commit(tmp_path, monkeypatch):
+    store_dir, state_dir = _store(tmp_path)
+    part, indexes = _stage(store_dir, state_dir)
+    monkeypatch.setattr(incremental, '_applyJournal', lambda state_dir: None)
+    incremental._writeJournal(state_dir, [part], indexes, {'version': 2})
+    monkeypatch.undo()
+    assert len(storage.loadTable(store_dir, 'BoardingData')) == 2
+
+    assert incremental.loadState(state_dir) == {'version': 2}
+    assert storage.loadTable(store_dir, 'BoardingData')['TicketNumber'].tolist() == ['1', '2', '3']
+    assert incremental.HashIndex(os.path.join(state_dir, 'tickets')).contains(np.array([7, 8, 9])).tolist() == \
+        [True, True, False]
+    assert not os.path.exists(os.path.join(state_dir, 'journal'))
+
+def test_journal_discarded_before_commit(tmp_path):
+    store_dir, state_dir = _store(tmp_path)
+    _stage(store_dir, state_dir)
+    os.makedirs(os.path.join(state_dir, 'journal'))
+    assert incremental.loadState(state_dir) == {'version': 1}
+    assert len(storage.loadTable(store_dir, 'BoardingData')) == 2
+    assert len(incremental.HashIndex(os.path.join(state_dir, 'tickets'))) == 0
+
+def _partialCopy(data_dir: str, target: str, share: float):
+    """Копия исходных файлов, в которой от дописываемых источников оставлена первая доля share"""
+    shutil.copytree(data_dir, target)
+    with open(os.path.join(data_dir, 'BoardingData.csv'), 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    with open(os.path.join(target, 'BoardingData.csv'), 'wb') as f:
+        f.write(b''.join(lines[:int(len(lines) * share)]))
+    with open(os.path.join(data_dir, 'SkyTeam-Exchange.yaml'), 'rb') as f:
+        text = f.read()
+    dates = [match.start() for match in re.finditer(rb"^'\d{4}-\d{2}-\d{2}':", text, re.M)]
+    with open(os.path.join(target, 'SkyTeam-Exchange.yaml'), 'wb') as f:
+        f.write(text[:dates[int(len(dates) * share)]])
+    with zipfile.ZipFile(os.path.join(data_dir, 'YourBoardingPassDotAero.zip')) as source, \
+            zipfile.ZipFile(os.path.join(target, 'YourBoardingPassDotAero.zip'), 'w') as partial:
+        names = source.namelist()
+        for name in names[:int(len(names) * share)]:
+            partial.writestr(name, source.read(name))
+
+def _clusters(identities: pd.DataFrame) -> set:
+    keys = identities['kind'].astype(str) + ':' + identities['value'].astype(str)
+    return {frozenset(group) for _, group in keys.groupby(identities['cluster_id'].to_numpy())}
+
+def test_delta_matches_full_run(dataset_dir, tmp_path):
+    targets = ['flights', 'identity', 'BoardingPass']
+    data_dir = str(tmp_path / 'data')
+    _partialCopy(dataset_dir, data_dir, 0.7)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        pipeline.runPipeline(data_dir, str(tmp_path / 'delta'), targets=targets, delta=True)
+        for name in ('BoardingData.csv', 'SkyTeam-Exchange.yaml', 'YourBoardingPassDotAero.zip'):
+            shutil.copy(os.path.join(dataset_dir, name), data_dir)
+        report = pipeline.runPipeline(data_dir, str(tmp_path / 'delta'), targets=targets, delta=True)
+        pipeline.runPipeline(dataset_dir, str(tmp_path / 'full'), targets=targets)
+    assert (report.loc[incremental.UPDATED_STAGES, 'status'] == 'delta').all()
+
+    for table in ('BoardingData', 'SkyTeam-Exchange', 'YourBoardingPassDotAero'):
+        pd.testing.assert_frame_equal(storage.loadTable(str(tmp_path / 'delta'), table),
+                                      storage.loadTable(str(tmp_path / 'full'), table))
+    identities = []
+    for run in ('delta', 'full'):
+        with open(tmp_path / run / 'pipeline' / 'identity.pkl', 'rb') as f:
+            identities.append(pickle.load(f)[0])
+    assert _clusters(identities[0]) == _clusters(identities[1])
@@ -0,0 +1,144 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import benchmarking
+import data_extracting
+import merging
+import storage
+import synthetic_data
+
+def _rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Строки таблицы строками в порядке сортировки (для сравнения без учёта типов и порядка)"""
+    return df.astype(str).sort_values(list(df.columns)).reset_index(drop=True)
+
+def _mergeDataPasports(df_sirena: pd.DataFrame, df_boarding: pd.DataFrame) -> tuple:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return merging.mergeDataPasports(df_sirena, df_boarding)
+
+def test_mergeDataPasports_fixed_width_sirena_matches_read_fwf(dataset_dir):
+    path = os.path.join(dataset_dir, 'Sirena-export-fixed.tab')
+    df_boarding = data_extracting.extractBoardingData(os.path.join(dataset_dir, 'BoardingData.csv'))
+    expected, expected_docs = _mergeDataPasports(benchmarking._baselineExtractSirenaExportFixed(path),
+                                                 df_boarding.copy())
+    df, double_docs = _mergeDataPasports(data_extracting.extractSirenaExportFixed(path), df_boarding.copy())
+
+    pd.testing.assert_frame_equal(_rows(double_docs), _rows(expected_docs))
+    pd.testing.assert_frame_equal(_rows(df), _rows(expected))
+
+def test_keyStrings_makes_numbers_and_strings_equal():
+    numbers = pd.Series([1234567890123, 42])
+    floats = pd.Series([1234567890123.0, None])
+    strings = pd.Series(['1234567890123', '0042'], dtype=object)
+    assert merging._keyStrings(numbers).tolist() == ['1234567890123', '42']
+    assert merging._keyStrings(floats).iloc[0] == '1234567890123'
+    assert pd.isna(merging._keyStrings(floats).iloc[1])
+    assert merging._keyStrings(strings).tolist() == ['1234567890123', '0042']
+    categories = merging._keyStrings(pd.Series([12.0, 12.0, None]).astype('category'))
+    assert isinstance(categories.dtype, pd.CategoricalDtype)
+    assert categories.cat.categories.tolist() == ['12']
+
+def _mergeChunked(work_dir, sirena_path: str, boarding_path: str, typed: bool) -> tuple:
+    sirena_chunks = data_extracting.iterFixedWidth(sirena_path, data_extracting.SIRENA_COLSPECS,
+                                                   data_extracting.SIRENA_ROW_LENGTH,
+                                                   usecols=merging.SIRENA_PASPORTS_COLUMNS, chunksize=500)
+    boarding_chunks = data_extracting.extractBoardingData(boarding_path, typed=typed, chunksize=500)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        output_dir, double_docs = merging.mergeDataPasportsChunked(sirena_chunks, boarding_chunks, str(work_dir),
+                                                                   n_shards=4)
+    return pd.read_parquet(output_dir), double_docs
+
+def test_mergeDataPasportsChunked_typed_and_untyped_boarding(dataset_dir, tmp_path):
+    sirena_path = os.path.join(dataset_dir, 'Sirena-export-fixed.tab')
+    boarding_path = os.path.join(dataset_dir, 'BoardingData.csv')
+    expected, expected_docs = _mergeDataPasports(data_extracting.extractSirenaExportFixed(sirena_path),
+                                                 data_extracting.extractBoardingData(boarding_path))
+    for typed in (False, True):
+        df, double_docs = _mergeChunked(tmp_path / str(typed), sirena_path, boarding_path, typed)
+        pd.testing.assert_frame_equal(_rows(double_docs), _rows(expected_docs))
+        pd.testing.assert_frame_equal(_rows(df), _rows(expected))
+
+def _baselineFilterSuspicious(df: pd.DataFrame) -> pd.DataFrame:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        return benchmarking._baselineFilterSuspicious(df)
+
+def _flights(rows: list) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=['FlightDate', 'FlightTime', 'FlightNumber', 'From', 'Dest', 'PassengerDocument'])
+
+def test_filterSuspicious_matches_groupby_apply():
+    df = _flights([
+        # Равные частоты направлений: мода - наименьшее значение, как mode()[0]
+        ('2017-01-01', '10:00', 'SU1', 'SVO', 'LED', 'a'),
+        ('2017-01-01', '10:00', 'SU1', 'AER', 'KZN', 'b'),
+        ('2017-01-01', '10:00', 'SU1', 'AER', 'LED', 'c'),
+        ('2017-01-01', '10:00', 'SU1', 'SVO', 'KZN', 'd'),
+        # Пропуски в ключе рейса: строки отбрасываются
+        (None, '10:00', 'SU1', 'SVO', 'LED', 'e'),
+        ('2017-01-01', None, 'SU1', 'SVO', 'LED', 'f'),
+        ('2017-01-01', '10:00', None, 'SVO', 'LED', 'g'),
+        # Рейсы из одной строки
+        ('2017-01-02', '08:00', 'SU2', 'LED', 'SVO', 'h'),
+        ('2017-01-02', '09:00', 'SU2', 'LED', 'SVO', 'i'),
+        # Частых строк не меньше, чем остальных: остальные удаляются
+        ('2017-01-03', '12:00', 'SU3', 'SVO', 'AER', 'j'),
+        ('2017-01-03', '12:00', 'SU3', 'SVO', 'AER', 'k'),
+        ('2017-01-03', '12:00', 'SU3', 'SVO', 'KZN', 'l'),
+        ('2017-01-03', '12:00', 'SU3', 'SVO', None, 'm'),
+        # Частых строк меньше: рейс остаётся целиком
+        ('2017-01-04', '12:00', 'SU4', 'SVO', 'AER', 'n'),
+        ('2017-01-04', '12:00', 'SU4', 'DME', 'AER', 'o'),
+        ('2017-01-04', '12:00', 'SU4', 'VKO', 'LED', 'p'),
+        ('2017-01-04', '12:00', 'SU4', 'VKO', 'KZN', 'q'),
+    ])
+    pd.testing.assert_frame_equal(merging.filterSuspicious(df), _baselineFilterSuspicious(df))
+
+def test_filterSuspicious_synthetic_records_with_missing_values():
+    df = synthetic_data.generateFlightRecords(5_000, 500, seed=1)
+    rng = np.random.default_rng(1)
+    for column in ('FlightTime', 'From', 'Dest'):
+        df.loc[rng.random(len(df)) < 0.02, column] = np.nan
+    # В исходной реализации mode()[0] падает на рейсе без единого значения From или Dest
+    flights = df.groupby(list(merging.FLIGHT_KEY))
+    complete = (flights['From'].transform('count') > 0) & (flights['Dest'].transform('count') > 0)
+    df = df[complete.to_numpy()].reset_index(drop=True)
+    pd.testing.assert_frame_equal(merging.filterSuspicious(df), _baselineFilterSuspicious(df))
+
+def test_filterSuspicious_keeps_flight_without_departures():
+    df = _flights([
+        ('2017-01-01', '10:00', 'SU1', None, 'LED', 'a'),
+        ('2017-01-01', '10:00', 'SU1', None, 'KZN', 'b'),
+        ('2017-01-02', '10:00', 'SU2', 'SVO', 'LED', 'c'),
+    ])
+    # Моды From нет, частых строк нет - рейс остаётся целиком
+    pd.testing.assert_frame_equal(merging.filterSuspicious(df), df)
+
+def test_forumFFKey_formats_numbers_as_integers():
+    loyality = pd.DataFrame({'programm': ['SU', 'DL', 'AF', None], 'Number': [123.0, np.nan, 7.0, 5.0]})
+    expected = pd.Series(['SU 123', np.nan, 'AF 7', np.nan], name='FFKey', dtype=object)
+    pd.testing.assert_series_equal(data_extracting.forumFFKey(loyality), expected)
+    for numbers in [['123', None, '7', '5'], pd.array([123, None, 7, 5], dtype='Int64')]:
+        pd.testing.assert_series_equal(data_extracting.forumFFKey(loyality.assign(Number=numbers)), expected)
+
+def test_mergeLoyality_same_from_store_and_direct_extraction(dataset_dir, tmp_path):
+    def direct():
+        return (data_extracting.extractSkyTeamExchange(os.path.join(dataset_dir, 'SkyTeam-Exchange.yaml')),
+                data_extracting.extractFrequentFlyerForumProfiles(os.path.join(dataset_dir, 'FrequentFlyerForum-Profiles.json')),
+                data_extracting.extractAirlinesData(os.path.join(dataset_dir, 'PointzAggregator-AirlinesData.xml')))
+
+    def stored():
+        return tuple(storage.loadSource(dataset_dir, str(tmp_path), source)
+                     for source in ['SkyTeamExchange', 'ForumProfiles', 'AirlinesData'])
+
+    direct_tables, stored_tables = direct(), stored()
+    # Number форума из json - float64 (у части профилей нет программ), в хранилище - Int64
+    assert direct_tables[1][2]['Number'].dtype != stored_tables[1][2]['Number'].dtype
+    # Ключи форума совпадают с номерами карт PointzAggregator
+    assert data_extracting.forumFFKey(direct_tables[1][2]).isin(direct_tables[2]['card_number']).any()
+    expected = merging.mergeLoyality(*direct_tables)
+    for result, table in zip(merging.mergeLoyality(*stored_tables), expected):
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), table.reset_index(drop=True))
@@ -0,0 +1,61 @@
+import warnings
+
+import pandas as pd
+
+import data_extracting
+import encoding
+import merging
+import pipeline
+import profiling
+import storage
+
+
+def test_missing_optional_source_is_skipped(dataset_dir):
+    # В синтетических данных нет Skyteam_Timetable.pdf
+    stages = pipeline.buildStages()
+    missing = pipeline.missingStages(stages, dataset_dir)
+    assert missing == ['SkyteamTimetable', 'schedule']
+    keys, _ = pipeline.stageKeys({name: stage for name, stage in stages.items() if name not in missing}, dataset_dir)
+    assert 'flights' in keys
+
+
+def test_merge_stages_hash_imported_modules():
+    stages = pipeline.buildStages()
+    for name in ['mergeDataPasports', 'mergeLoyality', 'mergeLoyalityIdNickPasports']:
+        assert data_extracting in stages[name].modules
+        assert profiling in stages[name].modules
+        assert encoding in stages[name].modules
+    assert data_extracting in stages['identity'].modules
+
+
+def _sources(dataset_dir: str, store_dir: str) -> dict:
+    return {source: storage.loadSource(dataset_dir, store_dir, source)
+            for source in ['SirenaExport', 'BoardingData', 'SkyTeamExchange', 'ForumProfiles', 'AirlinesData']}
+
+def test_encoded_merge_stages_match_string_merges(dataset_dir, tmp_path):
+    sources = _sources(dataset_dir, str(tmp_path))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        passports = pipeline.passportsStage(sources['SirenaExport'], sources['BoardingData'])
+        loyality = pipeline.loyalityStage(sources['SkyTeamExchange'], sources['ForumProfiles'], sources['AirlinesData'])
+        ids = pipeline.identityStage(sources['SirenaExport'], pipeline._decoded(loyality))
+    # Этапы сливают закодированные столбцы, строки восстанавливаются при сохранении
+    assert isinstance(passports[0]['PassengerDocument'].dtype, pd.CategoricalDtype)
+    assert isinstance(loyality[2]['FFKey'].dtype, pd.CategoricalDtype)
+    assert isinstance(ids['FFKey'].dtype, pd.CategoricalDtype)
+
+    sources = _sources(dataset_dir, str(tmp_path))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected_passports = merging.mergeDataPasports(sources['SirenaExport'], sources['BoardingData'])
+        expected_loyality = merging.mergeLoyality(sources['SkyTeamExchange'], sources['ForumProfiles'],
+                                                  sources['AirlinesData'])
+        expected_ids = merging.mergeLoyalityIdNickPasports(sources['SirenaExport'], expected_loyality[2])
+    expected_passports[0]['ID'] = "pass_" + expected_passports[0]['PassengerDocument']
+    expected_passports[0].rename(columns={'Dest':'To','FlightDate':'Date'}, inplace=True)
+
+    results = pipeline._decoded((*passports, *loyality, ids))
+    for result, expected in zip(results, (*expected_passports, *expected_loyality, expected_ids)):
+        assert not any(isinstance(dtype, pd.CategoricalDtype) for dtype in result.dtypes)
+        pd.testing.assert_frame_equal(result.reset_index(drop=True).astype(object),
+                                      expected.reset_index(drop=True).astype(object))
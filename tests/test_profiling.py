@@ -0,0 +1,58 @@
+import threading
+import warnings
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture
+def enabled():
+    profiling.reset()
+    profiling.enable()
+    yield
+    profiling.disable()
+    profiling.reset()
+
+
+def test_warnings_counted_and_passed_through(enabled):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        with profiling.stage('outer'):
+            with profiling.stage('inner'):
+                warnings.warn('first', UserWarning)
+                warnings.warn('second', UserWarning)
+            # Предупреждение показано сразу, а не после завершения этапа
+            assert [str(item.message) for item in caught] == ['first', 'second']
+    inner, outer = profiling.records()
+    assert inner['warnings']['UserWarning']['count'] == 2
+    assert 'first' in inner['warnings']['UserWarning']['first']
+    assert outer['warnings']['UserWarning']['count'] == 2
+
+
+def test_error_filter_still_raises(enabled):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        with pytest.raises(UserWarning):
+            with profiling.stage('strict'):
+                warnings.warn('fatal', UserWarning)
+    record, = profiling.records()
+    assert record['error'].startswith('UserWarning')
+
+
+def test_stack_is_per_thread(enabled):
+    started, release = threading.Event(), threading.Event()
+
+    def worker():
+        with profiling.stage('worker'):
+            started.set()
+            release.wait()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    started.wait()
+    with profiling.stage('main'):
+        release.set()
+        thread.join()
+    paths = sorted(record['path'] for record in profiling.records())
+    assert paths == ['main', 'worker']
@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+
+import reconciliation
+
+def _sirena(rows: list) -> pd.DataFrame:
+    """Строки Sirena: (рейс, дата, билет, бронь, документ, место)"""
+    df = pd.DataFrame(rows, columns=['Flight', 'DepartDate', 'e-Ticket', 'Code', 'TravelDoc', 'Seat'])
+    return df.assign(DepartTime='10:00', From='SVO', Dest='LED', TrvCls='Y', PaxName='IVANOV IVAN')
+
+def _boarding(rows: list) -> pd.DataFrame:
+    """Строки BoardingData: (рейс, дата, билет, бронь, документ)"""
+    df = pd.DataFrame(rows, columns=['FlightNumber', 'FlightDate', 'TicketNumber', 'BookingCode', 'PassengerDocument'])
+    return df.assign(FlightTime='10:00', Destination='LED', PassengerLastName='Ivanov', PassengerFirstName='Ivan')
+
+def _pass(rows: list) -> pd.DataFrame:
+    """Строки посадочных талонов: (рейс, дата, билет, бронь, место, класс)"""
+    df = pd.DataFrame(rows, columns=['flight_number', 'flight_date', 'ticket_number', 'pnr', 'seat', 'trvCls'])
+    return df.assign(departure_time='10:00', aeroport1='SVO', aeroport2='LED', passenger_name='IVANOV IVAN')
+
+def _group(summary: pd.DataFrame, **values) -> pd.Series:
+    found = summary
+    for column, value in values.items():
+        found = found[found[column].isna()] if value is None else found[found[column] == value]
+    assert len(found) == 1
+    return found.iloc[0]
+
+def test_ticket_filled_from_unique_booking():
+    summary, _ = reconciliation.reconcile(
+        _sirena([('SU 1', '2017-01-01', 'T1', 'P1', 'D1', '1A')]),
+        _boarding([('SU1', '2017-01-01', 'Not presented', 'p1', 'D1')]))
+    assert len(summary) == 1
+    group = _group(summary, Ticket='T1')
+    assert group['status'] == 'matched'
+    assert group['in_sirena'] and group['in_boarding']
+    assert (group['row_sirena'], group['row_boarding']) == (0, 0)
+
+def test_ambiguous_booking_keeps_booking_key():
+    summary, _ = reconciliation.reconcile(
+        _sirena([('SU1', '2017-01-01', 'T1', 'P1', 'D1', '1A'), ('SU1', '2017-01-01', 'T2', 'P1', 'D2', '1B')]),
+        _boarding([('SU1', '2017-01-01', None, 'P1', 'D1')]))
+    assert len(summary) == 3
+    assert _group(summary, Ticket=None)['status'] == 'boarding_only'
+    assert _group(summary, Ticket=None)['PNR'] == 'P1'
+    assert set(summary['status']) == {'sirena_only', 'boarding_only'}
+
+def test_booking_on_another_day_is_not_used():
+    summary, _ = reconciliation.reconcile(
+        _sirena([('SU1', '2017-01-01', 'T1', 'P1', 'D1', '1A')]),
+        _boarding([('SU1', '2017-01-02', None, 'P1', 'D1')]))
+    group = _group(summary, Date='2017-01-02')
+    assert pd.isna(group['Ticket']) and group['status'] == 'boarding_only'
+
+def test_rows_without_key():
+    summary, details = reconciliation.reconcile(
+        _sirena([('SU1', '2017-01-01', None, None, 'D1', '1A'), (None, '2017-01-01', 'T1', 'P1', 'D1', '1A'),
+                 ('SU1', 'not a date', 'T1', 'P1', 'D1', '1A')]))
+    assert summary['status'].tolist() == ['no_key'] * 3
+    assert summary['rows'].tolist() == [1, 1, 1]
+    assert len(details) == 0
+
+def test_duplicates_inside_one_source():
+    summary, _ = reconciliation.reconcile(
+        _sirena([('SU1', '2017-01-01', 'T1', 'P1', 'D1', '1A'), ('SU1', '2017-01-01', 'T1', 'P1', 'D1', '1A')]),
+        _boarding([('SU1', '2017-01-01', 'T1', 'P1', 'D1')]))
+    group = _group(summary, Ticket='T1')
+    assert (group['rows'], group['duplicate'], group['status']) == (3, True, 'matched')
+    assert group['row_sirena'] == 1
+
+@pytest.mark.parametrize('remap', [False, True])
+def test_double_docs_remap(remap):
+    double_docs = pd.DataFrame({'pass': ['F1'], 'PassengerDocument': ['D1']})
+    summary, details = reconciliation.reconcile(
+        _sirena([('SU1', '2017-01-01', 'T1', 'P1', 'f1', '1A')]),
+        _boarding([('SU1', '2017-01-01', 'T1', 'P1', 'D1')]),
+        double_docs=double_docs if remap else None)
+    group = _group(summary, Ticket='T1')
+    if remap:
+        assert (group['status'], group['conflicts']) == ('matched', '')
+        assert len(details) == 0
+    else:
+        assert (group['status'], group['conflicts']) == ('conflict', 'Document')
+        assert details['source'].tolist() == ['boarding', 'sirena']
+        assert details['Document'].tolist() == ['D1', 'F1']
+
+def test_conflicts_listed_in_column_order():
+    summary, details = reconciliation.reconcile(
+        _sirena([('SU1', '2017-01-01', 'T1', 'P1', 'D1', '1A'), ('SU2', '2017-01-01', 'T2', 'P2', 'D2', '2A')]),
+        df_pass=_pass([('SU1', '2017-01-01', 'T1', 'P9', '3C', 'J'), ('SU2', '2017-01-01', 'T2', 'P2', '2a', None)]))
+    assert _group(summary, Ticket='T1')['conflicts'] == 'PNR,Seat,Class'
+    # Регистр и пропуск не считаются расхождением
+    assert _group(summary, Ticket='T2')[['status', 'conflicts']].tolist() == ['matched', '']
+    assert details['group'].nunique() == 1
+    assert details['Seat'].tolist() == ['3C', '1A']
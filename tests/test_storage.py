@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+import storage
+
+
+def test_applySchema_types_dates_numbers_and_keeps_keys_as_strings(tmp_path):
+    sirena = pd.DataFrame({
+        'PaxBirthDate': ['1956-03-17', None, 'bad'],
+        'ArrivalDate': ['2017-12-18', '2017-04-15', None],
+        'DepartDate': ['2017-12-18', '2017-04-15', None],
+        'e-Ticket': [2000000004211.0, np.nan, 2000000000305.0],
+        'Fare': ['FPRIME', 'YSAVER', None],
+    })
+    storage.saveTable(sirena, str(tmp_path), 'Sirena-export-fixed')
+    df = storage.loadTable(str(tmp_path), 'Sirena-export-fixed')
+    assert df['PaxBirthDate'].dtype == 'datetime64[ns]'
+    assert df['PaxBirthDate'].iloc[0] == pd.Timestamp('1956-03-17') and df['PaxBirthDate'].iloc[1:].isna().all()
+    assert df['ArrivalDate'].dtype == 'datetime64[ns]'
+    # Даты полётов и билеты - ключи слияний, они остаются строками
+    assert df['DepartDate'].tolist()[:2] == ['2017-12-18', '2017-04-15']
+    assert df['e-Ticket'].tolist()[0] == '2000000004211'
+    assert df['Fare'].dtype == object
+
+
+def test_applySchema_nullable_numbers_and_flags():
+    loyality = storage.applySchema(pd.DataFrame({'Number': [123.0, np.nan], 'programm': ['SU', 'DL']}),
+                                   'FrequentFlyerForum-Profiles_LoyalityProgram')
+    assert loyality['Number'].dtype == 'Int64' and loyality['Number'].tolist()[0] == 123
+    assert loyality['Number'].isna().tolist() == [False, True]
+    flights = storage.applySchema(pd.DataFrame({'Codeshare': [True, np.nan, False]}, dtype=object),
+                                  'FrequentFlyerForum-Profiles_Flight')
+    assert flights['Codeshare'].dtype == 'boolean'
+    assert flights['Codeshare'].isna().tolist() == [False, True, False]
+    stored = storage.applySchema(pd.DataFrame({'Codeshare': ['True', 'false']}),
+                                 'FrequentFlyerForum-Profiles_Flight')
+    assert stored['Codeshare'].tolist() == [True, False]
+
+
+def test_cachedExtract_reextracts_after_code_change(tmp_path, monkeypatch):
+    source = tmp_path / 'source.txt'
+    source.write_text('data')
+    calls = []
+
+    def extract(path):
+        calls.append(path)
+        return pd.DataFrame({'Date': ['2017-01-01']})
+
+    def load():
+        return storage.cachedExtract(extract, str(source), str(tmp_path / 'store'), ['SkyTeam-Exchange'])
+
+    load()
+    load()
+    assert len(calls) == 1
+    monkeypatch.setattr(storage, '_codeDigest', lambda func: 'changed')
+    load()
+    assert len(calls) == 2
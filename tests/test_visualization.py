@@ -0,0 +1,122 @@
+import timeit
+import warnings
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import visualization
+
+AIRPORTS = pd.DataFrame({
+    'iata_code': ['SVO', 'LED', 'AER', 'JFK', 'XXX'],
+    'latitude': [55.972642, 59.800292, 43.449928, 40.639751, np.nan],
+    'longitude': [37.414589, 30.262503, 39.956589, -73.778925, 10.0],
+})
+
+
+def _baselineGetDataframeForWork(data, airports):
+    """Исходная реализация get_dataframe_for_work (map по кодам, dropna, кортежи координат)"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        result = data[['ID','From','To','Date']]
+        result['from_lat'] = result['From'].map(airports.set_index('iata_code')['latitude'])
+        result['from_lon'] = result['From'].map(airports.set_index('iata_code')['longitude'])
+        result['to_lat'] = result['To'].map(airports.set_index('iata_code')['latitude'])
+        result['to_lon'] = result['To'].map(airports.set_index('iata_code')['longitude'])
+        result = result.dropna()
+        result['from_coords'] = list(zip(result['from_lat'].astype(np.float64), result['from_lon'].astype(np.float64)))
+        result['to_coords'] = list(zip(result['to_lat'].astype(np.float64), result['to_lon'].astype(np.float64)))
+        result.rename(columns={'ID': 'passenger_id', 'Date': 'flight_date'}, inplace=True)
+        result['flight_date'] = pd.to_datetime(result['flight_date'])
+        result = result.sort_values(by='flight_date')
+    return result[['passenger_id','flight_date','from_coords','to_coords']]
+
+
+def _flights():
+    return pd.DataFrame({
+        'ID': ['pass_1', 'pass_1', 'id_2', None, 'nick_3', 'nick_3', 'pass_1', 'id_2'],
+        'From': ['SVO', 'LED', 'AER', 'SVO', 'QQQ', 'XXX', 'JFK', 'SVO'],
+        'To': ['LED', 'SVO', 'SVO', 'AER', 'SVO', 'LED', None, 'JFK'],
+        # Неверные даты только в строках, которые отбрасываются (неизвестный аэропорт, нет ID)
+        'Date': ['2017-03-01', '2017-02-01', '2017-01-15', 'not a date', 'bad', '2017-05-05', '2017-04-04', None],
+    }, index=[10, 11, 12, 13, 14, 15, 16, 17])
+
+
+def test_get_dataframe_for_work_matches_baseline():
+    data = _flights()
+    result = visualization.get_dataframe_for_work(data, AIRPORTS).sort_index()
+    expected = _baselineGetDataframeForWork(data, AIRPORTS).sort_index()
+
+    pd.testing.assert_index_equal(result.index, expected.index)
+    pd.testing.assert_series_equal(result['passenger_id'], expected['passenger_id'], check_dtype=False)
+    pd.testing.assert_series_equal(result['flight_date'], expected['flight_date'], check_dtype=False)
+    for side in ['from', 'to']:
+        coords = np.array(expected[f'{side}_coords'].tolist())
+        np.testing.assert_allclose(result[[f'{side}_lat', f'{side}_lon']].to_numpy(), coords, atol=1e-5)
+
+
+def test_get_dataframe_for_work_raises_on_kept_malformed_date():
+    data = _flights()
+    data.loc[10, 'Date'] = 'not a date'
+    with pytest.raises(ValueError):
+        visualization.get_dataframe_for_work(data, AIRPORTS)
+
+
+def test_get_dataframe_for_work_output_feeds_the_app_arrays():
+    prepared = visualization.get_dataframe_for_work(_flights(), AIRPORTS)
+    flights = visualization.build_passenger_flights(prepared)
+    first, last = visualization.flight_slice(flights, 'pass_1', '2017-01-01', '2017-12-31')
+    assert last - first == 2
+
+
+def _appFlights(n_rows: int = 20_000, n_passengers: int = 1_500, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'passenger_id': [f'id_{i}' for i in rng.integers(0, n_passengers, n_rows)],
+        'flight_date': pd.Timestamp('2017-01-01') + pd.to_timedelta(rng.integers(0, 365, n_rows), 'D'),
+        'from_lat': rng.uniform(-60, 60, n_rows), 'from_lon': rng.uniform(-180, 180, n_rows),
+        'to_lat': rng.uniform(-60, 60, n_rows), 'to_lon': rng.uniform(-180, 180, n_rows),
+    })
+
+
+def test_all_passengers_figure_restyles_one_line_and_one_marker_trace():
+    flights = visualization.build_passenger_flights(_appFlights(200, 10))
+    start, end = pd.Timestamp('2017-03-01'), pd.Timestamp('2017-09-30')
+    passengers = list(flights['counts'].index[:3])
+    figure = visualization.create_all_passengers_figure(
+        lambda passenger: visualization.passenger_traces(flights, passenger, start, end), passengers, 'orthographic')
+
+    # Фигура проходит проверку plotly и содержит только трассы первого пассажира
+    go_figure = visualization.go.Figure(figure)
+    assert [trace.mode for trace in go_figure.data] == ['lines', 'markers+text']
+    buttons = figure['layout']['updatemenus'][0]['buttons']
+    assert [button['label'] for button in buttons] == passengers
+    for passenger, button in zip(passengers, buttons):
+        first, last = visualization.flight_slice(flights, passenger, start, end)
+        unique_points, line_labels = visualization.number_flight_points(flights, first, last)
+        update, _, indices = button['args']
+        assert indices == [0, 1]
+        lon, points_lon = update['lon']
+        # Отрезок на полёт и NaN после каждого
+        np.testing.assert_array_equal(lon[0::3], flights['from_lon'][first:last])
+        np.testing.assert_array_equal(lon[1::3], flights['to_lon'][first:last])
+        assert np.isnan(lon[2::3]).all()
+        assert list(update['hovertext'][0][0::3]) == line_labels
+        assert update['text'][1] == [', '.join(map(str, numbers)) for numbers in unique_points.values()]
+        assert len(points_lon) == len(unique_points)
+
+
+def test_all_passengers_figure_from_cached_traces_is_fast():
+    flights = visualization.build_passenger_flights(_appFlights())
+    counts = flights['counts']
+    passengers = counts[(counts >= 12) & (counts <= 15)].index
+    assert len(passengers) > 300
+    start, end = pd.Timestamp('2015-01-01'), pd.Timestamp('2025-01-01')
+    traces = lru_cache(maxsize=4096)(lambda passenger: visualization.passenger_traces(flights, passenger, start, end))
+    visualization.create_all_passengers_figure(traces, passengers, 'natural earth')
+
+    # Повторный запрос (те же даты) только собирает фигуру из кэшированных трасс
+    elapsed = min(timeit.repeat(lambda: visualization.create_all_passengers_figure(traces, passengers, 'natural earth'),
+                                number=1, repeat=5))
+    assert elapsed < 0.1
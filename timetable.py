@@ -0,0 +1,223 @@
+"""Модуль индекса расписания Skyteam_Timetable для проверки выполненных полётов
+
+Строки расписания (extractSkyteamTimetable) переводятся в компактные массивы: период действия Validity
+(номера дней от 1970-01-01), дни недели Days (битовая маска) и коды аэропортов. Интервалы упорядочены
+по номеру рейса и началу периода; для каждой даты полёта просматриваются только интервалы его рейса,
+начавшиеся не раньше даты минус самый длинный период рейса и не позже самой даты. Проверка выполняется
+для всех полётов сразу, без цикла по строкам.
+"""
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+MONTHS = {'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+          'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12}
+# Границы периода без начала или конца ('Until ...', 'From ...', пустой Validity)
+OPEN_START = -(2 ** 31)
+OPEN_END = 2 ** 31 - 1
+ALL_DAYS = 0b1111111
+# Множитель кода рейса в ключе интервала: смещение начала периода от OPEN_START занимает 32 бита
+_KEY_SHIFT = 2 ** 33
+# День месяца, месяц (английское название или сокращение) и необязательный год: '05 Nov', '5NOV17', '5 Nov 2017'
+_DATE = re.compile(r'(\d{1,2})\s*([A-Za-z]{3})[A-Za-z]*\.?\s*(\d{4}|\d{2}(?!\d))?')
+
+@dataclass
+class Timetable:
+    """
+    Интервалы расписания, сгруппированные по номеру рейса и отсортированные по началу периода
+
+    Интервалы рейса flights[i] - срез offsets[i]:offsets[i+1] всех массивов.
+    """
+    flights: pd.Index
+    offsets: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+    # Биты 0-6 - понедельник-воскресенье
+    days: np.ndarray
+    # Коды аэропортов в airports (-1 - не указан)
+    origin: np.ndarray
+    destination: np.ndarray
+    airports: pd.Index
+    # Самый длинный период каждого рейса (дней)
+    max_span: np.ndarray
+    # Ключи (рейс, начало периода) в порядке интервалов для двоичного поиска
+    keys: np.ndarray
+
+    def __len__(self):
+        return len(self.start)
+
+def _dayNumber(day: int, month: int, year: int) -> int | None:
+    try:
+        return int(np.datetime64(f'{year:04d}-{month:02d}-{day:02d}').astype(np.int64))
+    except ValueError:
+        return None
+
+def parseValidity(text, year: int) -> tuple:
+    """
+    Период действия строки расписания
+
+    Поддерживаются 'D Mon - D Mon' (конец раньше начала - переход через год), 'Until D Mon', 'From D Mon'
+    и одна дата; год берётся из текста, иначе year. Нераспознанный или пустой период считается открытым.
+
+    Returns:
+        (int, int): Номера первого и последнего дня (OPEN_START, OPEN_END - граница не задана)
+    """
+    if not isinstance(text, str):
+        return OPEN_START, OPEN_END
+    dates = []
+    for day, month, explicit in _DATE.findall(text):
+        if month.upper() not in MONTHS:
+            continue
+        date_year = year if not explicit else int(explicit) + (2000 if len(explicit) == 2 else 0)
+        number = _dayNumber(int(day), MONTHS[month.upper()], date_year)
+        if number is not None:
+            dates.append((number, bool(explicit), MONTHS[month.upper()], int(day), date_year))
+    upper = text.upper()
+    if not dates:
+        return OPEN_START, OPEN_END
+    if len(dates) == 1:
+        number = dates[0][0]
+        if 'UNTIL' in upper or upper.lstrip().startswith('-'):
+            return OPEN_START, number
+        if 'FROM' in upper or upper.rstrip().endswith('-'):
+            return number, OPEN_END
+        return number, number
+    (start, _, _, _, _), (end, explicit, month, day, date_year) = dates[0], dates[-1]
+    if end < start and not explicit:
+        end = _dayNumber(day, month, date_year + 1) or end
+    return start, end
+
+def parseDays(text) -> int:
+    """Маска дней недели: цифры 1-7 (понедельник - 1); 'Daily', пустое значение или нет цифр - все дни"""
+    if not isinstance(text, str):
+        return ALL_DAYS
+    mask = 0
+    for digit in re.findall(r'[1-7]', text):
+        mask |= 1 << (int(digit) - 1)
+    return mask or ALL_DAYS
+
+def _flightCodes(values) -> pd.Series:
+    """Номера рейсов без пробелов в верхнем регистре"""
+    return pd.Series(values, dtype=object).str.replace(' ', '', regex=False).str.upper()
+
+def _airportCodes(values) -> pd.Series:
+    return pd.Series(values, dtype=object).str.strip().str.upper()
+
+def _days(dates) -> np.ndarray:
+    """Номера дней дат (строки YYYY-MM-DD или datetime); -1 - дата не распознана"""
+    dates = pd.Series(dates)
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        # Дат немного, поэтому разбирается каждая уникальная строка один раз
+        codes, uniques = pd.factorize(dates)
+        return np.append(_days(pd.to_datetime(pd.Series(uniques, dtype=object), errors='coerce', format='ISO8601')),
+                         -1)[codes]
+    return np.where(dates.isna().to_numpy(), -1, dates.to_numpy(dtype='datetime64[D]').astype(np.int64))
+
+def _positions(index: pd.Index, values, normalize) -> tuple:
+    """
+    Позиции нормализованных значений в index (-1 - нет); нормализуется каждое уникальное значение один раз
+
+    Returns:
+        (np.ndarray, np.ndarray): Позиции и признак пропуска значения
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    positions = index.get_indexer(normalize(uniques)) if len(uniques) else np.zeros(0, dtype=np.intp)
+    return np.append(positions, -1)[codes], codes < 0
+
+def _parsed(values: pd.Series, parse, *args) -> np.ndarray:
+    """Разбор каждого уникального значения столбца один раз"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return np.array([parse(value, *args) for value in uniques], dtype=np.int64)[codes]
+
+def buildTimetable(df_timetable: pd.DataFrame, year: int = 2017) -> Timetable:
+    """
+    Индекс расписания
+
+    Args:
+        df_timetable (pd.DataFrame): Результат extractSkyteamTimetable (Flight, Validity, Days, From_Code, To_Code)
+        year (int): Год периодов Validity, в которых он не указан (данные проекта - 2017)
+    """
+    df = df_timetable[df_timetable['Flight'].notna()]
+    codes, flights = pd.factorize(_flightCodes(df['Flight']), sort=True)
+    validity = _parsed(df['Validity'], parseValidity, year).reshape(-1, 2)
+    start, end = validity[:, 0], validity[:, 1]
+    airport_codes, airports = pd.factorize(pd.concat([_airportCodes(df['From_Code']), _airportCodes(df['To_Code'])]),
+                                           sort=True)
+    order = np.lexsort((start, codes))
+    offsets = np.searchsorted(codes[order], np.arange(len(flights) + 1))
+    # Открытый период может начаться сколь угодно рано: его длина больше всего диапазона номеров дней
+    span = np.where((start == OPEN_START) | (end == OPEN_END), 2 ** 40, end - start)[order]
+    start, end = start[order], end[order]
+    return Timetable(
+        flights=pd.Index(flights),
+        offsets=offsets,
+        start=start,
+        end=end,
+        days=_parsed(df['Days'], parseDays)[order].astype(np.uint8),
+        origin=airport_codes[:len(df)][order],
+        destination=airport_codes[len(df):][order],
+        airports=pd.Index(airports),
+        max_span=np.maximum.reduceat(span, offsets[:-1]) if len(span) else np.zeros(0, dtype=np.int64),
+        keys=codes[order].astype(np.int64) * _KEY_SHIFT + (start - OPEN_START),
+    )
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> tuple:
+    """Номера запросов и позиции для срезов [starts[i], ends[i]) без цикла по запросам"""
+    lengths = np.maximum(ends - starts, 0)
+    query = np.repeat(np.arange(len(lengths)), lengths)
+    positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+    return query, positions
+
+def _airportMatches(timetable: Timetable, codes: np.ndarray, airports, query: np.ndarray) -> np.ndarray:
+    """Совпадение аэропорта полёта с аэропортом интервала; аэропорт не указан в полёте или в расписании - совпадение"""
+    wanted, missing = _positions(timetable.airports, airports, _airportCodes)
+    wanted = np.where(missing, -1, np.where(wanted < 0, -2, wanted))[query]
+    return (wanted == -1) | (codes == -1) | (wanted == codes)
+
+def scheduledOn(timetable: Timetable, flights, dates, origins=None, destinations=None) -> pd.arrays.BooleanArray:
+    """
+    Был ли рейс flights[i] в расписании на дату dates[i] (и по маршруту origins[i] - destinations[i])
+
+    Args:
+        timetable (Timetable): Результат buildTimetable
+        flights: Номера рейсов
+        dates: Даты полётов (строки YYYY-MM-DD или datetime)
+        origins: Коды аэропортов вылета; None или пропуск - без проверки
+        destinations: Коды аэропортов прилёта; None или пропуск - без проверки
+
+    Returns:
+        pd.arrays.BooleanArray: True/False; пропуск - рейса нет в расписании или дата не распознана
+    """
+    flight = _positions(timetable.flights, flights, _flightCodes)[0]
+    day = _days(dates)
+    known = (flight >= 0) & (day >= 0)
+    flight, day = np.where(known, flight, 0), np.where(known, day, 0)
+
+    # Интервалы рейса с началом от (дата - самый длинный период) до даты: ключи отсортированы по рейсу и началу
+    base = flight.astype(np.int64) * _KEY_SHIFT - OPEN_START
+    span = timetable.max_span[flight] if len(timetable) else np.zeros(len(day), dtype=np.int64)
+    low = np.searchsorted(timetable.keys, base + np.maximum(day - span, OPEN_START), side='left')
+    high = np.where(known, np.searchsorted(timetable.keys, base + day, side='right'), low)
+    query, positions = _ranges(low, high)
+
+    weekday = (day + 3) % 7
+    matched = (timetable.end[positions] >= day[query]) & ((timetable.days[positions] >> weekday[query]) & 1 == 1)
+    if origins is not None:
+        matched &= _airportMatches(timetable, timetable.origin[positions], origins, query)
+    if destinations is not None:
+        matched &= _airportMatches(timetable, timetable.destination[positions], destinations, query)
+    scheduled = np.bincount(query[matched], minlength=len(day)) > 0
+    return pd.arrays.BooleanArray(scheduled, ~known)
+
+def flagFlights(timetable: Timetable, flights: pd.DataFrame) -> pd.Series:
+    """
+    Отметка полётов таблицы flights (Flight, Date, From, To - как результат этапа flights): был ли полёт в расписании
+
+    Returns:
+        pd.Series: boolean с индексом flights; пропуск - рейса нет в расписании или дата не распознана
+    """
+    scheduled = scheduledOn(timetable, flights['Flight'].to_numpy(dtype=object), flights['Date'].to_numpy(),
+                            flights['From'].to_numpy(dtype=object), flights['To'].to_numpy(dtype=object))
+    return pd.Series(scheduled, index=flights.index, name='Scheduled')
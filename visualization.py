@@ -4,27 +4,269 @@ from dash.dependencies import Input, Output, State
 import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime
+from functools import lru_cache
 import numpy as np
 
+from profiling import profiled
+
+@profiled
 def get_dataframe_for_work(data, airports):
+    """
+    Таблица полётов для create_flight_graph_app: пассажир, дата и координаты аэропортов вылета и прилёта
+
+    Аэропорты индексируются один раз, координаты подтягиваются по целочисленным позициям кодов (get_indexer)
+    в столбцы float32. Полёты с неизвестными аэропортами или пропусками отбрасываются.
+
+    Параметры:
+    data (pandas.DataFrame): Столбцы 'ID', 'From', 'To', 'Date'
+    airports (pandas.DataFrame): Столбцы 'iata_code', 'latitude', 'longitude'
+
+    Возвращает:
+    pandas.DataFrame: Столбцы 'passenger_id', 'flight_date', 'from_lat', 'from_lon', 'to_lat', 'to_lon',
+        отсортированные по дате
+    """
+    airports = airports.drop_duplicates('iata_code')
+    codes = pd.Index(airports['iata_code'])
+    coords = airports[['latitude', 'longitude']].to_numpy(dtype=np.float32)
+
+    # Коды аэропортов сначала нумеруются, затем ищутся в индексе только уникальные значения
+    from_codes, from_unique = pd.factorize(data['From'])
+    to_codes, to_unique = pd.factorize(data['To'])
+    from_pos = np.where(from_codes >= 0, codes.get_indexer(from_unique)[from_codes], -1)
+    to_pos = np.where(to_codes >= 0, codes.get_indexer(to_unique)[to_codes], -1)
+
+    known = ((from_pos >= 0) & (to_pos >= 0) & data['ID'].notna().to_numpy() & data['Date'].notna().to_numpy()
+             & ~np.isnan(coords[from_pos]).any(axis=1) & ~np.isnan(coords[to_pos]).any(axis=1))
+    from_pos, to_pos = from_pos[known], to_pos[known]
+    # Даты разбираются только у оставленных полётов: ошибка в отброшенной строке не мешает, как и раньше
+    dates = pd.to_datetime(data['Date'][known]).to_numpy()
+
+    result = pd.DataFrame({
+        'passenger_id': data['ID'].to_numpy()[known],
+        'flight_date': dates,
+        'from_lat': coords[from_pos, 0],
+        'from_lon': coords[from_pos, 1],
+        'to_lat': coords[to_pos, 0],
+        'to_lon': coords[to_pos, 1],
+    }, index=data.index[known])
+
+    return result.sort_values(by='flight_date', kind='stable')
+
+@profiled
+def build_passenger_flights(df):
+    """
+    Полёты, сгруппированные по пассажирам, в виде массивов NumPy
+
+    Строки сортируются по пассажиру и дате (с сохранением исходного порядка при равных датах),
+    границы групп хранятся в offsets, так что полёты пассажира - непрерывный срез массивов.
+
+    Параметры:
+    df (pandas.DataFrame): DataFrame в формате create_flight_graph_app
+
+    Возвращает:
+    dict: passengers -> позиция пассажира, offsets, dates (datetime64), year/month/day,
+        from_lat/from_lon/to_lat/to_lon (списками для быстрого поэлементного доступа),
+        counts - количество полётов по пассажирам (как value_counts)
+    """
+    codes, passengers = pd.factorize(df['passenger_id'])
+    dates = pd.to_datetime(df['flight_date']).to_numpy(dtype='datetime64[ns]')
+    order = np.lexsort((dates, codes))
+    codes = codes[order]
+    dates = dates[order]
+
+    if 'from_lat' in df.columns:
+        from_coords = df[['from_lat', 'from_lon']].to_numpy(dtype=np.float64)[order]
+        to_coords = df[['to_lat', 'to_lon']].to_numpy(dtype=np.float64)[order]
+    else:
+        # Прежний формат: кортежи (широта, долгота)
+        from_coords = np.array(df['from_coords'].tolist(), dtype=np.float64).reshape(-1, 2)[order]
+        to_coords = np.array(df['to_coords'].tolist(), dtype=np.float64).reshape(-1, 2)[order]
+    calendar = pd.DatetimeIndex(dates)
+
+    return {
+        'passengers': {passenger: i for i, passenger in enumerate(passengers)},
+        'offsets': np.searchsorted(codes, np.arange(len(passengers) + 1)),
+        'dates': dates,
+        'year': calendar.year.tolist(),
+        'month': calendar.month.tolist(),
+        'day': calendar.day.tolist(),
+        'from_lat': from_coords[:, 0].tolist(),
+        'from_lon': from_coords[:, 1].tolist(),
+        'to_lat': to_coords[:, 0].tolist(),
+        'to_lon': to_coords[:, 1].tolist(),
+        'counts': df['passenger_id'].value_counts(),
+    }
+
+def flight_slice(flights, passenger_id, start_date, end_date):
+    """
+    Границы (first, last) полётов пассажира с датами в [start_date, end_date] в массивах build_passenger_flights
+    """
+    position = flights['passengers'].get(passenger_id)
+    if position is None:
+        return 0, 0
+    first, last = flights['offsets'][position], flights['offsets'][position + 1]
+    dates = flights['dates'][first:last]
+    return (first + np.searchsorted(dates, np.datetime64(start_date, 'ns'), side='left'),
+            first + np.searchsorted(dates, np.datetime64(end_date, 'ns'), side='right'))
+
+MONTH_COLORS = {1: 'red', 2: 'orange', 3: 'yellow', 4: 'green',
+                5: 'blue', 6: 'indigo', 7: 'violet', 8: 'purple',
+                9: 'brown', 10: 'pink', 11: 'grey', 12: 'black'}
+POINT_TEXT_FONT = dict(size=14, color='black', family='Arial', weight='bold')
+
+def geo_layout(projection_type):
+    """Оформление карты для layout.geo"""
+    return dict(
+        projection_type=projection_type,
+        showcoastlines=True,
+        coastlinecolor="black",
+        showland=True,
+        landcolor="lightgray",
+        showocean=True,
+        oceancolor="lightblue",
+        countrycolor="black",
+    )
+
+def number_flight_points(flights, first, last):
+    """
+    Нумерация вершин маршрута пассажира для полётов first..last-1 из build_passenger_flights
+
+    Каждый полёт получает пару номеров (откуда, куда); если полёт начинается там, где закончился предыдущий,
+    номер точки вылета не заводится заново.
+
+    Возвращает:
+    tuple: (координаты точки -> список её номеров, подписи полётов 'дд/мм гггг:   a --> b')
+    """
+    unique_points = {}
+    line_labels = []
+    point_counter = 0
+    for i in range(first, last):
+        from_coord = (flights['from_lat'][i], flights['from_lon'][i])
+        to_coord = (flights['to_lat'][i], flights['to_lon'][i])
+
+        # Добавление уникальных точек и их индексов
+        if from_coord not in unique_points:
+            unique_points[from_coord] = []
+        if point_counter - 1 not in unique_points.get(from_coord, []):
+            unique_points[from_coord].append(point_counter + 1)
+            point_counter += 2
+        if to_coord not in unique_points:
+            unique_points[to_coord] = []
+        unique_points[to_coord].append(point_counter)
+        point_counter += 1
+
+        line_labels.append(f"{flights['day'][i]:02}/{flights['month'][i]:02} {flights['year'][i]}:   "
+                           f"{point_counter-2} --> {point_counter-1}")
+    return unique_points, line_labels
+
+def flight_lines(flights, first, last, line_labels):
+    """
+    Координаты отрезков полётов first..last-1 для одной трассы: (вылет, прилёт, NaN) на каждый полёт
+
+    Возвращает:
+    tuple: lat, lon (массивы формы (last - first, 3)) и подписи полётов, повторённые для каждой точки
+    """
+    gaps = np.full(last - first, np.nan)
+    lat = np.column_stack([flights['from_lat'][first:last], flights['to_lat'][first:last], gaps])
+    lon = np.column_stack([flights['from_lon'][first:last], flights['to_lon'][first:last], gaps])
+    return lat, lon, np.repeat(np.asarray(line_labels, dtype=object), 3)
+
+def points_trace(unique_points):
+    """Трасса вершин маршрута с их номерами (без легенды), словарём трассы plotly"""
+    coords = list(unique_points)
+    return dict(
+        type='scattergeo',
+        lon=[coord[1] for coord in coords],
+        lat=[coord[0] for coord in coords],
+        mode='markers+text',
+        marker=dict(size=4, color='black', symbol='circle'),
+        text=[', '.join(map(str, unique_points[coord])) for coord in coords],
+        textposition='top center',
+        textfont=POINT_TEXT_FONT,
+        showlegend=False
+    )
+
+@profiled
+def create_passenger_figure(flights, passenger_id, start_date, end_date, projection_type):
+    """
+    Компактный граф полётов одного пассажира: не более 12 линий (по месяцам) и одна трасса вершин
+
+    Перелёты одного месяца объединяются в одну трассу, отрезки разделяются NaN;
+    подпись полёта выводится при наведении на его концы.
 
-    result = data[['ID','From','To','Date']]
-    result['from_lat'] = result['From'].map(airports.set_index('iata_code')['latitude'])
-    result['from_lon'] = result['From'].map(airports.set_index('iata_code')['longitude'])
-    result['to_lat'] = result['To'].map(airports.set_index('iata_code')['latitude'])
-    result['to_lon'] = result['To'].map(airports.set_index('iata_code')['longitude'])
-    result = result.dropna()
-    result['from_coords'] = list(zip(result['from_lat'].astype(np.float64), result['from_lon'].astype(np.float64)))
-    result['to_coords'] = list(zip(result['to_lat'].astype(np.float64), result['to_lon'].astype(np.float64)))
+    Возвращает:
+    go.Figure: Граф пассажира
+    """
+    first, last = flight_slice(flights, passenger_id, start_date, end_date)
+    unique_points, line_labels = number_flight_points(flights, first, last)
+    lat, lon, labels = flight_lines(flights, first, last, line_labels)
+    months = np.asarray(flights['month'][first:last])
+
+    traces = []
+    for month, color in MONTH_COLORS.items():
+        legs = months == month
+        if not legs.any():
+            continue
+        traces.append(go.Scattergeo(
+            lon=lon[legs].ravel(),
+            lat=lat[legs].ravel(),
+            mode='lines',
+            line=dict(width=3, color=color),
+            name=f'{month:02}',
+            hovertext=labels[np.repeat(legs, 3)],
+            hoverinfo='text',
+        ))
+    traces.append(points_trace(unique_points))
+
+    fig = go.Figure(data=traces)
+    fig.update_layout(title=str(passenger_id), legend_title_text='Месяц', geo=geo_layout(projection_type))
+    return fig
+
+def passenger_traces(flights, passenger_id, start_date, end_date):
+    """
+    Трассы пассажира для create_all_passengers_figure: все полёты среза flight_slice одной линией
+    (отрезки разделены NaN, подпись полёта - при наведении) и вершины с номерами
 
-    result.rename(columns={'ID': 'passenger_id', 'Date': 'flight_date'}, inplace=True)
+    Возвращает:
+    tuple: (линии, вершины) - словари трасс plotly
+    """
+    first, last = flight_slice(flights, passenger_id, start_date, end_date)
+    unique_points, line_labels = number_flight_points(flights, first, last)
+    lat, lon, labels = flight_lines(flights, first, last, line_labels)
+    lines = dict(type='scattergeo', lon=lon.ravel(), lat=lat.ravel(), mode='lines', line=dict(width=3, color='blue'),
+                 name=str(passenger_id), hovertext=labels, hoverinfo='text', showlegend=False)
+    return lines, points_trace(unique_points)
+
+# Свойства трасс passenger_traces, которые меняет кнопка меню пассажира
+RESTYLED = ['lon', 'lat', 'name', 'hovertext', 'text']
+
+@profiled
+def create_all_passengers_figure(traces, passengers, projection_type):
+    """
+    Граф всех пассажиров с меню выбора: в фигуре одна трасса линий и одна трасса вершин
 
-    result['flight_date'] = pd.to_datetime(result['flight_date'])
-    result = result.sort_values(by='flight_date')
+    Кнопка пассажира подставляет в эти трассы его координаты и подписи (restyle), поэтому размер фигуры
+    растёт линейно с числом полётов, а не с квадратом числа пассажиров, как у списков видимости трасс.
 
-    return result[['passenger_id','flight_date','from_coords','to_coords']]
+    Параметры:
+    traces (callable): passenger_id -> результат passenger_traces (обычно кэшированный)
+    passengers (list): Пассажиры в порядке меню
+    projection_type (str): Тип проекции карты
 
-def create_flight_graph_app(df):
+    Возвращает:
+    dict: Фигура plotly (словарь, который Dash передаёт в dcc.Graph без повторной проверки)
+    """
+    buttons = []
+    for passenger in passengers:
+        pair = traces(passenger)
+        buttons.append(dict(args=[{key: [trace.get(key) for trace in pair] for key in RESTYLED}, {}, [0, 1]],
+                            label=str(passenger), method='restyle'))
+
+    layout = dict(geo=geo_layout(projection_type),
+                  updatemenus=[dict(buttons=buttons, direction='down', showactive=True)])
+    return dict(data=list(traces(passengers[0])) if len(passengers) else [], layout=layout)
+
+def create_flight_graph_app(df, compact=False):
     """
     Функция для создания и запуска Dash приложения, визуализирующего полёты пассажиров на карте.
 
@@ -32,8 +274,13 @@ def create_flight_graph_app(df):
     df (pandas.DataFrame): DataFrame с информацией о полетах. Cтолбцы:
         - 'passenger_id': идентификатор пассажира - строка,
         - 'flight_date': дата полета - в формате datetime,
-        - 'from_coords': координаты отправления (широта, долгота),
-        - 'to_coords': координаты прибытия (широта, долгота).
+        - 'from_lat', 'from_lon': координаты отправления (как в get_dataframe_for_work),
+        - 'to_lat', 'to_lon': координаты прибытия;
+        вместо них допускаются столбцы кортежей (широта, долгота) 'from_coords' и 'to_coords'.
+    compact (bool): Компактный режим - пассажир выбирается отдельным списком, и в браузер передаётся
+        только его граф (create_passenger_figure, линии раскрашены по месяцам). По умолчанию все пассажиры
+        встраиваются в меню графика (create_all_passengers_figure): одна линия и одна трасса вершин,
+        которые кнопка пассажира заполняет его полётами.
 
     # Пример использования:
         # Пример 1
@@ -60,132 +307,22 @@ def create_flight_graph_app(df):
     # Создаем приложение Dash
     app = dash.Dash(__name__)
 
-    # Функция для построения графа полётов для одного пассажира
-    def create_flight_graph(df, passenger_id, start_date, end_date):
-        fig = go.Figure()
-
-        month_colors = {1: 'red', 2: 'orange', 3: 'yellow', 4: 'green',
-                        5: 'blue', 6: 'indigo', 7: 'violet', 8: 'purple',
-                        9: 'brown', 10: 'pink', 11: 'grey', 12: 'black'}
-
-        unique_points = {}
-        point_counter = 0
-        previous_month = None  # Для отслеживания предыдущего месяца
-
-        # Фильтруем полёты по датам
-        passenger_flights = df[(df['passenger_id'] == passenger_id) &
-                               (df['flight_date'] >= start_date) &
-                               (df['flight_date'] <= end_date)]
-
-        for index, row in passenger_flights.iterrows():
-            from_coord = row['from_coords']
-            to_coord = row['to_coords']
-            flight_date = row['flight_date']
-            month = pd.to_datetime(flight_date).month
-            year = pd.to_datetime(flight_date).year
-            day = pd.to_datetime(flight_date).day
-            color = month_colors[month]
-
-            # Добавление уникальных точек и их индексов
-            if from_coord not in unique_points:
-                unique_points[from_coord] = []
-            if point_counter - 1 not in unique_points.get(from_coord, []):
-                unique_points[from_coord].append(point_counter + 1)
-                point_counter += 2
-            if to_coord not in unique_points:
-                unique_points[to_coord] = []
-            unique_points[to_coord].append(point_counter)
-            point_counter += 1
-
-            line_label = f'{day:02}/{month:02} {year}:   {point_counter-2} --> {point_counter-1}'
-            showleg = True
-            #if month == previous_month:
-            #    showleg = False
-            #previous_month = month
-            # Линия полёта
-            fig.add_trace(go.Scattergeo(
-                locationmode='ISO-3',
-                lon=[from_coord[1], to_coord[1]],
-                lat=[from_coord[0], to_coord[0]],
-                mode='lines',
-                line=dict(width=3, color=color),
-                name=line_label,
-                showlegend=showleg
-            ))
-
-        # Отображение вершин с индексами
-        for coord, point_numbers in unique_points.items():
-            point_numbers_str = ', '.join(map(str, point_numbers))
-            fig.add_trace(go.Scattergeo(
-                lon=[coord[1]],
-                lat=[coord[0]],
-                mode='markers+text',
-                marker=dict(size=4, color='black', symbol='circle'),
-                text=point_numbers_str,
-                textposition='top center',
-                textfont=dict(size=14, color='black', family='Arial', weight='bold'),
-                showlegend=False  # Убираем подписи вершин из легенды
-            ))
-
-        return fig
-
-    # Функция для создания графа для всех пассажиров с заданными датами
-    def generate_graphs(start_date, end_date, Nmin, Nmax, projection_type):
-
-        passenger_counts = df['passenger_id'].value_counts()
-        filtered_passengers = passenger_counts[(passenger_counts >= Nmin) & (passenger_counts <= Nmax)].index
-
-        figs = {passenger: create_flight_graph(df, passenger, start_date, end_date) for passenger in
-                filtered_passengers}
-
-        final_fig = go.Figure()
-
-        # Добавляем все графы в один
-        for fig in figs.values():
-            final_fig.add_traces(fig.data)
-
-        # Генерируем кнопки
-        buttons = []
-        trace_offset = 0
-
-        for passenger in filtered_passengers:
-            # Устанавливаем видимость данных пассажира
-            visible_traces = [False] * len(final_fig.data)
-
-            num_traces = len(figs[passenger].data)
-            visible_traces[trace_offset:trace_offset + num_traces] = [True] * num_traces
-            trace_offset += num_traces
-
-            buttons.append(dict(
-                args=[{'visible': visible_traces}],
-                label=passenger,
-                method='update'
-            ))
-
-        # Меню выбора пассажира
-        final_fig.update_layout(
-            updatemenus=[{
-                'buttons': buttons,
-                'direction': 'down',
-                'showactive': True
-            }],
-            geo=dict(
-                projection_type=projection_type,
-                showcoastlines=True,
-                coastlinecolor="black",
-                showland=True,
-                landcolor="lightgray",
-                showocean=True,
-                oceancolor="lightblue",
-                countrycolor="black",
-            )
-        )
+    # Геометрия полётов по пассажирам строится один раз при запуске приложения
+    flights = build_passenger_flights(df)
+    passenger_counts = flights['counts']
 
-        # Отображение первой фигуры по умолчанию
-        for i, trace in enumerate(final_fig.data):
-            trace.visible = (i < len(figs[filtered_passengers[0]].data))  # Показываем только граф первого пассажира
+    # Трассы пассажира для заданных дат строятся один раз: повторный запрос собирает фигуру из готовых словарей
+    @lru_cache(maxsize=4096)
+    def create_flight_graph(passenger_id, start_date, end_date):
+        return passenger_traces(flights, passenger_id, start_date, end_date)
 
-        return final_fig
+    # Функция для создания графа для всех пассажиров с заданными датами.
+    # Фигура собирается заново из кэшированных трасс пассажиров: целиком она велика,
+    # и кэш таких фигур держал бы в памяти процесса гигабайты
+    def generate_graphs(start_date, end_date, Nmin, Nmax, projection_type):
+        filtered_passengers = passenger_counts[(passenger_counts >= Nmin) & (passenger_counts <= Nmax)].index
+        return create_all_passengers_figure(
+            lambda passenger: create_flight_graph(passenger, start_date, end_date), filtered_passengers, projection_type)
 
     # Макет приложения
     app.layout = html.Div([
@@ -220,27 +357,58 @@ def create_flight_graph_app(df):
                 clearable=False
             ),
             html.Button('Применить', id='apply-button', n_clicks=0, style={'margin-left': '10px'}),
+            *([dcc.Dropdown(id='passenger-select', style={'width': '250px', 'margin-left': '10px'}, clearable=False)]
+              if compact else []),
             ], style={'display': 'flex', 'align-items': 'center', 'margin-top': '0px', 'margin-bottom': '0px'}),
         dcc.Graph(id='flight-graph', style={'width': '90vw', 'height': '80vh'}),
     ])
 
-    # Обновление графика на основе выбранных дат и нажатия кнопки
-    @app.callback(
-        Output('flight-graph', 'figure'),
-        [Input('apply-button', 'n_clicks')],
-        [State('start-date-picker', 'date'),
-         State('end-date-picker', 'date'),
-         State('input-Nmin', 'value'),
-         State('input-Nmax', 'value'),
-         State('projection-type', 'value')]
-    )
+    if compact:
+        @lru_cache(maxsize=4096)
+        def create_compact_graph(passenger_id, start_date, end_date, projection_type):
+            return create_passenger_figure(flights, passenger_id, start_date, end_date, projection_type)
+
+        # Кнопка обновляет список пассажиров, выбор пассажира - только его граф
+        @app.callback(
+            [Output('passenger-select', 'options'),
+             Output('passenger-select', 'value'),
+             Output('flight-graph', 'figure')],
+            [Input('apply-button', 'n_clicks'),
+             Input('passenger-select', 'value')],
+            [State('start-date-picker', 'date'),
+             State('end-date-picker', 'date'),
+             State('input-Nmin', 'value'),
+             State('input-Nmax', 'value'),
+             State('projection-type', 'value')]
+        )
+        def update_passenger_graph(n_clicks, passenger_id, start_date, end_date, Nmin, Nmax, type):
+            filtered_passengers = passenger_counts[(passenger_counts >= Nmin) & (passenger_counts <= Nmax)].index
+            if dash.ctx.triggered_id != 'passenger-select' or passenger_id not in filtered_passengers:
+                passenger_id = filtered_passengers[0] if len(filtered_passengers) else None
+            options = [{'label': str(passenger), 'value': passenger} for passenger in filtered_passengers]
+            if passenger_id is None:
+                return options, None, go.Figure(layout=dict(geo=geo_layout(type)))
+            figure = create_compact_graph(passenger_id, pd.to_datetime(start_date), pd.to_datetime(end_date), type)
+            return options, passenger_id, figure
+
+    else:
+        # Обновление графика на основе выбранных дат и нажатия кнопки
+        @app.callback(
+            Output('flight-graph', 'figure'),
+            [Input('apply-button', 'n_clicks')],
+            [State('start-date-picker', 'date'),
+             State('end-date-picker', 'date'),
+             State('input-Nmin', 'value'),
+             State('input-Nmax', 'value'),
+             State('projection-type', 'value')]
+        )
 
-    def update_graph(n_clicks, start_date, end_date, Nmin, Nmax, type):
-        # Преобразование дат в формат datetime
-        start_date = pd.to_datetime(start_date)
-        end_date = pd.to_datetime(end_date)
+        def update_graph(n_clicks, start_date, end_date, Nmin, Nmax, type):
+            # Преобразование дат в формат datetime
+            start_date = pd.to_datetime(start_date)
+            end_date = pd.to_datetime(end_date)
 
-        return generate_graphs(start_date, end_date, Nmin, Nmax, type)
+            return generate_graphs(start_date, end_date, Nmin, Nmax, type)
 
     # Запуск приложения
     app.run_server(host="0.0.0.0", debug=False)